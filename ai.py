@@ -1,35 +1,82 @@
 import os
 import re
 import sys
-from openai import OpenAI
+import time
+import random
+from functools import lru_cache
 
 from typing import List, Tuple
 
 from escape_sequences import *
+import profiling
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 MODEL_ENGINE = "gpt-4o-mini"
 
-def get_openai_response(word) -> str:
-    print(ITALIC + 'waiting for open ai to get example sentences\n' + RESET)
-    model_engine = MODEL_ENGINE
-    client = OpenAI(api_key=OPENAI_API_KEY)
+# bulk generation defaults
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 5
+WRITE_BATCH_SIZE = 50
+
+@lru_cache(maxsize=None)
+def _client():
+    """ one client per process, its http connections are reused.
+        OPENAI_BASE_URL points it to another server, e.g. a local stub.
+    """
+    # openai is slow to import, only pay for it when it is called
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
 
-    prompt = f"prompt 5 numbered list example sentences that is used in daily life consisting \
+def _prompt(word) -> str:
+    return f"prompt 5 numbered list example sentences that is used in daily life consisting \
 of at least 5 words for the word {word} in German and translate those sentences \
 in English, here is the example: \n<german sentence> - <english sentence>"
 
-    try:
-        response = client.responses.create(
-            model="gpt-4o-mini",
-            input=prompt,
+def _create_response(word, client=None):
+    client = client or _client()
+    with profiling.span('openai', word=word):
+        return client.responses.create(
+            model=MODEL_ENGINE,
+            input=_prompt(word),
         )
+
+def get_openai_response(word) -> str:
+    print(ITALIC + 'waiting for open ai to get example sentences\n' + RESET)
+    try:
+        response = _create_response(word)
     except Exception as e:
         sys.stderr.write(f'Response error: {e}\n')
         response = None
 
     return response
 
+def _response_text(response) -> str:
+    # responses api, with the chat completions shape as a fallback
+    text = getattr(response, 'output_text', None)
+    if text is None:
+        text = response.choices[0].message.content
+    return text.strip()
+
+def _parse_sentences(text: str) -> List[Tuple[str, str, str]]:
+    """ parses '1. <german sentence> - <english sentence>' lines into
+        (number, german, english) tuples, raises ValueError on other lines.
+    """
+    parsed_examples = []
+    for example in text.split('\n'):
+        if not example.strip():
+            continue
+        # Extract the example number, German sentence, and English
+        # translation from the match object.
+        found = re.findall(r'(\d)\W+(.*)\s-\s(.*)', example.strip())
+        if not found:
+            raise ValueError(f"unexpected line in open ai response: {example!r}")
+        # if lenght of the tuple is not 3, consider it is not parsed
+        # correctly, and skip.
+        if len(found[0]) != 3:
+            continue
+        parsed_examples.append(found[0])
+    return parsed_examples
+
 def parse_openai_response(response: str) -> List[Tuple[str, str]]:
     """
         Define a function that takes a string `r` and returns
@@ -39,21 +86,71 @@ def parse_openai_response(response: str) -> List[Tuple[str, str]]:
         sys.stderr.write('open ai response is None, please repeat the action.\n')
         sys.exit(3)
 
-    parsed_examples = []
-    text = response.choices[0].message.content.strip()
-    text_ls = text.split('\n')
-    for example in text_ls:
-        # Extract the example number, German sentence, and English 
-        # translation from the match object.
+    try:
+        return _parse_sentences(_response_text(response))
+    except ValueError:
+        sys.stderr.write('open ai response error, please repeat the action.\n')
+        sys.exit(4)
+
+def request_sentences(word, retries: int = DEFAULT_RETRIES):
+    """ requests and parses the sentences of one word, retrying failed
+        requests and unparsable responses up to `retries` times with
+        exponential backoff.
+    """
+    # the retries are done here, with backoff across all workers
+    client = _client().with_options(max_retries=0)
+    for attempt in range(retries + 1):
         try:
-            parsed_example_tp = re.findall(r'(\d)\W+(.*)\s-\s(.*)', example.strip())[0]
-        except:
-            sys.stderr.write('open ai response error, please repeat the action.\n')
-            sys.exit(4)
-        # if lenght of the tuple is not 3, consider it is not parsed 
-        # correctly, and skip.
-        if len(parsed_example_tp) != 3:
-            continue
-        parsed_examples.append(parsed_example_tp)
-    return parsed_examples
+            sentences = _parse_sentences(_response_text(_create_response(word, client)))
+            if sentences:
+                return sentences
+            raise ValueError("no sentences in open ai response")
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(min(60, 2 ** attempt) * random.uniform(0.5, 1.5))
+
+def generate_missing_sentences(concurrency: int = DEFAULT_CONCURRENCY, limit: int = None,
+                               retries: int = DEFAULT_RETRIES) -> int:
+    """ generates example sentences for every stored verb and noun that has
+        none, with up to `concurrency` requests in flight. results are
+        written in batches of WRITE_BATCH_SIZE words per transaction.
+        returns the number of failed words.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from db import get_words_without_sentences, add_sentences_to_db, transaction, retry_when_locked
+
+    words = get_words_without_sentences(limit)
+    start = time.perf_counter()
+    pending, done, failures = [], 0, []
+
+    @retry_when_locked
+    def flush():
+        nonlocal done
+        with transaction():
+            for word_id, sentences in pending:
+                add_sentences_to_db(sentences, word_id)
+        done += len(pending)
+        pending.clear()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(request_sentences, word, retries): (word_id, word)
+                   for word_id, word in words}
+        for future in as_completed(futures):
+            word_id, word = futures[future]
+            try:
+                pending.append((word_id, future.result()))
+            except Exception as e:
+                failures.append((word, e))
+                continue
+            if len(pending) >= WRITE_BATCH_SIZE:
+                flush()
+    flush()
 
+    elapsed = time.perf_counter() - start
+    throughput = len(words) / elapsed if elapsed > 0 else 0.0
+    print(f"{BLUE}sentences added:{RESET} {done}  {BLUE}failed:{RESET} {len(failures)}")
+    print(f"{BLUE}requested:{RESET} {len(words)} words in {elapsed:.1f}s ({throughput:.2f} words/s)")
+    for word, e in failures:
+        sys.stderr.write(f"{word}: {e}\n")
+    return len(failures)
@@ -0,0 +1,84 @@
+""" times the completion of the word argument: db.complete_words against a
+    `LIKE 'prefix%'` query on words.word, for prefixes of 1 to 5 letters of
+    stored tokens, as typed and without umlauts.
+
+    usage: python bench/complete_bench.py [--db FILE] [--words 100000] [--sample 2000]
+                                          [--json FILE]
+
+    without --db a synthetic database of --words words is made with
+    bench/make_db.py.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from statistics import median
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from make_db import DATA_DIR, make_database
+
+def _unfold(word: str) -> str:
+    for src, dst in (('ä', 'a'), ('ö', 'o'), ('ü', 'u'), ('ß', 'ss')):
+        word = word.replace(src, dst)
+    return word
+
+def _like(conn, prefix: str) -> list:
+    # what completion would be without the token index
+    return conn.execute("SELECT word FROM words WHERE word LIKE ? ORDER BY word LIMIT 20",
+                        (prefix.replace('%', '').replace('_', '') + '%',)).fetchall()
+
+def _timed(func, prefixes: list) -> dict:
+    times = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        func(prefix)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {'median_ms': median(times), 'p99_ms': times[min(len(times) - 1, int(len(times) * 0.99))],
+            'max_ms': times[-1]}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", metavar="FILE", help="dictionary.db to complete on.")
+    parser.add_argument("--words", type=int, default=100000, help="size of the synthetic database without --db.")
+    parser.add_argument("--sample", type=int, default=2000, help="number of prefixes.")
+    parser.add_argument("--json", metavar="FILE", help="writes the results as json.")
+    args = parser.parse_args()
+
+    path = args.db
+    if path is None:
+        directory = os.path.join(DATA_DIR, str(args.words))
+        path = os.path.join(directory, 'dictionary.db')
+        if not os.path.exists(path):
+            make_database(args.words, directory)
+    path = os.path.abspath(path)
+
+    import db
+    os.chdir(os.path.dirname(path))
+    conn = db.get_connection()
+    tokens = [t for t, in conn.execute('SELECT DISTINCT token FROM word_tokens') if t[:1].isalpha()]
+    rng = random.Random(1)
+    prefixes = [token[:rng.randint(1, 5)] for token in rng.choices(tokens, k=args.sample)]
+
+    report = {'words': conn.execute('SELECT COUNT(*) FROM words').fetchone()[0]}
+    for name, func, sample in (('complete_words', db.complete_words, prefixes),
+                               ('complete_words unfolded', db.complete_words, [_unfold(p) for p in prefixes]),
+                               ('like', lambda p: _like(conn, p), prefixes[:200])):
+        report[name] = _timed(func, sample)
+
+    print(f"{report['words']} words, {len(prefixes)} prefixes")
+    print(f"{'':26} {'median ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, r in report.items():
+        if isinstance(r, dict):
+            print(f"{name:26} {r['median_ms']:10.3f} {r['p99_ms']:10.3f} {r['max_ms']:10.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
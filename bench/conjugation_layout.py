@@ -0,0 +1,155 @@
+""" compares the conjugations layout of schema version 7 (tense and pronoun
+    as text on every row, plus a unique index over all columns) with the
+    current one (tense and pronoun ids, a without rowid table clustered by
+    word) on the same data: database and table size, and the latency of
+    the paradigm reads of a lookup.
+
+    usage: python bench/conjugation_layout.py [--db FILE] [--words 100000] [--sample 500]
+                                              [--json FILE]
+
+    without --db a synthetic database of --words words is made with
+    bench/make_db.py. the database is copied, never changed.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+from statistics import median
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from make_db import DATA_DIR, make_database
+
+# the paradigm reads of a `--conjugation` lookup and of get_conjugation_table,
+# as db.py runs them on each layout
+QUERIES = {
+    'v7': {
+        'moods': 'SELECT DISTINCT mood_id FROM conjugations WHERE word_id = ? ORDER BY mood_id',
+        'tenses': 'SELECT tense FROM conjugations WHERE word_id = ? AND mood_id = ? GROUP BY tense ORDER BY MIN(id)',
+        'tense': 'SELECT tense, pronoun, conjugation FROM conjugations WHERE word_id = ? AND mood_id = ? AND tense = ?',
+        'table': 'SELECT mood_id, tense, pronoun, conjugation FROM conjugations WHERE word_id = ? ORDER BY mood_id, id',
+    },
+    'current': {
+        'moods': 'SELECT DISTINCT mood_id FROM conjugations WHERE word_id = ? ORDER BY mood_id',
+        'tenses': 'SELECT tenses.tense FROM conjugations JOIN tenses ON conjugations.tense_id = tenses.id '
+                  'WHERE word_id = ? AND mood_id = ? GROUP BY tense_id ORDER BY tense_id',
+        'tense': 'SELECT tenses.tense, pronouns.pronoun, conjugation FROM tenses '
+                 'JOIN conjugations ON conjugations.tense_id = tenses.id '
+                 'JOIN pronouns ON conjugations.pronoun_id = pronouns.id '
+                 'WHERE word_id = ? AND mood_id = ? AND tenses.tense = ? ORDER BY pronoun_id',
+        'table': 'SELECT mood_id, tenses.tense, pronouns.pronoun, conjugation FROM conjugations '
+                 'JOIN tenses ON conjugations.tense_id = tenses.id '
+                 'JOIN pronouns ON conjugations.pronoun_id = pronouns.id '
+                 'WHERE word_id = ? ORDER BY mood_id, tense_id, pronoun_id',
+    },
+}
+
+def _to_v7(path: str):
+    """ rewrites the conjugations of the database at `path` to the layout of
+        schema version 7
+    """
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE conjugations_v7 (
+            id INTEGER PRIMARY KEY,
+            tense TEXT NOT NULL,
+            pronoun TEXT,
+            conjugation TEXT,
+            word_id INTEGER NOT NULL,
+            mood_id INTEGER NOT NULL,
+            FOREIGN KEY (word_id) REFERENCES words(id),
+            UNIQUE(word_id, mood_id, tense, pronoun, conjugation)
+        );
+        INSERT INTO conjugations_v7 (tense, pronoun, conjugation, word_id, mood_id)
+        SELECT tenses.tense, pronouns.pronoun, conjugation, word_id, mood_id
+        FROM conjugations
+        JOIN tenses ON conjugations.tense_id = tenses.id
+        JOIN pronouns ON conjugations.pronoun_id = pronouns.id
+        ORDER BY word_id, mood_id, tense_id, pronoun_id;
+        DROP TABLE conjugations;
+        DROP TABLE tenses;
+        DROP TABLE pronouns;
+        ALTER TABLE conjugations_v7 RENAME TO conjugations;
+        PRAGMA user_version = 7;
+    ''')
+    conn.close()
+
+def _sizes(path: str) -> dict:
+    conn = sqlite3.connect(path)
+    conn.execute('VACUUM')
+    tables = conn.execute('''
+        SELECT SUM(pgsize) FROM dbstat
+        WHERE name IN ('conjugations', 'tenses', 'pronouns')
+           OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'conjugations')
+    ''').fetchone()[0]
+    conn.close()
+    return {'database_mb': os.path.getsize(path) / 2 ** 20, 'conjugations_mb': tables / 2 ** 20}
+
+def _latencies(path: str, queries: dict, sample: int) -> dict:
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    verbs = [word_id for word_id, in conn.execute('SELECT DISTINCT word_id FROM conjugations')]
+    verbs = random.Random(1).sample(verbs, min(sample, len(verbs)))
+    times = {name: [] for name in ('paradigm', 'table')}
+    for word_id in verbs:
+        start = time.perf_counter()
+        # what `german-dict WORD -c` reads: moods, the tenses of one, one tense
+        mood_id = conn.execute(queries['moods'], (word_id,)).fetchall()[0][0]
+        tense = conn.execute(queries['tenses'], (word_id, mood_id)).fetchall()[0][0]
+        conn.execute(queries['tense'], (word_id, mood_id, tense)).fetchall()
+        times['paradigm'].append((time.perf_counter() - start) * 1e6)
+        start = time.perf_counter()
+        conn.execute(queries['table'], (word_id,)).fetchall()
+        times['table'].append((time.perf_counter() - start) * 1e6)
+    conn.close()
+    return {f'{name}_us': median(values) for name, values in times.items()}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", metavar="FILE", help="dictionary.db to compare the layouts on.")
+    parser.add_argument("--words", type=int, default=100000, help="size of the synthetic database without --db.")
+    parser.add_argument("--sample", type=int, default=500, help="number of verbs whose paradigm is read.")
+    parser.add_argument("--json", metavar="FILE", help="writes the results as json.")
+    args = parser.parse_args()
+
+    source = args.db
+    if source is None:
+        directory = os.path.join(DATA_DIR, str(args.words))
+        source = os.path.join(directory, 'dictionary.db')
+        if not os.path.exists(source):
+            make_database(args.words, directory)
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        current = os.path.join(tmp, 'dictionary.db')
+        shutil.copy(source, current)
+        # brings a database of an older schema to the current one
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        import db
+        db.get_connection()
+        db.close_connections()
+        os.chdir(cwd)
+
+        v7 = os.path.join(tmp, 'v7.db')
+        shutil.copy(current, v7)
+        _to_v7(v7)
+        for layout, path in (('v7', v7), ('current', current)):
+            report[layout] = dict(_sizes(path), **_latencies(path, QUERIES[layout], args.sample))
+
+    print(f"{'layout':10} {'database MB':>12} {'conjugations MB':>16} {'paradigm us':>12} {'table us':>10}")
+    for layout, r in report.items():
+        print(f"{layout:10} {r['database_mb']:12.1f} {r['conjugations_mb']:16.1f} "
+              f"{r['paradigm_us']:12.1f} {r['table_us']:10.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
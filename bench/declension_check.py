@@ -0,0 +1,103 @@
+""" checks helper.parse_declension on the committed noun pages in
+    bench/fixtures/declension against the declensions in expected.json,
+    without network or pandas. the pages have the table layout of real
+    verbformen pages: bold endings, "(e)", superscript notes and variants
+    after a slash.
+
+    usage: python bench/declension_check.py [--pandas PAGES_DIR]
+
+    --pandas also compares it with the former pandas.read_html based
+    implementation on saved pages (e.g. bench/pages), pandas is only needed
+    for that. pages without a declension table are skipped. exits with 1 on
+    a mismatch.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+from io import StringIO
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from helper import make_soup, parse_declension
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures', 'declension')
+
+def pandas_parse_declension(soup):
+    """ the implementation parse_declension replaced, kept as the reference """
+    import pandas as pd
+
+    def clean_form(cell):
+        if pd.isna(cell):
+            return ''
+        text = re.sub(r"\s+", "", str(cell))
+        text = re.split(r"/", text)[0]
+        text = re.sub(r"\d+", "", text)
+        text = re.sub(r'[\u2070-\u2079]+$', '', text)
+        return text
+
+    def split_article_words(compound):
+        match = re.match(r'^([a-zäöüß]+)([A-ZÄÖÜ].*)$', compound)
+        if match:
+            return match.group(1) + ' ' + match.group(2)
+        return compound
+
+    declension_dict = {'singular': {}, 'plural': {}}
+    cases = ['nominative', 'genitive', 'dative', 'accusative']
+
+    table1_html = soup.select_one("div.vDkl > div.vTbl:nth-of-type(1) > table").prettify()
+    table2_html = soup.select_one("div.vDkl > div.vTbl:nth-of-type(2) > table").prettify()
+
+    sgl = pd.read_html(StringIO(table1_html))[0]
+    if sgl.shape[1] > 2:
+        sgl.iloc[:, 1] = sgl.iloc[:, 1] + '  ' + sgl.iloc[:, 2]
+    plr = pd.read_html(StringIO(table2_html))[0]
+    if plr.shape[1] > 2:
+        plr.iloc[:, 1] = plr.iloc[:, 1] + '  ' + plr.iloc[:, 2]
+
+    for i, case in enumerate(cases):
+        declension_dict['singular'][case] = split_article_words(clean_form(sgl.iloc[i, 1]))
+        declension_dict['plural'][case] = split_article_words(clean_form(plr.iloc[i, 1]))
+    return declension_dict
+
+def _noun_pages(pages_dir: str):
+    """ (file name, soup) of the pages of pages_dir that have a declension table """
+    for page in sorted(f for f in os.listdir(pages_dir) if f.endswith('.html')):
+        with open(os.path.join(pages_dir, page), encoding='utf-8') as f:
+            soup = make_soup(f.read(), full=True)
+        if soup.select_one("div.vDkl > div.vTbl > table") is not None:
+            yield page, soup
+
+def _check(pages, reference, label: str) -> int:
+    """ compares parse_declension with reference(page, soup), returns the
+        number of mismatches
+    """
+    checked, mismatches = 0, 0
+    for page, soup in pages:
+        checked += 1
+        expected = reference(page, soup)
+        actual = parse_declension(soup)
+        if actual != expected:
+            mismatches += 1
+            print(f"{page}: mismatch")
+            print(f"  {label}: {expected}")
+            print(f"  native: {actual}")
+    print(f"{checked} noun pages checked against {label}, {mismatches} mismatches")
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pandas", metavar="PAGES_DIR", help="also compares with the pandas implementation on these pages.")
+    args = parser.parse_args()
+
+    with open(os.path.join(FIXTURES_DIR, 'expected.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+    mismatches = _check(_noun_pages(FIXTURES_DIR), lambda page, soup: expected.get(page), 'expected.json')
+    if args.pandas:
+        mismatches += _check(_noun_pages(args.pandas), lambda page, soup: pandas_parse_declension(soup), 'pandas')
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
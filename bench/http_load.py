@@ -0,0 +1,94 @@
+""" load test of the http service: CONCURRENCY clients, each with its own
+    keep-alive connection, request the endpoints of the given words in a
+    loop and the latencies are reported as p50/p99.
+
+    usage: python bench/http_load.py [--url http://127.0.0.1:8080] [--concurrency 8]
+                                     [--requests 5000] [--etag] [--json FILE] WORD [WORD ...]
+
+    --etag sends the etag of the previous answer as If-None-Match, like a
+    client with an http cache does.
+
+    start the service first, e.g. `german-dict --http 8080`.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit, quote
+from collections import Counter
+
+ENDPOINTS = ('word', 'conjugation', 'declension', 'sentences')
+
+def _percentile(times: list, p: float) -> float:
+    return times[min(len(times) - 1, int(len(times) * p))]
+
+def _client(url, paths: list, count: int, etag: bool, start: threading.Event, results: list):
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80)
+    etags, latencies, statuses = {}, [], Counter()
+    start.wait()
+    for i in range(count):
+        path = paths[i % len(paths)]
+        headers = {'If-None-Match': etags[path]} if etag and path in etags else {}
+        begin = time.perf_counter()
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append((time.perf_counter() - begin) * 1000)
+        statuses[response.status] += 1
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    connection.close()
+    results.append((latencies, statuses))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("words", nargs='+', help="words whose endpoints are requested.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="base url of the service.")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of parallel clients.")
+    parser.add_argument("--requests", type=int, default=5000, help="total number of requests.")
+    parser.add_argument("--etag", action="store_true", help="revalidates with If-None-Match.")
+    parser.add_argument("--json", metavar="FILE", help="writes the results as json.")
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    paths = [f"/{endpoint}/{quote(word)}" for word in args.words for endpoint in ENDPOINTS]
+    per_client = max(1, args.requests // args.concurrency)
+
+    start, results = threading.Event(), []
+    threads = [threading.Thread(target=_client, args=(url, paths, per_client, args.etag, start, results))
+               for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    begin = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - begin
+
+    if len(results) != len(threads):
+        sys.exit("some clients failed, is the service running?")
+    latencies = sorted(ms for client_latencies, _ in results for ms in client_latencies)
+    statuses = sum((client_statuses for _, client_statuses in results), Counter())
+
+    print(f"requests     {len(latencies)} with {args.concurrency} clients in {elapsed:.2f}s")
+    print(f"throughput   {len(latencies) / elapsed:.0f} req/s")
+    print(f"p50          {_percentile(latencies, 0.50):.2f} ms")
+    print(f"p99          {_percentile(latencies, 0.99):.2f} ms")
+    print(f"max          {latencies[-1]:.2f} ms")
+    print(f"statuses     {dict(sorted(statuses.items()))}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'concurrency': args.concurrency,
+                'requests': len(latencies),
+                'seconds': elapsed,
+                'p50_ms': _percentile(latencies, 0.50),
+                'p99_ms': _percentile(latencies, 0.99),
+                'statuses': statuses,
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    main()
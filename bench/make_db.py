@@ -0,0 +1,141 @@
+""" generates a synthetic dictionary.db of made up german looking words:
+    nouns with article and declension, verbs (some reflexive, some with
+    haben/sein variants) with a full conjugation, and adjectives. the same
+    size always gives the same words.
+
+    usage: python bench/make_db.py WORDS [--out DIR] [--conjugated N]
+
+    the database is written to DIR/dictionary.db, bench/data/WORDS by
+    default. only the first N verbs get a conjugation (108 rows each), so
+    that the 1M words database stays a few gigabytes smaller.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_CONJUGATED = 20000
+BATCH_SIZE = 10000
+
+SYLLABLES = ['ba', 'lä', 'schu', 'ro', 'ge', 'fü', 'ter', 'mo', 'ka', 'wi', 'ßel', 'dor',
+             'stra', 'hö', 'pen', 'lu', 'mar', 'zei', 'brü', 'no', 'sta', 'ke', 'tür', 'fa',
+             'sil', 'gö', 'wan', 'del', 'schä', 'ri', 'hu', 'ne', 'pfa', 'bö', 'tal', 'mi']
+ARTICLES = {'der': 'masculine', 'die': 'feminine', 'das': 'neutral'}
+PRONOUNS = ('ich', 'du', 'er', 'wir', 'ihr', 'sie')
+TENSES = {
+    'simple': ('present', 'imperfect', 'present subj.', 'imperf. subj.'),
+    'indicative': ('present', 'imperfect', 'perfect', 'pluperfect', 'future', 'future perfect'),
+    'subjunctive': ('present subj.', 'imperf. subj.', 'perfect subj.', 'pluperf. subj.',
+                    'future subj.', 'fut. perf. subj.'),
+    'conditional': ('present cond.', 'past cond.'),
+}
+
+def stem(i: int) -> str:
+    """ a distinct stem of at least three syllables for every i """
+    parts = []
+    i += len(SYLLABLES) ** 2
+    while i:
+        i, digit = divmod(i, len(SYLLABLES))
+        parts.append(SYLLABLES[digit])
+    return ''.join(parts)
+
+def synthetic_words(count: int, seed: int = 0):
+    """ yields (word, type, gender) for `count` entries """
+    rng = random.Random(seed)
+    i = 0
+    while count > 0:
+        s = stem(i)
+        i += 1
+        kind = rng.random()
+        if kind < 0.40:
+            article = rng.choice(list(ARTICLES))
+            yield f"{article} {s.capitalize()}", 'noun', ARTICLES[article]
+            count -= 1
+        elif kind < 0.75:
+            verb = s + 'en'
+            roll = rng.random()
+            if roll < 0.10:
+                yield f"sich {verb}", 'verb', None
+                count -= 1
+            elif roll < 0.15 and count >= 2:
+                yield f"{verb} (haben)", 'verb', None
+                yield f"{verb} (sein)", 'verb', None
+                count -= 2
+            else:
+                yield verb, 'verb', None
+                count -= 1
+        else:
+            yield s + 'ig', 'adjective', None
+            count -= 1
+
+def _conjugation(verb: str) -> dict:
+    return {mood: {tense: {p: f"{p[:2]}{tense[:3]}{verb}" for p in PRONOUNS} for tense in tenses}
+            for mood, tenses in TENSES.items()}
+
+def _declension(noun: str) -> dict:
+    article, name = noun.split(' ', 1)
+    return {'singular': {'nominative': noun, 'genitive': f"des {name}s", 'dative': f"dem {name}",
+                         'accusative': noun},
+            'plural': {'nominative': f"die {name}e", 'genitive': f"der {name}e",
+                       'dative': f"den {name}en", 'accusative': f"die {name}e"}}
+
+def make_database(count: int, directory: str, conjugated: int = DEFAULT_CONJUGATED):
+    """ writes the synthetic database of `count` words to directory/dictionary.db """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'dictionary.db')
+    if os.path.exists(path):
+        os.remove(path)
+
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        from init_db import initialize_database
+        import db
+        initialize_database()
+        rng = random.Random(1)
+        definition_ids = [db.add_definition_to_database(f"meaning {n}") for n in range(1000)]
+        verbs = 0
+        words = synthetic_words(count)
+        while True:
+            batch = [entry for _, entry in zip(range(BATCH_SIZE), words)]
+            if not batch:
+                break
+            with db.transaction() as conn:
+                for word, type_, gender in batch:
+                    is_verb, is_noun = type_ == 'verb', type_ == 'noun'
+                    inserted = db.add_word_to_database((word, db.get_gender_id(gender), 0 if is_verb else None, 1,
+                                                        0 if is_verb else None, rng.choice(definition_ids),
+                                                        db.get_type_id(type_), int(is_noun), int(is_verb)))
+                    if not inserted:
+                        continue
+                    if is_verb and verbs < conjugated:
+                        verbs += 1
+                        word_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+                        db.add_conjugation_to_db(_conjugation(word.split(' ')[-1]), word_id)
+                    elif is_noun:
+                        word_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+                        db.add_declension_to_db(_declension(word), word_id)
+        db.close_connections()
+    finally:
+        os.chdir(cwd)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("words", type=int, help="number of words.")
+    parser.add_argument("--out", help="directory of the database, bench/data/WORDS by default.")
+    parser.add_argument("--conjugated", type=int, default=DEFAULT_CONJUGATED, help="number of verbs with a conjugation.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = make_database(args.words, args.out or os.path.join(DATA_DIR, str(args.words)), args.conjugated)
+    print(f"{path}: {args.words} words, {os.path.getsize(path) / 2 ** 20:.1f} MB "
+          f"in {time.perf_counter() - start:.1f}s")
+
+if __name__ == '__main__':
+    main()
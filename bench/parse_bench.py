@@ -0,0 +1,91 @@
+""" times parsing of saved verbformen pages, whole page against page
+    sections only, and reports the peak memory of each.
+
+    usage: python bench/parse_bench.py [PAGES_DIR] [--repeat N] [--json FILE]
+
+    PAGES_DIR holds saved pages as *.html files, bench/pages by default, or
+    the committed bench/stub_pages while bench/pages is empty.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+import tracemalloc
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper import make_soup
+from ingest import parse_page
+from save_pages import default_pages_dir
+
+# (name, full, builder)
+MODES = [
+    ('full html.parser', True, 'html.parser'),
+    ('sections html.parser', False, 'html.parser'),
+]
+# make_soup falls back to html.parser without lxml, the row would repeat
+# the one above under a wrong name
+if importlib.util.find_spec('lxml') is not None:
+    MODES.append(('sections lxml', False, 'lxml'))
+
+def _parse(html, full, builder):
+    return parse_page(make_soup(html, full, builder))
+
+def bench_page(html: str, repeat: int) -> dict:
+    results = {}
+    reference = _parse(html, True, 'html.parser')
+    for name, full, builder in MODES:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            record = _parse(html, full, builder)
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        _parse(html, full, builder)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            'median_ms': median(times) * 1000,
+            'peak_kb': peak / 1024,
+            'same_result': record == reference,
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pages", nargs="?", default=default_pages_dir(), help="directory of saved *.html pages.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per page and mode.")
+    parser.add_argument("--json", metavar="FILE", help="writes the results as json.")
+    args = parser.parse_args()
+
+    pages = sorted(f for f in os.listdir(args.pages) if f.endswith('.html'))
+    if not pages:
+        sys.exit(f"no *.html pages in {args.pages}")
+
+    report = {}
+    for page in pages:
+        with open(os.path.join(args.pages, page), encoding='utf-8') as f:
+            report[page] = bench_page(f.read(), args.repeat)
+
+    print(f"{'page':24} {'mode':22} {'median ms':>10} {'peak kb':>10}  same")
+    for page, results in report.items():
+        for name, r in results.items():
+            print(f"{page:24} {name:22} {r['median_ms']:10.2f} {r['peak_kb']:10.0f}  {r['same_result']}")
+
+    print()
+    for name, _, _ in MODES:
+        total = sum(results[name]['median_ms'] for results in report.values())
+        peak = max(results[name]['peak_kb'] for results in report.values())
+        print(f"{name:22} total {total:8.2f} ms  max peak {peak:8.0f} kb")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+""" runs PROCESSES processes that download pages from tools/verbformen_stub.py
+    started with --rate, like parallel `german-dict --crawl` runs in one
+    directory do, and reports the pages per second, the 429 answers of the
+    stub and the pages that failed, for
+      before    a plain requests.get, a 429 is a failed page
+      retries   http_cache.download without the rate limit: backoff and
+                Retry-After, but every process on its own
+      limiter   http_cache.download with the rate limit the processes share
+
+    usage: python bench/rate_limit_bench.py [--processes 4] [--pages 50] [--rate 10]
+                                            [--modes before,retries,limiter] [--json FILE]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from collections import Counter
+from urllib.request import urlopen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ('before', 'retries', 'limiter')
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _stub_429s(base_url: str) -> int:
+    with urlopen(f"{base_url}/stats") as r:
+        return json.load(r).get('429', 0)
+
+def _worker(directory: str, mode: str, base_url: str, index: int, pages: int, results):
+    os.chdir(directory)
+    import requests
+    import http_cache
+    if mode == 'retries':
+        http_cache._take_token = lambda host: 0.0
+        http_cache._adjust_rate = lambda host, slow_down, pause=0: time.sleep(pause)
+    statuses = Counter()
+    for i in range(pages):
+        url = f"{base_url}/?w={mode}{index}x{i}en"
+        try:
+            if mode == 'before':
+                status = requests.get(url).status_code
+            else:
+                status = http_cache.download(url).status_code
+        except Exception as e:
+            status = type(e).__name__
+        statuses[status] += 1
+    results.put(statuses)
+
+def _run(mode: str, base_url: str, processes: int, pages: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        results = multiprocessing.Queue()
+        answered_429 = _stub_429s(base_url)
+        start = time.perf_counter()
+        workers = [multiprocessing.Process(target=_worker, args=(directory, mode, base_url, i, pages, results))
+                   for i in range(processes)]
+        for worker in workers:
+            worker.start()
+        statuses = sum((results.get() for _ in workers), Counter())
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'pages': statuses[200], 'pages_per_s': statuses[200] / elapsed,
+            'failed': sum(statuses.values()) - statuses[200], 'answered_429': _stub_429s(base_url) - answered_429}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4, help="number of downloading processes.")
+    parser.add_argument("--pages", type=int, default=50, help="pages each process downloads.")
+    parser.add_argument("--rate", type=float, default=10, help="requests per second the stub answers.")
+    parser.add_argument("--modes", default=','.join(MODES), help="comma separated modes to run.")
+    parser.add_argument("--json", metavar="FILE", help="writes the results as json.")
+    args = parser.parse_args()
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, 'tools', 'verbformen_stub.py'),
+                             '--port', str(port), '--rate', str(args.rate)], stdout=subprocess.DEVNULL)
+    try:
+        for _ in range(50):
+            try:
+                _stub_429s(base_url)
+                break
+            except OSError:
+                time.sleep(0.1)
+        report = {mode: _run(mode, base_url, args.processes, args.pages) for mode in args.modes.split(',')}
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print(f"{args.processes} processes x {args.pages} pages, stub answers {args.rate:g} requests/s")
+    print(f"{'mode':10} {'seconds':>8} {'pages':>6} {'pages/s':>8} {'failed':>7} {'429s':>6}")
+    for mode, r in report.items():
+        print(f"{mode:10} {r['seconds']:8.1f} {r['pages']:6d} {r['pages_per_s']:8.2f} "
+              f"{r['failed']:7d} {r['answered_429']:6d}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(report, processes=args.processes, pages=args.pages, rate=args.rate), f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+""" the offline benchmark suite: parsing of the saved pages in bench/pages
+    (the committed bench/stub_pages until real pages are saved, see
+    bench/save_pages.py), and the lookups on synthetic databases of each size.
+
+    usage: python bench/run.py [--sizes 1000,100000] [--pages DIR] [--runs N]
+                               [--json FILE] [--compare OLD.json]
+
+    parse      parse_word_descriptors, parse_conjugation and parse_declension
+               per page, on the page sections (see bench/save_pages.py)
+    lookup     get_fuzzy_matches for stored and unknown words,
+               get_folded_matches for spellings without umlauts, and the
+               wall time of a cached `main.py WORD` lookup
+
+    the databases are made by bench/make_db.py into bench/data once and
+    reused. --compare prints every timing next to the one of an older run.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+from statistics import median
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from make_db import DATA_DIR, make_database
+from save_pages import default_pages_dir
+
+MAIN = os.path.join(ROOT, 'main.py')
+SAMPLE_SIZE = 200
+
+def _timed(func, args_list: list) -> dict:
+    """ median and p99 in microseconds of func(*args) over args_list """
+    times = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        times.append((time.perf_counter() - start) * 1e6)
+    times.sort()
+    return {'median_us': median(times), 'p99_us': times[min(len(times) - 1, int(len(times) * 0.99))]}
+
+def bench_parse(pages_dir: str, runs: int) -> dict:
+    from ingest import page_soup
+    from helper import parse_word_descriptors, parse_conjugation, parse_declension
+
+    report = {}
+    for name in sorted(os.listdir(pages_dir)):
+        if not name.endswith('.html'):
+            continue
+        with open(os.path.join(pages_dir, name), encoding='utf-8') as f:
+            html = f.read()
+        soup = page_soup(html)
+        word_type = parse_word_descriptors(soup)[1]
+        results = {
+            'page_soup': _timed(page_soup, [(html,)] * runs),
+            'parse_word_descriptors': _timed(parse_word_descriptors, [(soup,)] * runs),
+        }
+        if word_type == 'verb':
+            results['parse_conjugation'] = _timed(parse_conjugation, [(soup,)] * runs)
+        elif word_type == 'noun':
+            results['parse_declension'] = _timed(parse_declension, [(soup,)] * runs)
+        report[name] = results
+    return report
+
+def _unfold(word: str) -> str:
+    # how a word is typed without a german keyboard
+    for src, dst in (('ä', 'a'), ('ö', 'o'), ('ü', 'u'), ('ß', 'ss')):
+        word = word.replace(src, dst)
+    return word
+
+def _wall_ms(cmd: list, env: dict, runs: int) -> dict:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       stdin=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': median(times), 'max_ms': max(times)}
+
+def bench_lookup(size: int, runs: int) -> dict:
+    directory = os.path.join(DATA_DIR, str(size))
+    if not os.path.exists(os.path.join(directory, 'dictionary.db')):
+        print(f"generating the {size} words database ...")
+        make_database(size, directory)
+
+    import db
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        conn = db.get_connection()
+        total = conn.execute('SELECT COUNT(*) FROM words').fetchone()[0]
+        step = max(1, total // SAMPLE_SIZE)
+        sample = [w for w, in conn.execute('SELECT word FROM words WHERE id % ? = 0 LIMIT ?', (step, SAMPLE_SIZE))]
+        # the last token, as typed: "Haus" for "das Haus", "freuen" for "sich freuen"
+        typed = [w.split(' ')[-1] if not w.endswith(')') else w.split(' ')[0] for w in sample]
+        unknown = [f"xq{w}zz" for w in typed]
+        umlauts = [w for w in typed if _unfold(w) != w] or typed
+        verb = conn.execute("SELECT word FROM words WHERE word NOT LIKE '% %' AND have_conjugaison = 1 LIMIT 1").fetchone()[0]
+
+        report = {
+            'words': total,
+            'get_fuzzy_matches_hit': _timed(db.get_fuzzy_matches, [(w,) for w in typed]),
+            'get_fuzzy_matches_miss': _timed(db.get_fuzzy_matches, [(w,) for w in unknown]),
+            'get_folded_matches': _timed(db.get_folded_matches, [(_unfold(w),) for w in umlauts]),
+        }
+        db.close_connections()
+        env = dict(os.environ, GERMAN_DICT_DIR=directory)
+        report['cached_lookup'] = _wall_ms([sys.executable, MAIN, verb, '--local'], env, runs)
+    finally:
+        os.chdir(cwd)
+    return report
+
+def _flatten(report: dict, prefix: str = '') -> dict:
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}/"))
+        elif key.endswith(('_us', '_ms')):
+            flat[prefix + key] = value
+    return flat
+
+def compare(old: dict, new: dict):
+    old, new = _flatten(old), _flatten(new)
+    print(f"\n{'metric':70} {'old':>10} {'new':>10} {'new/old':>8}")
+    for key in sorted(new):
+        if key in old and old[key]:
+            print(f"{key:70} {old[key]:10.1f} {new[key]:10.1f} {new[key] / old[key]:8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,100000", help="comma separated database sizes, e.g. 1000,100000,1000000.")
+    parser.add_argument("--pages", default=default_pages_dir(), help="directory of saved *.html pages.")
+    parser.add_argument("--runs", type=int, default=20, help="runs per page and of the cached lookup.")
+    parser.add_argument("--json", metavar="FILE", help="writes the results as json.")
+    parser.add_argument("--compare", metavar="FILE", help="json of an older run to compare with.")
+    args = parser.parse_args()
+
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                            capture_output=True, text=True).stdout.strip()
+    report = {
+        'meta': {'commit': commit, 'python': platform.python_version(), 'machine': platform.machine(),
+                 'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'pages': os.path.relpath(args.pages, ROOT)},
+        'parse': {},
+        'lookup': {},
+    }
+
+    if os.path.isdir(args.pages) and any(f.endswith('.html') for f in os.listdir(args.pages)):
+        report['parse'] = bench_parse(args.pages, args.runs)
+    else:
+        print(f"no saved pages in {args.pages}, run bench/save_pages.py (--stub) first; skipping parse")
+    for size in (int(s) for s in args.sizes.split(',') if s):
+        report['lookup'][str(size)] = bench_lookup(size, args.runs)
+    # what the cached lookups cannot go below
+    report['interpreter'] = _wall_ms([sys.executable, '-c', 'pass'], dict(os.environ), args.runs)
+
+    for page, results in report['parse'].items():
+        for name, r in results.items():
+            print(f"{page:30} {name:24} {r['median_us']:10.1f} us  p99 {r['p99_us']:10.1f} us")
+    for size, results in report['lookup'].items():
+        print(f"\n{size} words")
+        for name, r in results.items():
+            if name == 'cached_lookup':
+                print(f"  {name:28} {r['median_ms']:10.1f} ms  max {r['max_ms']:10.1f} ms")
+            elif isinstance(r, dict):
+                print(f"  {name:28} {r['median_us']:10.1f} us  p99 {r['p99_us']:10.1f} us")
+
+    print(f"\n  {'python -c pass':28} {report['interpreter']['median_ms']:10.1f} ms")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
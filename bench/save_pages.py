@@ -0,0 +1,95 @@
+""" saves the verbformen pages of the words in bench/corpus.txt, and the
+    pages of their conjugation variants (haben/sein), as bench/pages/*.html
+    for the offline benchmarks.
+
+    usage: python bench/save_pages.py [--corpus FILE] [--out DIR] [--delay SECONDS] [--stub]
+
+    pages that are saved already are skipped. verbformen rate limits, keep
+    the delay at a second or more.
+
+    the real pages are not ours to redistribute, bench/pages is not
+    committed. --stub writes the pages of tools/verbformen_stub.py for the
+    same words into bench/stub_pages instead, without network. that corpus
+    is committed, so the benchmarks run out of the box; its pages have the
+    layout and about the size of real ones, but simpler tables.
+"""
+import os
+import sys
+import time
+import argparse
+from urllib.parse import urlsplit, parse_qs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from ingest import word_url, page_soup
+from helper import get_verb_variants
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(BENCH_DIR, 'pages')
+STUB_PAGES_DIR = os.path.join(BENCH_DIR, 'stub_pages')
+
+def read_corpus(path: str) -> list:
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+def page_file(out: str, name: str) -> str:
+    return os.path.join(out, name.replace(' ', '_').replace('/', '_') + '.html')
+
+def default_pages_dir() -> str:
+    """ bench/pages once real pages are saved there, the committed
+        bench/stub_pages until then
+    """
+    if os.path.isdir(PAGES_DIR) and any(f.endswith('.html') for f in os.listdir(PAGES_DIR)):
+        return PAGES_DIR
+    return STUB_PAGES_DIR
+
+def _stub_page(url: str) -> str:
+    from verbformen_stub import verbformen_page
+    query = parse_qs(urlsplit(url).query)
+    return verbformen_page(query['w'][0], query.get('aux', [None])[0])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=os.path.join(BENCH_DIR, 'corpus.txt'), help="word list.")
+    parser.add_argument("--out", help="directory of the pages, bench/pages or with --stub bench/stub_pages.")
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds between two downloads.")
+    parser.add_argument("--stub", help="writes the pages of tools/verbformen_stub.py, without network.", action="store_true")
+    args = parser.parse_args()
+    out = args.out or (STUB_PAGES_DIR if args.stub else PAGES_DIR)
+    os.makedirs(out, exist_ok=True)
+
+    def download(name: str, url: str):
+        import requests
+        r = requests.get(url, timeout=30)
+        time.sleep(args.delay)
+        if r.status_code != 200:
+            sys.stderr.write(f"{name}: http status {r.status_code}\n")
+            return None
+        return r.text
+
+    def save(name: str, url: str):
+        path = page_file(out, name)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        html = _stub_page(url) if args.stub else download(name, url)
+        if html is None:
+            return None
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f"saved {path}")
+        return html
+
+    for word in read_corpus(args.corpus):
+        html = save(word, word_url(word))
+        if html is None:
+            continue
+        variants = get_verb_variants(page_soup(html))
+        if len(variants) > 1:
+            for label, url in variants:
+                save(f"{word} ({label})", url)
+
+if __name__ == '__main__':
+    main()
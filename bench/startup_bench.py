@@ -0,0 +1,97 @@
+""" measures the start-up cost of a cached lookup: the import time of each
+    module main.py loads, and the wall time of `main.py WORD` for a word
+    that is already stored, next to a bare interpreter start.
+
+    usage: python bench/startup_bench.py [--runs N] [--json FILE]
+
+    runs against a throw-away database in a temporary GERMAN_DICT_DIR.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from statistics import median
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MAIN = os.path.join(ROOT, 'main.py')
+WORD = 'laufen'
+
+def _create_database(directory: str):
+    # the db module works on the current directory, like main.py does
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        from init_db import initialize_database
+        from db import add_definition_to_database, add_word_to_database, get_type_id, close_connections
+        initialize_database()
+        definition_id = add_definition_to_database('run, walk')
+        add_word_to_database((WORD, None, 1, 0, 0, definition_id, get_type_id('verb'), 0, 1))
+        close_connections()
+    finally:
+        os.chdir(cwd)
+
+def _wall_times(cmd: list, env: dict, runs: int) -> list:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)
+
+def _import_times(env: dict) -> dict:
+    """ cumulative import time in ms of every top level import of main.py """
+    r = subprocess.run([sys.executable, '-X', 'importtime', MAIN, WORD], env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    imports = {}
+    for line in r.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # only the modules imported directly, not their dependencies
+        if name.startswith('  '):
+            continue
+        imports[name.strip()] = int(cumulative) / 1000
+    return imports
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20, help="number of timed runs.")
+    parser.add_argument("--json", metavar="FILE", help="writes the results as json.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        _create_database(directory)
+        env = dict(os.environ, GERMAN_DICT_DIR=directory)
+
+        imports = _import_times(env)
+        baseline = _wall_times([sys.executable, '-c', 'pass'], env, args.runs)
+        lookup = _wall_times([sys.executable, MAIN, WORD], env, args.runs)
+
+    print(f"{'module':30} {'import ms':>10}")
+    for name, ms in sorted(imports.items(), key=lambda x: -x[1]):
+        print(f"{name:30} {ms:10.2f}")
+    print()
+
+    def p90(times):
+        return times[int(len(times) * 0.9) - 1]
+
+    print(f"{'':30} {'median ms':>10} {'p90 ms':>10}")
+    print(f"{'python -c pass':30} {median(baseline):10.2f} {p90(baseline):10.2f}")
+    print(f"{'main.py ' + WORD:30} {median(lookup):10.2f} {p90(lookup):10.2f}")
+    print(f"{'main.py over interpreter':30} {median(lookup) - median(baseline):10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'imports_ms': imports,
+                'interpreter_ms': baseline,
+                'lookup_ms': lookup,
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+""" runs READERS reader processes and WRITERS writer processes against one
+    database for a while, and reports the operations per second and the
+    errors of each side.
+
+    usage: python bench/stress_db.py [--readers 4] [--writers 2] [--seconds 10]
+                                     [--db FILE] [--json FILE]
+
+    writers store new verbs with a conjugation through add_word_entry, like
+    parallel `german-dict` ingests do, readers look up random stored words
+    like cached lookups do. without --db it runs on a throw-away database.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEED_WORDS = 200
+
+def _conjugation(word: str) -> dict:
+    stem = word[:-2]
+    return {'simple': {'present': {'ich': stem + 'e', 'du': stem + 'st', 'er': stem + 't',
+                                   'wir': word, 'ihr': stem + 't', 'sie': word}}}
+
+def _writer(directory: str, index: int, deadline: float, results):
+    os.chdir(directory)
+    import db
+    done, errors = 0, Counter()
+    while time.time() < deadline:
+        word = f"w{index}x{done}en"
+        try:
+            db.add_word_entry(word, f"definition of {word}", 'verb', auxiliary=0,
+                              conjugation_dict=_conjugation(word))
+            done += 1
+        except Exception as e:
+            errors[f"{type(e).__name__}: {e}"] += 1
+    results.put(('writer', done, errors))
+
+def _reader(directory: str, index: int, deadline: float, results):
+    os.chdir(directory)
+    import db
+    rng = random.Random(index)
+    done, errors = 0, Counter()
+    while time.time() < deadline:
+        word = f"seed{rng.randrange(SEED_WORDS)}en"
+        try:
+            word_id = db.get_word_id(word)
+            db.get_word_entry(word_id)
+            db.get_conjugation_table(word_id)
+            done += 1
+        except Exception as e:
+            errors[f"{type(e).__name__}: {e}"] += 1
+    results.put(('reader', done, errors))
+
+def _create_database(directory: str):
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        from init_db import initialize_database
+        import db
+        if not db.is_database_created():
+            initialize_database()
+        with db.transaction():
+            for i in range(SEED_WORDS):
+                word = f"seed{i}en"
+                db.add_word_entry(word, f"definition of {word}", 'verb', auxiliary=0,
+                                  conjugation_dict=_conjugation(word))
+        db.close_connections()
+    finally:
+        os.chdir(cwd)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=4, help="number of reader processes.")
+    parser.add_argument("--writers", type=int, default=2, help="number of writer processes.")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of the run.")
+    parser.add_argument("--db", metavar="FILE", help="database to run against, it is written to.")
+    parser.add_argument("--json", metavar="FILE", help="writes the results as json.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.dirname(os.path.abspath(args.db)) if args.db else tmp
+        if args.db and os.path.basename(args.db) != 'dictionary.db':
+            sys.exit("--db has to point to a file named dictionary.db")
+        _create_database(directory)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + args.seconds
+        processes = [multiprocessing.Process(target=_writer, args=(directory, i, deadline, results))
+                     for i in range(args.writers)]
+        processes += [multiprocessing.Process(target=_reader, args=(directory, i, deadline, results))
+                      for i in range(args.readers)]
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    summary = {}
+    for side in ('writer', 'reader'):
+        done = sum(report[1] for report in reports if report[0] == side)
+        errors = sum((report[2] for report in reports if report[0] == side), Counter())
+        summary[side] = {'ops': done, 'ops_per_s': done / args.seconds, 'errors': dict(errors)}
+        print(f"{side}s  {done:8d} ops  {done / args.seconds:10.1f} ops/s  {sum(errors.values()):6d} errors")
+        for message, count in errors.most_common(5):
+            print(f"    {count:6d}  {message}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(summary, readers=args.readers, writers=args.writers, seconds=args.seconds), f, indent=2)
+
+if __name__ == '__main__':
+    main()
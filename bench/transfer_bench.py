@@ -0,0 +1,155 @@
+""" times the dump import and export on a synthetic dictionary: a dump of
+    WORDS made up words (regular verbs with a full conjugation and nouns
+    with a declension, in the forms verbformen gives, adjectives, all with
+    example sentences) is imported into
+    an empty database, exported again and imported a second time, which
+    merges every word into the existing ones.
+
+    usage: python bench/transfer_bench.py [--words 100000] [--json FILE]
+
+    each step runs in its own process, so that its peak memory is its own.
+    the peak rss includes the database pages mapped by sqlite, up to
+    db.MMAP_SIZE.
+"""
+import os
+import sys
+import json
+import gzip
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PRONOUNS = ('ich', 'du', 'er', 'wir', 'ihr', 'sie')
+# the forms of a regular verb, as verbformen lists them: endings of the
+# stem, or an auxiliary per pronoun and the participle or infinitive
+PRESENT = ('e', 'st', 't', 'en', 't', 'en')
+PAST = ('te', 'test', 'te', 'ten', 'tet', 'ten')
+SUBJ = ('e', 'est', 'e', 'en', 'et', 'en')
+HABEN = ('habe', 'hast', 'hat', 'haben', 'habt', 'haben')
+HABE = ('habe', 'habest', 'habe', 'haben', 'habet', 'haben')
+HATTE = ('hatte', 'hattest', 'hatte', 'hatten', 'hattet', 'hatten')
+HAETTE = ('hätte', 'hättest', 'hätte', 'hätten', 'hättet', 'hätten')
+WERDEN = ('werde', 'wirst', 'wird', 'werden', 'werdet', 'werden')
+WUERDE = ('würde', 'würdest', 'würde', 'würden', 'würdet', 'würden')
+
+def _letters(i: int) -> str:
+    # forms are indexed by their letters, digits would be dropped
+    letters = ''
+    while True:
+        i, r = divmod(i, 26)
+        letters += 'abcdefghijklmnopqrstuvwxyz'[r]
+        if not i:
+            return letters
+
+def _conjugation(word: str) -> dict:
+    stem, participle = word[:-2], f"ge{word[:-2]}t"
+
+    def tense(forms):
+        return dict(zip(PRONOUNS, forms))
+
+    present = tense(stem + e for e in PRESENT)
+    past = tense(stem + e for e in PAST)
+    subj = tense(stem + e for e in SUBJ)
+    future = tense(f"{a} {word}" for a in WERDEN)
+    future_perfect = tense(f"{a} {participle} haben" for a in WERDEN)
+    return {
+        'simple': {'present': present, 'imperfect': past, 'present subj.': subj, 'imperf. subj.': past},
+        'indicative': {'present': present, 'imperfect': past,
+                       'perfect': tense(f"{a} {participle}" for a in HABEN),
+                       'pluperfect': tense(f"{a} {participle}" for a in HATTE),
+                       'future': future, 'future perfect': future_perfect},
+        'subjunctive': {'present subj.': subj, 'imperf. subj.': past,
+                        'perfect subj.': tense(f"{a} {participle}" for a in HABE),
+                        'pluperf. subj.': tense(f"{a} {participle}" for a in HAETTE),
+                        'future subj.': future, 'fut. perf. subj.': future_perfect},
+        'conditional': {'present cond.': tense(f"{a} {word}" for a in WUERDE),
+                        'past cond.': tense(f"{a} {participle} haben" for a in WUERDE)},
+    }
+
+def _record(i: int) -> dict:
+    kind = ('verb', 'noun', 'adjective')[i % 3]
+    word = f"wort{i}"
+    record = {'word': word, 'type': kind, 'gender': None, 'definition': f"meaning {i % 5000}",
+              'auxiliary': None, 'regular': 1, 'separable': None, 'conjugation': None,
+              'declension': None,
+              'sentences': [[f"Das ist Satz {n} mit {word}.", f"This is sentence {n} with {word}."]
+                            for n in range(5)]}
+    if kind == 'verb':
+        record['word'] = word = f"wort{_letters(i)}en"
+        record.update(auxiliary=0, separable=0)
+        record['conjugation'] = _conjugation(word)
+    elif kind == 'noun':
+        noun = f"Wort{_letters(i)}"
+        record['word'] = f"das {noun}"
+        record['gender'] = 'neutral'
+        record['declension'] = {
+            'singular': {'nominative': f"das {noun}", 'genitive': f"des {noun}(e)s",
+                         'dative': f"dem {noun}(e)", 'accusative': f"das {noun}"},
+            'plural': {'nominative': f"die {noun}e", 'genitive': f"der {noun}e",
+                       'dative': f"den {noun}en", 'accusative': f"die {noun}e"},
+        }
+    return record
+
+def _write_dump(path: str, words: int):
+    from transfer import DUMP_FORMAT, DUMP_VERSION
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps({'format': DUMP_FORMAT, 'version': DUMP_VERSION}) + '\n')
+        for i in range(words):
+            f.write(json.dumps(_record(i), ensure_ascii=False) + '\n')
+
+def _step(directory: str, step: str, path: str, results):
+    os.chdir(directory)
+    import db
+    from transfer import import_dictionary, export_dictionary
+    if not db.is_database_created():
+        from init_db import initialize_database
+        initialize_database()
+    start = time.perf_counter()
+    if step == 'export':
+        export_dictionary(path)
+    else:
+        import_dictionary(path)
+    db.close_connections()
+    results.put((time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=100000, help="number of words in the dump.")
+    parser.add_argument("--json", metavar="FILE", help="writes the results as json.")
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.ndjson.gz')
+        exported = os.path.join(directory, 'export.ndjson.gz')
+        _write_dump(source, args.words)
+
+        results = multiprocessing.Queue()
+        for name, step, path in (('import into empty', 'import', source),
+                                 ('export', 'export', exported),
+                                 ('import merge', 'import', exported)):
+            process = multiprocessing.Process(target=_step, args=(directory, step, path, results))
+            process.start()
+            seconds, peak_mb = results.get()
+            process.join()
+            report[name] = {'seconds': seconds, 'words_per_s': args.words / seconds, 'peak_rss_mb': peak_mb}
+        report['dump_mb'] = os.path.getsize(exported) / 2 ** 20
+        report['database_mb'] = os.path.getsize(os.path.join(directory, 'dictionary.db')) / 2 ** 20
+
+    print(f"{'':20} {'seconds':>8} {'words/s':>10} {'peak rss MB':>12}")
+    for name in ('import into empty', 'export', 'import merge'):
+        r = report[name]
+        print(f"{name:20} {r['seconds']:8.1f} {r['words_per_s']:10.0f} {r['peak_rss_mb']:12.1f}")
+    print(f"dump {report['dump_mb']:.1f} MB, database {report['database_mb']:.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(report, words=args.words), f, indent=2)
+
+if __name__ == '__main__':
+    main()
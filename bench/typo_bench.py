@@ -0,0 +1,142 @@
+""" recall and latency of the lookups for misspelled words: stored words
+    get one typo of each kind (a letter replaced, swapped with the next,
+    deleted, doubled, an umlaut typed without dots) or two replaced
+    letters, and are looked up
+      before   as main.py did: get_fuzzy_matches, then get_folded_matches
+      after    the same, then get_typo_matches
+    recall is the share of lookups that offer the stored word at all, top 1
+    the share where it is the first one offered.
+
+    usage: python bench/typo_bench.py [--db FILE] [--words 100000] [--sample 500]
+                                      [--json FILE]
+
+    without --db a synthetic database of --words words is made with
+    bench/make_db.py.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from statistics import median
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from make_db import DATA_DIR, make_database
+
+LETTERS = 'abcdefghiklmnoprstuvwz'
+UMLAUTS = {'ä': 'a', 'ö': 'o', 'ü': 'u', 'ß': 's'}
+
+def _replace(rng, w):
+    i = rng.randrange(1, len(w))
+    return w[:i] + rng.choice(LETTERS.replace(w[i].lower(), '')) + w[i + 1:]
+
+def _swap(rng, w):
+    i = rng.randrange(1, len(w) - 1)
+    return w[:i] + w[i + 1] + w[i] + w[i + 2:]
+
+def _delete(rng, w):
+    i = rng.randrange(1, len(w))
+    return w[:i] + w[i + 1:]
+
+def _double(rng, w):
+    i = rng.randrange(1, len(w))
+    return w[:i] + w[i] + w[i:]
+
+def _no_dots(rng, w):
+    positions = [i for i, c in enumerate(w) if c in UMLAUTS]
+    if not positions:
+        return None
+    i = rng.choice(positions)
+    return w[:i] + UMLAUTS[w[i]] + w[i + 1:]
+
+def _two_replaced(rng, w):
+    return _replace(rng, _replace(rng, w)) if len(w) >= 9 else None
+
+TYPOS = {
+    'replaced': _replace,
+    'swapped': _swap,
+    'deleted': _delete,
+    'doubled': _double,
+    'no dots': _no_dots,
+    'two replaced': _two_replaced,
+}
+
+def _before(db, typed: str) -> list:
+    """ the words main.py offered before get_typo_matches """
+    return [entry for _, entry in db.get_fuzzy_matches(typed) or db.get_folded_matches(typed)]
+
+def _after(db, typed: str) -> list:
+    return _before(db, typed) or [entry for _, entry in db.get_typo_matches(typed)]
+
+def _percentile(times: list, p: float) -> float:
+    times = sorted(times)
+    return times[min(len(times) - 1, int(len(times) * p))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", metavar="FILE", help="dictionary.db to look up in.")
+    parser.add_argument("--words", type=int, default=100000, help="size of the synthetic database without --db.")
+    parser.add_argument("--sample", type=int, default=500, help="misspelled words per kind of typo.")
+    parser.add_argument("--json", metavar="FILE", help="writes the results as json.")
+    args = parser.parse_args()
+
+    path = args.db
+    if path is None:
+        directory = os.path.join(DATA_DIR, str(args.words))
+        path = os.path.join(directory, 'dictionary.db')
+        if not os.path.exists(path):
+            make_database(args.words, directory)
+    path = os.path.abspath(path)
+
+    import db
+    os.chdir(os.path.dirname(path))
+    conn = db.get_connection()
+    entries = [word for word, in conn.execute('SELECT word FROM words')]
+    rng = random.Random(1)
+
+    report = {'words': len(entries), 'typos': {}}
+    latencies = {'before': [], 'after': [], 'get_typo_matches': []}
+    for kind, typo in TYPOS.items():
+        counts = {'lookups': 0, 'before': 0, 'before_top1': 0, 'after': 0, 'after_top1': 0}
+        attempts = 0
+        while counts['lookups'] < args.sample and attempts < args.sample * 20:
+            attempts += 1
+            entry = rng.choice(entries)
+            # the longest token, as it is typed: "Geschwindigkeit" of "die Geschwindigkeit"
+            token = max(entry.split(' '), key=len)
+            typed = typo(rng, token) if len(token) >= db.TYPO_MIN_LENGTH and token.isalpha() else None
+            if typed is None or typed.lower() == token.lower():
+                continue
+            counts['lookups'] += 1
+            for name, lookup in (('before', _before), ('after', _after)):
+                start = time.perf_counter()
+                offered = lookup(db, typed)
+                latencies[name].append((time.perf_counter() - start) * 1000)
+                counts[name] += entry in offered
+                counts[f'{name}_top1'] += bool(offered) and offered[0] == entry
+            start = time.perf_counter()
+            db.get_typo_matches(typed)
+            latencies['get_typo_matches'].append((time.perf_counter() - start) * 1000)
+        report['typos'][kind] = counts
+    report['latency'] = {name: {'median_ms': median(times), 'p99_ms': _percentile(times, 0.99)}
+                         for name, times in latencies.items() if times}
+
+    print(f"{report['words']} words")
+    print(f"{'typo':14} {'lookups':>8} {'before':>8} {'top 1':>8} {'after':>8} {'top 1':>8}")
+    for kind, c in report['typos'].items():
+        n = c['lookups'] or 1
+        print(f"{kind:14} {c['lookups']:8d} {c['before'] / n:8.1%} {c['before_top1'] / n:8.1%} "
+              f"{c['after'] / n:8.1%} {c['after_top1'] / n:8.1%}")
+    print(f"\n{'':18} {'median ms':>10} {'p99 ms':>10}")
+    for name, r in report['latency'].items():
+        print(f"{name:18} {r['median_ms']:10.3f} {r['p99_ms']:10.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+""" bash and zsh completion scripts for german-dict. options are completed
+    from the argument parser, the word argument by `german-dict --complete
+    PREFIX` (see db.complete_words), which a running daemon answers.
+
+    $ german-dict --completion-script bash > ~/.local/share/bash-completion/completions/german-dict
+    $ german-dict --completion-script zsh > ~/.zfunc/_german-dict
+"""
+import argparse
+
+SHELLS = ('bash', 'zsh')
+PROG = 'german-dict'
+# options whose value is a file name
+FILE_OPTIONS = ('--batch', '--crawl', '--export', '--import', '--profile-trace')
+
+_BASH = '''# bash completion for {prog}, made by `{prog} --completion-script bash`
+_{name}() {{
+    local cur=${{COMP_WORDS[COMP_CWORD]}} prev=${{COMP_WORDS[COMP_CWORD-1]}}
+    case $prev in
+        {file_options})
+            COMPREPLY=($(compgen -f -- "$cur"))
+            return ;;
+        {value_options})
+            COMPREPLY=()
+            return ;;
+    esac
+    if [[ $cur == -* ]]; then
+        COMPREPLY=($(compgen -W "{options}" -- "$cur"))
+    else
+        local IFS=$'\\n'
+        COMPREPLY=($({prog} --complete "$cur" 2>/dev/null))
+    fi
+}}
+complete -o filenames -F _{name} {prog}
+'''
+
+_ZSH = '''#compdef {prog}
+# zsh completion for {prog}, made by `{prog} --completion-script zsh`
+_{name}() {{
+    case ${{words[CURRENT-1]}} in
+        {file_options})
+            _files
+            return ;;
+        {value_options})
+            return ;;
+    esac
+    if [[ $PREFIX == -* ]]; then
+        compadd -- {options}
+    else
+        local -a completions
+        completions=(${{(f)"$({prog} --complete "$PREFIX" 2>/dev/null)"}})
+        # the completions may differ from the prefix in case and umlauts
+        compadd -U -- $completions
+    fi
+}}
+compdef _{name} {prog}
+'''
+
+def completion_script(shell: str, parser: argparse.ArgumentParser, prog: str = PROG) -> str:
+    """ the completion script of `shell` for the options of `parser` """
+    options, value_options = [], []
+    for action in parser._actions:
+        options += action.option_strings
+        if action.option_strings and action.nargs != 0:
+            value_options += [o for o in action.option_strings if o not in FILE_OPTIONS]
+    template = _BASH if shell == 'bash' else _ZSH
+    return template.format(prog=prog, name=prog.replace('-', '_'),
+                           options=' '.join(options),
+                           file_options='|'.join(FILE_OPTIONS),
+                           value_options='|'.join(value_options) or '--')
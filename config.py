@@ -2,6 +2,17 @@ import os
 import configparser
 
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'config.ini')
+DEFAULT_CACHE_TTL_DAYS = 30
+# the [FETCH] settings: requests per second to start with and to grow up
+# to, requests that may go out at once, timeouts in seconds, retries
+DEFAULT_FETCH = {
+    'rate': 2.0,
+    'max_rate': 10.0,
+    'burst': 4.0,
+    'connect_timeout': 5.0,
+    'read_timeout': 30.0,
+    'retries': 5.0,
+}
 
 def get_config():
     config = configparser.ConfigParser()
@@ -24,3 +35,18 @@ def set_database_initialized():
     with open(CONFIG_FILE, 'w') as f:
         config.write(f)
 
+
+def get_cache_ttl():
+    """ seconds a downloaded page stays fresh in the http cache, 0 keeps it forever """
+    config = get_config()
+    return config.getfloat('HTTP_CACHE', 'ttl_days', fallback=DEFAULT_CACHE_TTL_DAYS) * 24 * 3600
+
+def get_tree_builder():
+    """ html parser used for verbformen pages, 'html.parser' or 'lxml' """
+    config = get_config()
+    return config.get('PARSER', 'tree_builder', fallback='html.parser')
+
+def get_fetch_settings():
+    """ rate limit, timeouts and retries of the downloads of verbformen pages """
+    config = get_config()
+    return {key: config.getfloat('FETCH', key, fallback=value) for key, value in DEFAULT_FETCH.items()}
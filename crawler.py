@@ -0,0 +1,234 @@
+""" prefetches words into dictionary.db, so that later lookups are local.
+
+    the words to fetch are 'crawl' jobs in the jobs table, queued from word
+    lists, from the variant pages ("fliegen (haben)", "fliegen (sein)")
+    linked from crawled pages, and from the pages of the http cache. a pool
+    of worker threads claims them, fetches and parses the page like --batch
+    does and stores the word, the end of its job and the jobs of the pages
+    it links to in one transaction.
+
+    a crawl that is stopped (ctrl-c, SIGTERM) finishes the pages it is on
+    and leaves the rest pending. the lease of the jobs being worked on is
+    renewed while they wait for the rate limit or retries, after a crash
+    the running jobs are taken again once their lease has run out. a page
+    is never stored twice.
+"""
+import sys
+import json
+import time
+import signal
+import threading
+
+from db import *
+from escape_sequences import *
+from http_cache import normalize_url, iter_cached_pages
+from ingest import (VERBFORMEN_URL, DEFAULT_WORKERS, word_url, fetch_page, page_soup, parse_html,
+                    store_word)
+from helper import get_verb_variants
+
+CRAWL_JOB = 'crawl'
+# a running job older than this belongs to a crawler that died, the
+# crawler renews the jobs it is on every CRAWL_LEASE / 4 seconds
+CRAWL_LEASE = 2 * 60
+MAX_ATTEMPTS = 3
+# seconds a worker pauses when verbformen still answers 429 after the
+# retries of http_cache.download, the other workers wait in the rate limit.
+# the job is taken again after as long, without losing an attempt
+RATE_LIMIT_PAUSE = 10
+
+class RateLimited(RuntimeError):
+    pass
+
+class PageNotFound(RuntimeError):
+    # not worth another attempt
+    pass
+
+def word_job(word: str) -> str:
+    return json.dumps({'word': word}, ensure_ascii=False)
+
+def variant_job(label: str, url: str) -> str:
+    return json.dumps({'label': label, 'url': normalize_url(url)}, ensure_ascii=False, sort_keys=True)
+
+def queue_words(words: list) -> int:
+    """ queues the words that were never crawled, and the failed ones
+        again. returns the number of jobs queued.
+    """
+    return add_jobs(CRAWL_JOB, [word_job(word) for word in dict.fromkeys(words)], retry_failed=True)
+
+def queue_cached_variants() -> int:
+    """ queues the variant pages linked from the verb pages in the http
+        cache, returns the number of jobs queued.
+    """
+    payloads = []
+    for url, html in iter_cached_pages():
+        # only verb pages with more than one auxiliary have variant links
+        if 'rKnpf' not in html:
+            continue
+        variants = get_verb_variants(page_soup(html), VERBFORMEN_URL)
+        if len(variants) > 1:
+            payloads += [variant_job(label, variant_url) for label, variant_url in variants]
+    return add_jobs(CRAWL_JOB, payloads)
+
+def _fetch_job(job: dict):
+    """ fetches and parses the page of a job, without writing to the
+        database. returns the record and the name to store it under, None
+        for both when nothing is to be stored, and the variant jobs found.
+    """
+    label = job.get('label')
+    if 'word' in job:
+        if check_word_exists(job['word']):
+            return None, None, []
+        url = word_url(job['word'])
+    else:
+        url = job['url']
+
+    r = fetch_page(url)
+    if r.status_code == 429:
+        raise RateLimited("too many requests")
+    if r.status_code == 404:
+        raise PageNotFound("http status 404")
+    if r.status_code != 200:
+        raise RuntimeError(f"http status {r.status_code}")
+    soup = page_soup(r.text)
+    if label is None:
+        variants = get_verb_variants(soup, VERBFORMEN_URL)
+        # like main.py, a verb with haben and sein forms is stored once per
+        # form, "fliegen (haben)" and "fliegen (sein)", never on its own
+        if len(variants) > 1:
+            return None, None, [variant_job(variant_label, variant_url) for variant_label, variant_url in variants]
+
+    record = parse_html(r.text, soup)
+    if record['word'] is None:
+        raise RuntimeError("no entry found")
+    name = f"{record['word']} ({label})" if label else record['word']
+    return record, name, []
+
+@retry_when_locked
+def _store_job(job_id: int, record: dict, name: str, discovered: list) -> bool:
+    """ stores the word of a job, queues the pages it links to and marks the
+        job done, all or nothing. returns whether the word was new.
+    """
+    with transaction():
+        inserted = False
+        if record is not None:
+            word_id, inserted = store_word(record, name)
+            if word_id is None:
+                raise RuntimeError(f"unknown word type '{record['word_type']}'")
+        if discovered:
+            add_jobs(CRAWL_JOB, discovered)
+        finish_job(job_id)
+    return inserted
+
+class _Crawl:
+    """ the state the worker threads share """
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.counts = {'stored': 0, 'skipped': 0, 'variants': 0, 'delayed': 0, 'failed': 0}
+        # ids of the jobs the workers are on, to renew their lease
+        self.running = set()
+
+    def add(self, name: str, n: int = 1):
+        with self.lock:
+            self.counts[name] += n
+
+def _claim(crawl: _Crawl):
+    """ the next job, waiting for the delayed ones. None once no job is
+        pending, or when the crawl stops.
+    """
+    while not crawl.stop.is_set():
+        job = claim_job(CRAWL_JOB)
+        if job is None:
+            # jobs of a crawler that died, once their lease is over
+            release_stale_jobs(CRAWL_JOB, CRAWL_LEASE)
+            job = claim_job(CRAWL_JOB)
+        if job is not None:
+            return job
+        available_at = get_next_job_time(CRAWL_JOB)
+        if available_at is None:
+            return None
+        crawl.stop.wait(available_at - time.time())
+    return None
+
+def _work(crawl: _Crawl):
+    while not crawl.stop.is_set():
+        job = _claim(crawl)
+        if job is None:
+            return
+        job_id, payload = job
+        with crawl.lock:
+            crawl.running.add(job_id)
+        try:
+            record, name, discovered = _fetch_job(json.loads(payload))
+            inserted = _store_job(job_id, record, name, discovered)
+        except RateLimited as e:
+            # throttling is not the word's fault, it keeps its attempts
+            delay_job(job_id, RATE_LIMIT_PAUSE, error=str(e))
+            crawl.add('delayed')
+            crawl.stop.wait(RATE_LIMIT_PAUSE)
+            continue
+        except Exception as e:
+            finish_job(job_id, error=str(e) or type(e).__name__,
+                       max_attempts=1 if isinstance(e, PageNotFound) else MAX_ATTEMPTS)
+            crawl.add('failed')
+            continue
+        finally:
+            with crawl.lock:
+                crawl.running.discard(job_id)
+        if discovered:
+            crawl.add('variants', len(discovered))
+        else:
+            crawl.add('stored' if inserted else 'skipped')
+
+def crawl(workers: int = DEFAULT_WORKERS) -> dict:
+    """ works on the crawl jobs with `workers` threads until none is
+        pending, or until SIGINT or SIGTERM. returns the number of words
+        stored, skipped (stored already), variant pages found, attempts
+        delayed by the rate limit and failed attempts.
+    """
+    crawl = _Crawl()
+
+    def stop(signum, frame):
+        if crawl.stop.is_set():
+            # a second ctrl-c does not wait, the lease recovers the jobs
+            raise KeyboardInterrupt
+        sys.stderr.write("stopping after the pages being fetched, again to quit now\n")
+        crawl.stop.set()
+
+    handlers = {sig: signal.signal(sig, stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+    start = time.perf_counter()
+    try:
+        threads = [threading.Thread(target=_work, args=(crawl,), daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        # joins with a timeout, so that the signals reach the handler
+        renewed = time.monotonic()
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(0.2)
+            if time.monotonic() - renewed > CRAWL_LEASE / 4:
+                with crawl.lock:
+                    running = list(crawl.running)
+                renew_jobs(running)
+                renewed = time.monotonic()
+    finally:
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+
+    counts = crawl.counts
+    elapsed = time.perf_counter() - start
+    print(f"{BLUE}stored:{RESET} {counts['stored']}  {BLUE}skipped:{RESET} {counts['skipped']}  "
+          f"{BLUE}variants found:{RESET} {counts['variants']}  {BLUE}delayed:{RESET} {counts['delayed']}  "
+          f"{BLUE}failed:{RESET} {counts['failed']}  "
+          f"({elapsed:.1f}s)")
+    print_crawl_status()
+    return counts
+
+def print_crawl_status():
+    counts = get_job_counts(CRAWL_JOB)
+    print('  '.join(f"{BLUE}{status}:{RESET} {counts.get(status, 0)}"
+                    for status in ('pending', 'running', 'done', 'failed')))
+    for payload, error in get_failed_jobs(CRAWL_JOB):
+        job = json.loads(payload)
+        sys.stderr.write(f"{job.get('word') or job.get('url')}: {error}\n")
@@ -0,0 +1,167 @@
+""" keeps the dictionary warm in a long running process and serves it over
+    a unix socket, so that main.py does not pay for opening the database
+    on every call.
+
+    protocol: every message is a 4 byte big endian length followed by that
+    many bytes of utf-8 json. a request is {"call": name, "args": [...]},
+    the answer {"result": ..., "stdout": "...", "error": null} where error
+    is [exception name, message] if the call raised.
+"""
+import io
+import os
+import sys
+import signal
+import json
+import socket
+import struct
+import socketserver
+from contextlib import redirect_stdout
+
+SOCKET_PATH = 'german-dict.sock'
+
+# the db functions a client may call. they only read the dictionary,
+# the print functions also fill the rendered cache of db.py
+REMOTE_FUNCTIONS = (
+    'check_word_exists',
+    'lookup_word',
+    'get_fuzzy_matches',
+    'get_form_matches',
+    'complete_words',
+    'get_typo_matches',
+    'get_folded_matches',
+    'get_word_id',
+    'get_word_type',
+    'get_word',
+    'get_definition_id',
+    'get_definition',
+    'get_available_moods',
+    'get_available_tenses',
+    'print_conjugation_of_verb',
+    'print_declension_of_noun',
+    'print_sentences_from_db',
+    'print_sentence_search',
+)
+
+# exceptions that are raised again on the client side
+_ERRORS = {'ValueError': ValueError, 'LookupError': LookupError, 'KeyError': KeyError}
+
+def send_message(sock: socket.socket, message):
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(data)) + data)
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def recv_message(sock: socket.socket):
+    size, = struct.unpack('>I', _recv_exactly(sock, 4))
+    return json.loads(_recv_exactly(sock, size).decode('utf-8'))
+
+class DaemonClient:
+    """ calls the functions of REMOTE_FUNCTIONS in the daemon as if they
+        were the ones of db.py, their output is written to sys.stdout.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+
+    def _call(self, name, *args):
+        send_message(self._sock, {'call': name, 'args': list(args)})
+        answer = recv_message(self._sock)
+        if answer['stdout']:
+            sys.stdout.write(answer['stdout'])
+        if answer['error']:
+            error_name, message = answer['error']
+            raise _ERRORS.get(error_name, RuntimeError)(message)
+        return answer['result']
+
+    def __getattr__(self, name):
+        if name not in REMOTE_FUNCTIONS:
+            raise AttributeError(name)
+        return lambda *args: self._call(name, *args)
+
+    def close(self):
+        self._sock.close()
+
+def connect_daemon(path=SOCKET_PATH):
+    """ returns a DaemonClient, or None when no daemon is listening """
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return DaemonClient(sock)
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, struct.error):
+                return
+            # every call runs on the one database thread, whose
+            # connection and id maps stay warm between clients
+            answer = self.server.executor.submit(_execute, request).result()
+            send_message(self.request, answer)
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def _execute(request) -> dict:
+    import db
+    name, args = request.get('call'), request.get('args', [])
+    output = io.StringIO()
+    answer = {'result': None, 'stdout': '', 'error': None}
+    try:
+        if name not in REMOTE_FUNCTIONS:
+            raise ValueError(f"unknown call '{name}'")
+        with redirect_stdout(output):
+            answer['result'] = getattr(db, name)(*args)
+    except Exception as e:
+        answer['error'] = [type(e).__name__, str(e)]
+    answer['stdout'] = output.getvalue()
+    return answer
+
+def serve(path=SOCKET_PATH):
+    from concurrent.futures import ThreadPoolExecutor
+    import db
+
+    # a socket file without a daemon behind it is left from a crash
+    if os.path.exists(path):
+        if connect_daemon(path) is not None:
+            sys.exit(f"a daemon is already listening on {path}")
+        os.unlink(path)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    # open the connection and read the id maps before the first client
+    executor.submit(db.get_type_id, 'verb').result()
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # SIGTERM ends the daemon like ctrl-c, so the socket file is removed
+    handler = signal.signal(signal.SIGTERM, stop)
+    try:
+        server = _Server(path, _Handler)
+        server.executor = executor
+        try:
+            print(f"german-dict daemon listening on {os.path.abspath(path)}")
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.unlink(path)
+    finally:
+        signal.signal(signal.SIGTERM, handler)
+        executor.shutdown()
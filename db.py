@@ -1,47 +1,512 @@
+import sys
+import time
+import random
+import itertools
 import sqlite3
+import threading
+import functools
+from contextlib import contextmanager
 from typing import Tuple
 from sqlite3 import Cursor
 from sqlite3 import Connection
 
 from escape_sequences import *
-from helper import print_aligned_conjugation_table
+from helper import format_conjugation_table, format_declension, fold_word, form_keys, describe_cells, ARTICLES, \
+    typo_keys, deletion_keys, edit_distance
+import profiling
 
-def _open_database(path='dictionary.db') -> Tuple[Cursor, Connection]:
-    conn = sqlite3.connect(path)
+DATABASE_PATH = 'dictionary.db'
+# number of prepared statements sqlite3 keeps per connection
+STATEMENT_CACHE_SIZE = 256
+# seconds a statement waits for a lock held by another connection
+BUSY_TIMEOUT = 10
+# attempts of a write that still found the database locked after that
+LOCK_RETRIES = 5
+MMAP_SIZE = 256 * 1024 * 1024
+# page cache per connection in KiB
+CACHE_SIZE_KIB = 16 * 1024
+# results per page of search_sentences
+SENTENCE_PAGE_SIZE = 10
+# words whose forms index_word_forms rebuilds per transaction
+FORMS_BATCH_SIZE = 2000
+# candidates of complete_words
+COMPLETION_LIMIT = 20
+# get_typo_matches allows one typo in words of TYPO_MIN_LENGTH letters
+# and more, two from TYPO_LONG_WORD letters on
+TYPO_MIN_LENGTH = 5
+TYPO_LONG_WORD = 9
+# stored words whose edit distance get_typo_matches computes at most
+TYPO_CANDIDATES = 200
+
+# one long-lived connection per (thread, database path), so that a lookup
+# does not pay for connection setup on every helper call.
+_local = threading.local()
+
+def _migrate_word_tokens(conn: Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS word_tokens (
+            token TEXT NOT NULL,
+            word_id INTEGER NOT NULL,
+            PRIMARY KEY (token, word_id),
+            FOREIGN KEY (word_id) REFERENCES words(id)
+        ) WITHOUT ROWID
+    ''')
+    curr = conn.cursor()
+    for word_id, word in conn.execute('SELECT id, word FROM words').fetchall():
+        curr.executemany('INSERT OR IGNORE INTO word_tokens (token, word_id) VALUES (?, ?)',
+                         [(token, word_id) for token in set(_tokenize(word))])
+    curr.close()
+
+def _migrate_search_keys(conn: Connection):
+    conn.execute('ALTER TABLE words ADD COLUMN search_key TEXT')
+    conn.execute('ALTER TABLE word_tokens ADD COLUMN search_key TEXT')
+    conn.create_function('fold_word', 1, fold_word, deterministic=True)
+    conn.execute('UPDATE words SET search_key = fold_word(word)')
+    conn.execute('UPDATE word_tokens SET search_key = fold_word(token)')
+    conn.execute('CREATE INDEX IF NOT EXISTS words_search_key ON words (search_key)')
+    conn.execute('CREATE INDEX IF NOT EXISTS word_tokens_search_key ON word_tokens (search_key)')
+
+def _migrate_sentences_index(conn: Connection):
+    conn.execute('CREATE INDEX IF NOT EXISTS sentences_word_id ON sentences (word_id)')
+
+def _migrate_jobs(conn: Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            updated_at REAL NOT NULL,
+            UNIQUE (kind, payload)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS jobs_kind_status ON jobs (kind, status)')
+
+# tables whose rows make up the answers of the lookups, every write to them
+# bumps the change counter
+_COUNTED_TABLES = ('definitions', 'words', 'conjugations', 'declensions', 'sentences')
+
+def _create_change_triggers(conn: Connection, tables=_COUNTED_TABLES):
+    for table in tables:
+        for event in ('insert', 'update', 'delete'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_{event}_count AFTER {event.upper()} ON {table}
+                BEGIN UPDATE changes SET counter = counter + 1; END
+            ''')
+
+def _migrate_change_counter(conn: Connection):
+    conn.execute('CREATE TABLE IF NOT EXISTS changes (id INTEGER PRIMARY KEY CHECK (id = 0), counter INTEGER NOT NULL)')
+    conn.execute('INSERT OR IGNORE INTO changes (id, counter) VALUES (0, 0)')
+    _create_change_triggers(conn)
+
+def _migrate_declension_index(conn: Connection):
+    # the export reads the declensions word by word
+    conn.execute('CREATE INDEX IF NOT EXISTS declensions_word_id ON declensions (word_id)')
+
+# the rows of the tenses and pronouns lookup tables that databases start
+# with, in the order of a verbformen page. the ids give the display order,
+# names that are not listed are added when they are first stored.
+TENSES = ('present', 'imperfect', 'imperative', 'present subj.', 'imperf. subj.', 'infinitive',
+          'participle', 'perfect', 'pluperfect', 'future', 'future perfect', 'perfect subj.',
+          'pluperf. subj.', 'future subj.', 'fut. perf. subj.', 'present cond.', 'past cond.',
+          'infinitive i', 'infinitive ii', 'participle i', 'participle ii')
+PRONOUNS = ('ich', 'du', 'er', 'wir', 'ihr', 'sie', '0', '1')
+
+def _migrate_rendered(conn: Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rendered (
+            word_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            mood_id INTEGER NOT NULL,
+            tense TEXT NOT NULL,
+            color INTEGER NOT NULL,
+            output TEXT NOT NULL,
+            PRIMARY KEY (word_id, kind, mood_id, tense, color)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_delete_render AFTER DELETE ON words
+        BEGIN DELETE FROM rendered WHERE word_id = OLD.id; END
+    ''')
+
+def _migrate_conjugation_ids(conn: Connection):
+    # tense and pronoun were repeated as text on every row and again in the
+    # unique index, which led with the tense, so the rows of one word were
+    # spread over the whole index. with lookup ids the key is the table
+    # itself: a without rowid table clustered by word, mood, tense and
+    # pronoun, copied once.
+    conn.execute('CREATE TABLE tenses (id INTEGER PRIMARY KEY, tense TEXT NOT NULL UNIQUE)')
+    conn.execute('CREATE TABLE pronouns (id INTEGER PRIMARY KEY, pronoun TEXT NOT NULL UNIQUE)')
+    conn.executemany('INSERT INTO tenses (tense) VALUES (?)', [(t,) for t in TENSES])
+    conn.executemany('INSERT INTO pronouns (pronoun) VALUES (?)', [(p,) for p in PRONOUNS])
+    # names the lists do not know, in the order they were stored
+    conn.execute('INSERT OR IGNORE INTO tenses (tense) SELECT tense FROM conjugations GROUP BY tense ORDER BY MIN(id)')
+    conn.execute("INSERT OR IGNORE INTO pronouns (pronoun) SELECT COALESCE(pronoun, '') FROM conjugations "
+                 "GROUP BY COALESCE(pronoun, '') ORDER BY MIN(id)")
+    conn.execute('''
+        CREATE TABLE conjugations_new (
+            word_id INTEGER NOT NULL,
+            mood_id INTEGER NOT NULL,
+            tense_id INTEGER NOT NULL,
+            pronoun_id INTEGER NOT NULL,
+            conjugation TEXT,
+            PRIMARY KEY (word_id, mood_id, tense_id, pronoun_id),
+            FOREIGN KEY (word_id) REFERENCES words(id),
+            FOREIGN KEY (tense_id) REFERENCES tenses(id),
+            FOREIGN KEY (pronoun_id) REFERENCES pronouns(id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO conjugations_new (word_id, mood_id, tense_id, pronoun_id, conjugation)
+        SELECT word_id, mood_id, tenses.id, pronouns.id, conjugation
+        FROM conjugations
+        JOIN tenses ON tenses.tense = conjugations.tense
+        JOIN pronouns ON pronouns.pronoun = COALESCE(conjugations.pronoun, '')
+        ORDER BY conjugations.id
+    ''')
+    conn.execute('DROP TABLE conjugations')
+    conn.execute('ALTER TABLE conjugations_new RENAME TO conjugations')
+    # the triggers went with the old table
+    _create_change_triggers(conn, ('conjugations',))
+
+def _create_sentence_fts_triggers(conn: Connection):
+    # keeps the external content index sentences_fts in sync with sentences
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS sentences_insert_fts AFTER INSERT ON sentences BEGIN
+            INSERT INTO sentences_fts (rowid, german, english) VALUES (NEW.id, NEW.german, NEW.english);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS sentences_delete_fts AFTER DELETE ON sentences BEGIN
+            INSERT INTO sentences_fts (sentences_fts, rowid, german, english) VALUES ('delete', OLD.id, OLD.german, OLD.english);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS sentences_update_fts AFTER UPDATE ON sentences BEGIN
+            INSERT INTO sentences_fts (sentences_fts, rowid, german, english) VALUES ('delete', OLD.id, OLD.german, OLD.english);
+            INSERT INTO sentences_fts (rowid, german, english) VALUES (NEW.id, NEW.german, NEW.english);
+        END
+    ''')
+
+def _migrate_sentence_columns(conn: Connection):
+    # sentences were stored as one "german--english" string that every read
+    # split again, and could only be found by word id
+    conn.execute('''
+        CREATE TABLE sentences_new (
+            id INTEGER PRIMARY KEY,
+            german TEXT NOT NULL,
+            english TEXT NOT NULL,
+            word_id INTEGER NOT NULL,
+            FOREIGN KEY (word_id) REFERENCES words(id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO sentences_new (id, german, english, word_id)
+        SELECT id,
+               CASE WHEN instr(sentence, '--') THEN substr(sentence, 1, instr(sentence, '--') - 1) ELSE sentence END,
+               CASE WHEN instr(sentence, '--') THEN substr(sentence, instr(sentence, '--') + 2) ELSE '' END,
+               word_id
+        FROM sentences
+    ''')
+    conn.execute('DROP TABLE sentences')
+    conn.execute('ALTER TABLE sentences_new RENAME TO sentences')
+    conn.execute('CREATE INDEX IF NOT EXISTS sentences_word_id ON sentences (word_id)')
+    _create_change_triggers(conn, ('sentences',))
+    conn.execute('''
+        CREATE VIRTUAL TABLE sentences_fts USING fts5 (
+            german, english, content='sentences', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute("INSERT INTO sentences_fts (sentences_fts) VALUES ('rebuild')")
+    _create_sentence_fts_triggers(conn)
+
+def _migrate_word_forms(conn: Connection):
+    # filled by index_word_forms (german-dict --index-forms), building it
+    # here would hold the write lock for as long as that takes
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS word_forms (
+            form TEXT NOT NULL,
+            word_id INTEGER NOT NULL,
+            mood_id INTEGER NOT NULL DEFAULT 0,
+            tense_id INTEGER NOT NULL DEFAULT 0,
+            pronoun_id INTEGER NOT NULL DEFAULT 0,
+            number TEXT NOT NULL DEFAULT '',
+            noun_case TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (form, word_id, mood_id, tense_id, pronoun_id, number, noun_case),
+            FOREIGN KEY (word_id) REFERENCES words(id)
+        ) WITHOUT ROWID
+    ''')
+
+def _migrate_word_typos(conn: Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS word_typos (
+            variant TEXT NOT NULL,
+            word_id INTEGER NOT NULL,
+            PRIMARY KEY (variant, word_id),
+            FOREIGN KEY (word_id) REFERENCES words(id)
+        ) WITHOUT ROWID
+    ''')
+    curr = conn.cursor()
+    for word_id, word in conn.execute('SELECT id, word FROM words').fetchall():
+        _index_word_typos(curr, word_id, word)
+    curr.close()
+
+def _recreate_word_forms(conn: Connection):
+    # an empty word_forms with every cell, index_word_forms (--index-forms)
+    # fills it again
+    conn.execute('DROP TABLE IF EXISTS word_forms')
+    _migrate_word_forms(conn)
+
+def _migrate_word_forms_cells(conn: Connection):
+    # word_forms only had the first cell of every form
+    _recreate_word_forms(conn)
+
+def _migrate_job_delay(conn: Connection):
+    conn.execute('ALTER TABLE jobs ADD COLUMN available_at REAL NOT NULL DEFAULT 0')
+
+def _migrate_word_forms_every_cell(conn: Connection):
+    # databases that went through _migrate_word_forms_cells while it
+    # dropped the cells have (form, word_id) rows only
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(word_forms)')]
+    if 'mood_id' not in columns:
+        _recreate_word_forms(conn)
+
+def _migrate_render_version(conn: Connection):
+    # row triggers deleted the outputs of a word once for every conjugation
+    # row stored, add_word_entry now does it once per word. the outputs of
+    # older versions would never be looked up again.
+    for table in ('conjugations', 'declensions'):
+        for event in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER IF EXISTS {table}_{event}_render')
+    conn.execute('DELETE FROM rendered')
+    conn.execute('ALTER TABLE rendered ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+
+# migrations bring databases created from an older schema.sql up to date,
+# the n-th entry upgrades user_version n to n + 1.
+_MIGRATIONS = [
+    _migrate_word_tokens,
+    _migrate_search_keys,
+    _migrate_sentences_index,
+    _migrate_jobs,
+    _migrate_change_counter,
+    _migrate_declension_index,
+    _migrate_rendered,
+    _migrate_conjugation_ids,
+    _migrate_sentence_columns,
+    _migrate_word_forms,
+    _migrate_word_typos,
+    _migrate_word_forms_cells,
+    _migrate_job_delay,
+    _migrate_word_forms_every_cell,
+    _migrate_render_version,
+]
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+def _migrate(conn: Connection):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    # nothing to migrate before initialize_database has created the schema
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'words'").fetchone() is None:
+        return
+    # sqlite ddl is transactional, a crash leaves the old version intact
+    conn.execute('BEGIN IMMEDIATE')
+    # another process may have migrated while this one waited for the lock
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for migration in _MIGRATIONS[version:]:
+        migration(conn)
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    conn.commit()
+
+def _configure(conn: Connection, read_only=False):
+    """ settings for several processes reading and writing at once: in wal
+        mode readers never block the writer and the writer never blocks
+        readers, and synchronous normal only syncs at checkpoints.
+    """
+    if not read_only and conn.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+        conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+
+def get_connection(path=DATABASE_PATH) -> Connection:
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        # writes take the write lock at BEGIN, a deferred transaction that
+        # reads first would fail on the upgrade without waiting for it
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level='IMMEDIATE',
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        if profiling.is_enabled():
+            conn.set_trace_callback(profiling.trace_statement)
+        _configure(conn)
+        _migrate(conn)
+        connections[path] = conn
+    return conn
+
+def use_read_only_connection(path=DATABASE_PATH):
+    """ makes the db functions of the calling thread use a connection that
+        can only read `path`. the database has to exist and be migrated.
+    """
+    if not hasattr(_local, 'connections'):
+        _local.connections = {}
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=BUSY_TIMEOUT,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    if profiling.is_enabled():
+        conn.set_trace_callback(profiling.trace_statement)
+    _configure(conn, read_only=True)
+    conn.execute('PRAGMA query_only = ON')
+    _local.connections[path] = conn
+    return conn
+
+def get_change_count(path=DATABASE_PATH) -> int:
+    """ a counter that grows with every write to the dictionary tables """
+    return get_connection(path).execute('SELECT counter FROM changes').fetchone()[0]
+
+def close_connections():
+    connections = getattr(_local, 'connections', {})
+    for conn in connections.values():
+        conn.commit()
+        conn.close()
+    connections.clear()
+
+def is_database_created(path=DATABASE_PATH) -> bool:
+    conn = get_connection(path)
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'words'").fetchone() is not None
+
+def _in_transaction(conn: Connection) -> bool:
+    return getattr(_local, 'tx_depth', {}).get(conn, 0) > 0
+
+@contextmanager
+def transaction(path=DATABASE_PATH):
+    """ groups every write made inside the block into a single commit.
+        nested blocks join the outermost transaction.
+    """
+    conn = get_connection(path)
+    if not hasattr(_local, 'tx_depth'):
+        _local.tx_depth = {}
+    depth = _local.tx_depth
+    depth[conn] = depth.get(conn, 0) + 1
+    try:
+        yield conn
+    except BaseException:
+        depth[conn] -= 1
+        if depth[conn] == 0:
+            conn.rollback()
+        raise
+    depth[conn] -= 1
+    if depth[conn] == 0:
+        conn.commit()
+
+def _is_locked(e: sqlite3.OperationalError) -> bool:
+    message = str(e)
+    return 'locked' in message or 'busy' in message
+
+def retry_when_locked(func):
+    """ runs a write again, with backoff, when the database stayed locked by
+        another process for longer than BUSY_TIMEOUT. a call inside an
+        enclosing transaction is not retried on its own, the outermost
+        decorated call repeats the whole transaction.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if any(getattr(_local, 'tx_depth', {}).values()):
+            return func(*args, **kwargs)
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _is_locked(e) or attempt == LOCK_RETRIES:
+                    raise
+                for conn in getattr(_local, 'connections', {}).values():
+                    if conn.in_transaction:
+                        conn.rollback()
+                time.sleep(0.05 * 2 ** attempt * random.uniform(0.5, 1.5))
+    return wrapper
+
+def _open_database(path=DATABASE_PATH) -> Tuple[Cursor, Connection]:
+    conn = get_connection(path)
     curr = conn.cursor()
     return curr, conn
 
 def _close_database(curr: Cursor, conn: Connection):
-    conn.commit()
+    # the connection stays open, only the pending writes are committed
+    # unless they belong to an enclosing transaction.
+    if not _in_transaction(conn):
+        conn.commit()
     curr.close()
 
-def _execute_query_with_fallback(curr, query, word):
-    # try exact match first
-    curr.execute(query, (word,))
-    result = curr.fetchone()
-    if result is not None:
-        return result
+def _tokenize(word: str, key=str.lower) -> list:
+    # "der Wicht" => ['der', 'wicht'], "sich freuen auf" => ['sich', 'freuen', 'auf']
+    return [key(token) for token in word.split(' ') if token]
 
-    # fallback: word preceded by space (e.g. "der Wicht", "sich freuen")
-    curr.execute(query, ("% " + word,))
-    result = curr.fetchone()
-    if result is not None:
-        return result
+def _index_word_tokens(curr, word_id: int, word: str):
+    curr.executemany('INSERT OR IGNORE INTO word_tokens (token, search_key, word_id) VALUES (?, ?, ?)',
+                     [(token.lower(), fold_word(token), word_id) for token in set(word.split(' ')) if token])
+    _index_word_typos(curr, word_id, word)
 
-    # fallback: word followed by space (e.g. "Wicht (m)", "laufen gehen")
-    curr.execute(query, (word + " %",))
-    result = curr.fetchone()
-    if result is not None:
-        return result
+def _index_word_typos(curr, word_id: int, word: str):
+    curr.executemany('INSERT OR IGNORE INTO word_typos (variant, word_id) VALUES (?, ?)',
+                     [(variant, word_id) for key in typo_keys(word) for variant in deletion_keys(key)])
 
-    # fallback: word surrounded by spaces (e.g. "Sich freuen auf")
-    curr.execute(query, ("% " + word + " %",))
-    result = curr.fetchone()
-    return result
+def _match_rank(entry: str, word: str):
+    """ ranks how `word` matches the stored `entry`, in the order the
+        lookups have always preferred them. returns None for no match.
+    """
+    entry, word = entry.lower(), word.lower()
+    # exact match
+    if entry == word:
+        return 0
+    # word preceded by space (e.g. "der Wicht", "sich freuen")
+    if entry.endswith(' ' + word):
+        return 1
+    # word followed by space (e.g. "Wicht (m)", "laufen gehen")
+    if entry.startswith(word + ' '):
+        return 2
+    # word surrounded by spaces (e.g. "Sich freuen auf")
+    if ' ' + word + ' ' in entry:
+        return 3
+    return None
+
+def _find_matches(curr, word: str, folded=False) -> list:
+    """ returns (rank, id, word) tuples for every entry matching `word`.
+        each pattern needs all tokens of `word` to be whole tokens of the
+        entry, so a seek on its longest token gives the candidates.
+        folded compares umlaut/ß folded search keys instead of lower case.
+    """
+    key = fold_word if folded else str.lower
+    column = 'search_key' if folded else 'token'
+    tokens = _tokenize(word, key)
+    if not tokens:
+        return []
+    word = key(' '.join(word.split()))
+    curr.execute(f"""
+        SELECT words.id, words.word
+        FROM word_tokens
+        JOIN words ON words.id = word_tokens.word_id
+        WHERE word_tokens.{column} = ?
+    """, (max(tokens, key=len),))
+
+    matches = []
+    for word_id, entry in curr.fetchall():
+        rank = _match_rank(key(entry), word)
+        if rank is not None:
+            matches.append((rank, word_id, entry))
+    return matches
+
+def _find_word_id(curr, word: str):
+    matches = _find_matches(curr, word)
+    if not matches:
+        return None
+    return min(matches)[1]
 
 def check_word_exists(word: str):
     curr, conn = _open_database()
-    result = _execute_query_with_fallback(curr, 'SELECT * FROM words WHERE word LIKE ?', word)
+    result = _find_word_id(curr, word)
     _close_database(curr, conn)
     return result is not None
 
@@ -50,76 +515,323 @@ def get_fuzzy_matches(word: str):
     returns a list of (id, word) tuples for all matches found using stricter logic.
     """
     curr, conn = _open_database()
-    matches = set()
-    query = 'SELECT id, word FROM words WHERE word LIKE ?'
+    matches = {(word_id, entry) for _, word_id, entry in _find_matches(curr, word)}
+    _close_database(curr, conn)
+    # sort by length then alphabetically to show exact matches first usually
+    return sorted(list(matches), key=lambda x: (len(x[1]), x[1]))
+
+def get_form_matches(word: str) -> list:
+    """ (id, word, cells) tuples of the words that `word` is an inflected
+        form of, "Häusern" => [(.., "das Haus", "plural: dative")],
+        "bin gegangen" => [(.., "gehen", "perfect: ich")]. cells names the
+        tenses and pronouns or the numbers and cases of the form.
+    """
+    keys = form_keys(word)
+    if not keys:
+        return []
+    curr, conn = _open_database()
+    curr.execute('''
+        SELECT words.id, words.word, tenses.tense, pronouns.pronoun, word_forms.number, word_forms.noun_case
+        FROM word_forms
+        JOIN words ON words.id = word_forms.word_id
+        LEFT JOIN tenses ON tenses.id = word_forms.tense_id
+        LEFT JOIN pronouns ON pronouns.id = word_forms.pronoun_id
+        WHERE word_forms.form = ?
+        ORDER BY word_forms.word_id, word_forms.tense_id, word_forms.pronoun_id
+    ''', (keys[0],))
+    cells = {}
+    for word_id, entry, tense, pronoun, number, case in curr.fetchall():
+        cells.setdefault((word_id, entry), []).append((tense, pronoun) if tense else (number, case))
+    _close_database(curr, conn)
+    return sorted([(word_id, entry, describe_cells(word_cells)) for (word_id, entry), word_cells in cells.items()],
+                  key=lambda x: (len(x[1]), x[1]))
+
+def _seek_tokens(curr, column: str, prefix: str, limit: int, skip=()) -> list:
+    """ the first `limit` distinct tokens whose `column` (token or
+        search_key) starts with `prefix`, in index order. every token is
+        one seek past the previous one, so that tokens with thousands of
+        rows ("sich", "der") cost no more than rare ones.
+    """
+    order = 'token' if column == 'token' else 'search_key, token'
+    end = prefix + '\U0010ffff'
+    tokens = []
+    last = None
+    while len(tokens) < limit:
+        if last is None:
+            curr.execute(f'SELECT {order} FROM word_tokens WHERE {column} >= ? AND {column} < ? '
+                         f'ORDER BY {order} LIMIT 1', (prefix, end))
+        else:
+            curr.execute(f'SELECT {order} FROM word_tokens WHERE ({order}) > ({", ".join("?" * len(last))}) '
+                         f'AND {column} < ? ORDER BY {order} LIMIT 1', (*last, end))
+        last = curr.fetchone()
+        if last is None:
+            break
+        # "(haben)" and the articles are never typed on their own
+        if last[-1][:1].isalpha() and last[-1] not in skip and last[-1] not in ARTICLES:
+            tokens.append(last[-1])
+    return tokens
+
+def _display_token(curr, token: str) -> str:
+    # tokens are lower case, "haus" is completed as in "das Haus"
+    curr.execute('SELECT word FROM words WHERE id = (SELECT word_id FROM word_tokens WHERE token = ? LIMIT 1)',
+                 (token,))
+    row = curr.fetchone()
+    for part in (row[0].split(' ') if row else ()):
+        if part.lower() == token:
+            return part
+    return token
 
-    # check all patterns
-    patterns = [word, "% " + word, word + " %", "% " + word + " %"]
+def complete_words(prefix: str, limit: int = COMPLETION_LIMIT) -> list:
+    """ up to `limit` completions of `prefix` for the word argument: the
+        stored tokens starting with it, then the ones whose umlaut/ß
+        folded spelling does ("strass" => "Straße"). a prefix with spaces
+        completes whole entries ("sich fr" => "sich freuen").
+    """
+    prefix = prefix.lstrip()
+    curr, conn = _open_database()
+    if ' ' in prefix:
+        key = fold_word(prefix)
+        curr.execute('SELECT word FROM words WHERE search_key >= ? AND search_key < ? ORDER BY search_key LIMIT ?',
+                     (key, key + '\U0010ffff', limit))
+        completions = [word for word, in curr.fetchall()]
+    else:
+        tokens = _seek_tokens(curr, 'token', prefix.lower(), limit)
+        if len(tokens) < limit:
+            tokens += _seek_tokens(curr, 'search_key', fold_word(prefix), limit - len(tokens), skip=set(tokens))
+        completions = [_display_token(curr, token) for token in tokens]
+    _close_database(curr, conn)
+    return completions
 
-    for pat in patterns:
-        curr.execute(query, (pat,))
-        rows = curr.fetchall()
-        for row in rows:
-            matches.add(row)
+def get_typo_matches(word: str, limit: int = 10) -> list:
+    """ (id, word) tuples of the stored words closest to a misspelled
+        `word` ("Geschwindigkiet"), by edit distance of its longest token.
+        one typo is allowed from TYPO_MIN_LENGTH letters on, two from
+        TYPO_LONG_WORD.
+    """
+    keys = typo_keys(word)
+    if not keys or len(max(keys, key=len)) < TYPO_MIN_LENGTH:
+        return []
+    key = max(keys, key=len)
+    max_distance = 2 if len(key) >= TYPO_LONG_WORD else 1
 
+    curr, conn = _open_database()
+    matches = []
+    # every entry one typo away shares a variant of one deletion, more
+    # deletions on the side of `word` find most entries two typos away
+    for deletions in range(1, max_distance + 1):
+        variants = list(deletion_keys(key, deletions))
+        curr.execute(f'''
+            SELECT DISTINCT words.id, words.word
+            FROM word_typos
+            JOIN words ON words.id = word_typos.word_id
+            WHERE word_typos.variant IN ({', '.join('?' * len(variants))})
+            LIMIT ?
+        ''', (*variants, TYPO_CANDIDATES))
+        for word_id, entry in curr.fetchall():
+            distance = min(edit_distance(key, token) for token in typo_keys(entry))
+            if distance <= max_distance:
+                matches.append((distance, len(entry), entry, word_id))
+        if matches:
+            break
+    _close_database(curr, conn)
+    return [(word_id, entry) for _, _, entry, word_id in sorted(matches)[:limit]]
+
+def get_existing_words(words: list) -> set:
+    """
+    returns the subset of `words` that check_word_exists would find, with one
+    query per chunk of words instead of one lookup per word. an inflected
+    form of a stored word does not count, it may be a word of its own
+    ("das Schloss" is not schließen).
+    """
+    by_token = {}
+    for word in words:
+        tokens = _tokenize(word)
+        if tokens:
+            by_token.setdefault(max(tokens, key=len), []).append(word)
+
+    existing = set()
+    curr, conn = _open_database()
+    tokens = list(by_token)
+    # stay below the sqlite limit for bound parameters
+    for i in range(0, len(tokens), 500):
+        chunk = tokens[i:i + 500]
+        curr.execute(f"""
+            SELECT word_tokens.token, words.word
+            FROM word_tokens
+            JOIN words ON words.id = word_tokens.word_id
+            WHERE word_tokens.token IN ({', '.join('?' * len(chunk))})
+        """, chunk)
+        for token, entry in curr.fetchall():
+            for word in by_token[token]:
+                if _match_rank(entry, ' '.join(word.split())) is not None:
+                    existing.add(word)
+    _close_database(curr, conn)
+    return existing
+
+def get_folded_matches(word: str):
+    """
+    like get_fuzzy_matches, but compares search keys folded by fold_word,
+    so "wahlen" finds "wählen" and "strasse" finds "die Straße".
+    """
+    curr, conn = _open_database()
+    curr.execute('SELECT id, word FROM words WHERE search_key = ?', (fold_word(word),))
+    matches = set(curr.fetchall())
+    if not matches:
+        matches = {(word_id, entry) for _, word_id, entry in _find_matches(curr, word, folded=True)}
     _close_database(curr, conn)
-    # sort by length then alphabetically to show exact matches first usually
     return sorted(list(matches), key=lambda x: (len(x[1]), x[1]))
 
-def add_word_to_database(values: Tuple[str, str, str, str, str, str, str,]):
+# how lookup_word found its matches, in the order it tries them
+_LOOKUPS = (
+    ('stored', 'lookup', get_fuzzy_matches),
+    # inflected forms, e.g. "lief" => "laufen", "Häusern" => "das Haus"
+    ('form', 'form lookup', get_form_matches),
+    # umlaut and ß spellings, e.g. "wahlen" => "wählen", "strasse" => "Straße"
+    ('folded', 'folded lookup', get_folded_matches),
+    # typos, e.g. "Geschwindigkiet" => "die Geschwindigkeit"
+    ('typo', 'typo lookup', get_typo_matches),
+)
+
+def lookup_word(word: str) -> Tuple[str, list]:
+    """ the (id, word) tuples of the stored words that `word` may stand for
+        and how they were found, the lookup main.py and the http service
+        share: 'stored' (the word or an entry with it), else 'form' (with
+        the cells of the form, see get_form_matches), 'folded' or 'typo'.
+        (None, []) when nothing matches.
+    """
+    for kind, span, find in _LOOKUPS:
+        with profiling.span(span):
+            matches = find(word)
+        if matches:
+            return kind, matches
+    return None, []
+
+def _is_transcription(word: str) -> bool:
+    # typed without umlauts and ß, as on a keyboard without them
+    return not any(letter in 'äöüßÄÖÜ' for letter in word)
+
+def default_match(word: str, kind: str, matches: list):
+    """ the match of lookup_word that is taken when nobody chooses, None
+        when searching online comes first. an inflected form never goes
+        online on its own, searching online has to be chosen ("das Schloss"
+        is a word of its own, not only a form of schließen). an umlaut/ß
+        spelling is taken when `word` is typed without them ("wahlen" for
+        wählen, "strasse" for Straße), not the other way round: folding
+        goes both ways, and "schön" is not "schon". stored words that
+        `word` is a misspelling of are never taken as is.
+    """
+    if kind in ('stored', 'form') or kind == 'folded' and _is_transcription(word):
+        return matches[0]
+    return None
+
+def asks_for_match(word: str, kind: str, matches: list) -> bool:
+    """ whether main.py lists the matches of lookup_word to choose from,
+        instead of taking default_match right away: a single exact match,
+        the single word `word` is an inflected form of, or the single word
+        it is a transcription of is taken.
+    """
+    if kind == 'form':
+        return len(matches) > 1
+    if kind == 'folded':
+        return len(matches) > 1 or not _is_transcription(word)
+    return not (kind == 'stored' and len(matches) == 1 and matches[0][1].lower() == word.lower())
+
+@retry_when_locked
+def add_word_to_database(values: Tuple[str, str, str, str, str, str, str,]) -> bool:
     #word, gender_id, auxiliary, regular, separable, definition_id, type_id = values
+    # returns False if the word was already stored
     # double check
     curr, conn = _open_database()
     curr.execute('''INSERT OR IGNORE INTO words
-                 (word, gender_id, auxiliary, regular, separable, definition_id, type_id, have_declension, have_conjugaison) 
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', values)
-    conn.commit()
+                 (word, gender_id, auxiliary, regular, separable, definition_id, type_id, have_declension, have_conjugaison, search_key) 
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', (*values, fold_word(values[0])))
+    inserted = curr.rowcount == 1
+    if inserted:
+        # keep the token index in sync with the new entry
+        _index_word_tokens(curr, curr.lastrowid, values[0])
     _close_database(curr, conn)
+    return inserted
 
+@retry_when_locked
+def add_word_entry(word: str, definition: str, type_: str, gender: str = None,
+                   auxiliary: int = None, regular: int = 1, separable: int = None,
+                   conjugation_dict=None, declension_dict=None, sentences_ls=None) -> Tuple[int, bool]:
+    """ writes a word with its definition, conjugation or declension and
+        sentences in one transaction, so that a crash never leaves a word
+        without its paradigm. returns the word id and whether the word is
+        new, conjugation and declension are only added to new words.
+    """
+    have_declension, have_conjugaison = (0, 1) if type_ == 'verb' else (1, 0)
+    with transaction() as conn:
+        definition_id = add_definition_to_database(definition)
+        inserted = add_word_to_database((word, get_gender_id(gender), auxiliary, regular, separable,
+                                         definition_id, get_type_id(type_), have_declension, have_conjugaison))
+        word_id = conn.execute('SELECT id FROM words WHERE word = ?', (word,)).fetchone()[0]
+        if inserted and (conjugation_dict or declension_dict):
+            if conjugation_dict:
+                add_conjugation_to_db(conjugation_dict, word_id)
+            if declension_dict:
+                add_declension_to_db(declension_dict, word_id)
+            # drops what was rendered before, once for the whole paradigm
+            conn.execute('DELETE FROM rendered WHERE word_id = ?', (word_id,))
+        if sentences_ls:
+            add_sentences_to_db(sentences_ls, word_id)
+    return word_id, inserted
+
+@retry_when_locked
 def add_definition_to_database(definition: str) -> int:
     # add definition to database, and return id of the definition
     curr, conn = _open_database()
     curr.execute('INSERT OR IGNORE INTO definitions (definition) VALUES (?)', (definition,))
-    conn.commit()
     curr.execute('SELECT id FROM definitions WHERE definition = ?', (definition,))
     result = curr.fetchone()
     _close_database(curr, conn)
     return result[0]
 
+def _id_map(conn: Connection, table: str, column: str) -> dict:
+    """ name => id of one of the fixed lookup tables (types, genders, moods),
+        read once per connection instead of one query per lookup.
+    """
+    maps = getattr(_local, 'id_maps', None)
+    if maps is None:
+        maps = _local.id_maps = {}
+    key = (conn, table)
+    if key not in maps:
+        rows = conn.execute(f'SELECT id, {column} FROM {table}').fetchall()
+        if not rows:
+            # not filled by initialize_database yet, do not cache
+            return {}
+        maps[key] = {name.lower(): id_ for id_, name in rows}
+    return maps[key]
+
 def get_type_id(type_: str) -> int:
-    curr, conn = _open_database()
-    curr.execute('SELECT id FROM types WHERE type = ?', (type_,))
-    result = curr.fetchone()
-    _close_database(curr, conn)
+    result = _id_map(get_connection(), 'types', 'type').get(type_.lower() if type_ else type_)
     if result is None:
         raise ValueError(f"Type '{type_}' not found in database")
-    return result[0]
+    return result
 
 def get_gender_id(gender: str) -> int:
     if gender is None:
         return None
-    curr, conn = _open_database()
-    curr.execute('SELECT id FROM genders WHERE gender = ?', (gender,))
-    result = curr.fetchone()
-    _close_database(curr, conn)
-    return result[0] if result else None
+    return _id_map(get_connection(), 'genders', 'gender').get(gender.lower())
 
 def get_word_id(word):
     curr, conn = _open_database()
-    result = _execute_query_with_fallback(curr, 'SELECT id FROM words WHERE word LIKE ?', word)
+    result = _find_word_id(curr, word)
     _close_database(curr, conn)
     if result is None:
         raise ValueError(f"Word '{word}' not found in database via get_word_id")
-    return result[0]
+    return result
 
 def get_word_type(word):
     curr, conn = _open_database()
-    query = '''
+    word_id = _find_word_id(curr, word)
+    curr.execute('''
         SELECT type FROM types
         JOIN words ON type_id = types.id
-        WHERE word LIKE ?
-    '''
-    result = _execute_query_with_fallback(curr, query, word)
+        WHERE words.id = ?
+    ''', (word_id,))
+    result = curr.fetchone()
     _close_database(curr, conn)
     return result[0] if result else None
 
@@ -130,9 +842,28 @@ def get_word(word_id):
     _close_database(curr, conn)
     return result[0]
 
+def get_word_entry(word_id: int) -> dict:
+    """ the stored descriptors of a word, or None """
+    curr, conn = _open_database()
+    curr.execute('''
+        SELECT words.word, types.type, genders.gender, definitions.definition,
+               words.auxiliary, words.regular, words.separable
+        FROM words
+        JOIN types ON words.type_id = types.id
+        JOIN definitions ON words.definition_id = definitions.id
+        LEFT JOIN genders ON words.gender_id = genders.id
+        WHERE words.id = ?
+    ''', (word_id,))
+    result = curr.fetchone()
+    _close_database(curr, conn)
+    if result is None:
+        return None
+    return dict(zip(('word', 'type', 'gender', 'definition', 'auxiliary', 'regular', 'separable'), result))
+
 def get_definition_id(word):
     curr, conn = _open_database()
-    result = _execute_query_with_fallback(curr, 'SELECT definition_id FROM words WHERE word LIKE ?', word)
+    curr.execute('SELECT definition_id FROM words WHERE id = ?', (_find_word_id(curr, word),))
+    result = curr.fetchone()
     _close_database(curr, conn)
     return result[0]
 
@@ -144,24 +875,23 @@ def get_definition(definition_id):
     return result[0]
 
 def get_mood_id(mood: str, curr=None) -> int:
-    should_close = False
-    if curr is None:
-        curr, conn = _open_database()
-        should_close = True
-
-    curr.execute('SELECT id FROM moods WHERE mood LIKE ?', (mood,))
-    result = curr.fetchone()
-
-    if should_close:
-        _close_database(curr, conn)
+    conn = curr.connection if curr is not None else get_connection()
+    return _id_map(conn, 'moods', 'mood').get(mood.lower(), -1)
 
-    if result is not None:
-        return result[0]
-    return -1
+def _lookup_ids(curr, table: str, column: str, names: set) -> dict:
+    """ name => id in the tenses or pronouns table, names that are not
+        stored yet are added. not cached, the ids of a rolled back
+        transaction must not outlive it.
+    """
+    curr.executemany(f'INSERT OR IGNORE INTO {table} ({column}) VALUES (?)', [(name,) for name in names])
+    curr.execute(f'SELECT id, {column} FROM {table}')
+    return {name: id_ for id_, name in curr.fetchall()}
 
+@retry_when_locked
 def add_conjugation_to_db(conjugation_dict, word_id):
     curr, conn = _open_database()
 
+    rows = []
     for mood_name, tenses in conjugation_dict.items():
         mood_id = get_mood_id(mood_name, curr)
         if mood_id == -1:
@@ -169,20 +899,50 @@ def add_conjugation_to_db(conjugation_dict, word_id):
 
         for tense, pronouns in tenses.items():
             for pronoun, conjugation in pronouns.items():
-                curr.execute("""
-                    INSERT OR IGNORE INTO conjugations
-                    (tense, pronoun, conjugation, word_id, mood_id)
-                    VALUES (?, ?, ?, ?, ?)
-                    """,
-                    (tense, pronoun, conjugation, word_id, mood_id)
-                )
+                rows.append((tense, pronoun, conjugation, mood_id))
 
+    tense_ids = _lookup_ids(curr, 'tenses', 'tense', {row[0] for row in rows})
+    pronoun_ids = _lookup_ids(curr, 'pronouns', 'pronoun', {row[1] for row in rows})
+    rows = [(word_id, mood_id, tense_ids[tense], pronoun_ids[pronoun], conjugation)
+            for tense, pronoun, conjugation, mood_id in rows]
+    curr.executemany("""
+        INSERT OR IGNORE INTO conjugations
+        (word_id, mood_id, tense_id, pronoun_id, conjugation)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        rows
+    )
+    _index_conjugated_forms(curr, rows)
     _close_database(curr, conn)
 
-def _pronoun_sort_key(item):
-    pronoun = item[1]
-    pronoun_order = ['ich', 'du', 'er', 'wir', 'ihr', 'sie', '0', '1']
-    return pronoun_order.index(pronoun)
+@contextmanager
+def deferred_form_index():
+    """ stores conjugations and declensions inside the block without their
+        word_forms rows, for bulk writes that leave them to one run of
+        index_word_forms. lookups do not find the inflected forms until then.
+    """
+    _local.defer_forms = True
+    try:
+        yield
+    finally:
+        _local.defer_forms = False
+
+def _index_conjugated_forms(curr, rows):
+    """ adds the forms of (word_id, mood_id, tense_id, pronoun_id,
+        conjugation) rows to word_forms
+    """
+    if getattr(_local, 'defer_forms', False):
+        return
+    curr.executemany('INSERT OR IGNORE INTO word_forms (form, word_id, mood_id, tense_id, pronoun_id) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     [(key, *row[:4]) for row in rows if row[-1] for key in form_keys(row[-1])])
+
+def _index_declined_forms(curr, rows):
+    """ adds the forms of (word_id, number, case, form) rows to word_forms """
+    if getattr(_local, 'defer_forms', False):
+        return
+    curr.executemany('INSERT OR IGNORE INTO word_forms (form, word_id, number, noun_case) VALUES (?, ?, ?, ?)',
+                     [(key, *row[:3]) for row in rows if row[-1] for key in form_keys(row[-1])])
 
 def get_available_moods(word_id: int):
     curr, conn = _open_database()
@@ -199,83 +959,326 @@ def get_available_moods(word_id: int):
 
 def get_available_tenses(word_id: int, mood_id: int):
     curr, conn = _open_database()
+    # tense ids are in the order of the page, and so is the primary key
     curr.execute("""
-        SELECT DISTINCT tense
+        SELECT tenses.tense
         FROM conjugations
-        WHERE word_id = ? AND mood_id = ?
+        JOIN tenses ON conjugations.tense_id = tenses.id
+        WHERE conjugations.word_id = ? AND conjugations.mood_id = ?
+        GROUP BY conjugations.tense_id
+        ORDER BY conjugations.tense_id
     """, (word_id, mood_id))
     tenses = curr.fetchall()
     _close_database(curr, conn)
     return [t[0] for t in tenses]
 
-def print_conjugation_of_verb(word, mood_id, tense):
+def get_conjugation(word_id: int, mood_id: int, tense: str) -> list:
+    """ (tense, pronoun, conjugation) rows of one tense, in pronoun order """
     curr, conn = _open_database()
-    word_id = get_word_id(word)
-
+    # pronoun ids are in german pronoun order
     curr.execute("""
-        SELECT tense, pronoun, conjugation
-        FROM conjugations
-        WHERE word_id = ? and mood_id = ? and tense = ?
+        SELECT tenses.tense, pronouns.pronoun, conjugation
+        FROM tenses
+        JOIN conjugations ON conjugations.tense_id = tenses.id
+        JOIN pronouns ON conjugations.pronoun_id = pronouns.id
+        WHERE conjugations.word_id = ? AND conjugations.mood_id = ? AND tenses.tense = ?
+        ORDER BY conjugations.pronoun_id
     """,
         (word_id, mood_id, tense)
     )
     conjugation_ls = curr.fetchall()
+    _close_database(curr, conn)
+    return conjugation_ls
 
+def get_conjugation_table(word_id: int) -> dict:
+    """ mood => tense => pronoun => conjugation, the shape ingest stores """
+    curr, conn = _open_database()
+    # the order of the primary key, one range of the table
+    curr.execute("""
+        SELECT moods.mood, tenses.tense, pronouns.pronoun, conjugation
+        FROM conjugations
+        JOIN moods ON conjugations.mood_id = moods.id
+        JOIN tenses ON conjugations.tense_id = tenses.id
+        JOIN pronouns ON conjugations.pronoun_id = pronouns.id
+        WHERE conjugations.word_id = ?
+        ORDER BY conjugations.mood_id, conjugations.tense_id, conjugations.pronoun_id
+    """, (word_id,))
+    rows = curr.fetchall()
+    _close_database(curr, conn)
+
+    table = {}
+    for mood, tense, pronoun, conjugation in rows:
+        table.setdefault(mood, {}).setdefault(tense, {})[pronoun] = conjugation
+    return table
+
+# bump when the output of render_conjugation or render_declension changes,
+# the outputs stored under another version are rendered again
+RENDER_VERSION = 1
+
+def _cached_output(key: tuple, render):
+    """ the output stored in the rendered table under `key`, or the one
+        `render` returns, which is stored unless it is None. add_word_entry
+        deletes the outputs of a word whose paradigm it writes.
+    """
+    conn = get_connection()
+    row = conn.execute('SELECT output FROM rendered WHERE word_id = ? AND kind = ? AND mood_id = ? '
+                       'AND tense = ? AND color = ? AND version = ?', (*key, RENDER_VERSION)).fetchone()
+    if row is not None:
+        return row[0]
+    profiling.count('render_cache_misses')
+    if _in_transaction(conn) or conn.execute('PRAGMA query_only').fetchone()[0]:
+        return render()
+
+    # the rows are rendered under the write lock, so that no writer can
+    # change them before the output is stored. a lookup never waits for it.
+    conn.execute('PRAGMA busy_timeout = 0')
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        locked = False
+    except sqlite3.OperationalError:
+        # another process is writing
+        locked = True
+    finally:
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT * 1000}')
+    if locked:
+        return render()
+
+    with transaction():
+        output = render()
+        if output is not None:
+            conn.execute('INSERT OR REPLACE INTO rendered (word_id, kind, mood_id, tense, color, output, version) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)', (*key, output, RENDER_VERSION))
+    return output
+
+def render_conjugation(word_id: int, mood_id: int, tense: str, color: bool = True) -> str:
+    """ the heading and aligned table of one tense, or None """
+    conjugation_ls = get_conjugation(word_id, mood_id, tense)
     if not conjugation_ls:
-        print(f"{RED}No conjugation found for {tense} in this mood.{RESET}")
-        _close_database(curr, conn)
-        return
+        return None
+    c = palette(color)
+    return f"\n{c.RED}Mood: {mood_id} | Tense: {tense}{c.RESET}\n" + format_conjugation_table(conjugation_ls, color)
 
-    # sort the list according to german pronouns
-    conjugation_ls = sorted(conjugation_ls, key=_pronoun_sort_key)
+def print_conjugation_of_verb(word, mood_id, tense, color=None):
+    color = use_color() if color is None else color
+    word_id = get_word_id(word)
+    output = _cached_output((word_id, 'conjugation', mood_id, tense, int(color)),
+                            lambda: render_conjugation(word_id, mood_id, tense, color))
+    if output is None:
+        c = palette(color)
+        output = f"{c.RED}No conjugation found for {tense} in this mood.{c.RESET}\n"
+    sys.stdout.write(output)
 
-    print(f"\n{RED}Mood: {mood_id} | Tense: {tense}{RESET}")
-    print_aligned_conjugation_table(conjugation_ls)
-    _close_database(curr, conn)
+_CASES = ('nominative', 'genitive', 'dative', 'accusative')
 
-def print_declension_of_noun(word):
+def get_declension(word_id: int) -> dict:
+    """ number => case => form, the shape ingest stores, or None """
     curr, conn = _open_database()
-    word_id = get_word_id(word)
     curr.execute('SELECT singular_nominative, plural_nominative, singular_genitive, plural_genitive, '
                  'singular_dative, plural_dative, singular_accusative, plural_accusative '
                  'FROM declensions WHERE word_id = ?', (word_id,))
     result = curr.fetchone()
-    if result:
-        print(RED + "Singular" + RESET)
-        print(f"{BLUE}nom: {GREEN}{result[0]} {RESET}")
-        print(f"{BLUE}acc: {GREEN}{result[6]} {RESET}")
-        print(f"{BLUE}dat: {GREEN}{result[4]} {RESET}")
-        print(f"{BLUE}gen: {GREEN}{result[2]} {RESET}")
-        print()
-        print(RED + "Plural" + RESET)
-        print(f"{BLUE}nom: {GREEN}{result[1]} {RESET}")
-        print(f"{BLUE}acc: {GREEN}{result[7]} {RESET}")
-        print(f"{BLUE}dat: {GREEN}{result[5]} {RESET}")
-        print(f"{BLUE}gen: {GREEN}{result[3]} {RESET}")
-    else:
-        print(f"{RED}No declension found for the word '{word}'.{RESET}")
+    _close_database(curr, conn)
+    if result is None:
+        return None
+    return {
+        'singular': dict(zip(_CASES, result[0::2])),
+        'plural': dict(zip(_CASES, result[1::2])),
+    }
+
+def render_declension(word_id: int, color: bool = True) -> str:
+    declension = get_declension(word_id)
+    if declension is None:
+        return None
+    return format_declension(declension, color)
+
+def print_declension_of_noun(word, color=None):
+    color = use_color() if color is None else color
+    word_id = get_word_id(word)
+    output = _cached_output((word_id, 'declension', 0, '', int(color)),
+                            lambda: render_declension(word_id, color))
+    if output is None:
+        c = palette(color)
+        output = f"{c.RED}No declension found for the word '{word}'.{c.RESET}\n"
+    sys.stdout.write(output)
 
+@retry_when_locked
 def add_sentences_to_db(sentences_ls, word_id, replace=False):
     curr, conn = _open_database()
     if replace:
         curr.execute('DELETE FROM sentences WHERE word_id = ?', (word_id,))
-    for _, de_sentence, en_sentence in sentences_ls:
-        curr.execute('INSERT OR IGNORE INTO sentences (sentence, word_id) VALUES (?, ?)', (de_sentence + '--' + en_sentence, word_id))
+    curr.executemany('INSERT INTO sentences (german, english, word_id) VALUES (?, ?, ?)',
+                     [(de_sentence, en_sentence, word_id) for _, de_sentence, en_sentence in sentences_ls])
     _close_database(curr, conn)
 
-def print_sentences_from_db(word_id):
+def get_words_without_sentences(limit: int = None) -> list:
+    """ returns (id, word) of the verbs and nouns that have no sentences """
+    curr, conn = _open_database()
+    curr.execute("""
+        SELECT words.id, words.word
+        FROM words
+        JOIN types ON words.type_id = types.id
+        WHERE types.type IN ('verb', 'noun')
+        AND NOT EXISTS (SELECT 1 FROM sentences WHERE sentences.word_id = words.id)
+        ORDER BY words.id
+        LIMIT ?
+    """, (-1 if limit is None else limit,))
+    result = curr.fetchall()
+    _close_database(curr, conn)
+    return result
+
+def get_sentences(word_id) -> list:
+    """ (german, english) pairs of the example sentences of a word """
     curr, conn = _open_database()
-    curr.execute('SELECT sentence FROM sentences WHERE word_id = ?', (word_id,))
+    curr.execute('SELECT german, english FROM sentences WHERE word_id = ? ORDER BY id', (word_id,))
     result = curr.fetchall()
+    _close_database(curr, conn)
+    return result
+
+def print_sentences_from_db(word_id):
+    result = get_sentences(word_id)
+    if not result and has_open_job('sentences', word_id):
+        print(f"{ITALIC}example sentences are being generated, try again in a moment.{RESET}")
     print()
-    for sentence in result:
-        de, en = sentence[0].split('--')
-        align_num = len(de)
+    for de, en in result:
         print(f"{BLUE_LIGHT + de + RESET:45}", end=' ')
         print(BROWN_LIGHT + ITALIC + en + RESET, end='\n\n')
+
+# spellings without a german keyboard, the index itself only folds
+# umlauts to their plain letters
+_TRANSCRIPTIONS = (('ae', 'ä'), ('oe', 'ö'), ('ue', 'ü'), ('ss', 'ß'))
+
+def _fts_query(text: str) -> str:
+    """ every word of `text` as a quoted fts5 term, so that punctuation
+        like "don't" or "z.B." is not read as query syntax. "strasse" or
+        "ueber" also match "Straße" and "über".
+    """
+    terms = []
+    for word in text.lower().split():
+        spelled = word
+        for src, dst in _TRANSCRIPTIONS:
+            spelled = spelled.replace(src, dst)
+        quoted = ['"' + term.replace('"', '""') + '"' for term in dict.fromkeys((word, spelled))]
+        terms.append(quoted[0] if len(quoted) == 1 else f"({' OR '.join(quoted)})")
+    return ' AND '.join(terms)
+
+def search_sentences(query: str, page: int = 1, page_size: int = SENTENCE_PAGE_SIZE,
+                     marks: Tuple[str, str] = ('', '')) -> Tuple[int, list]:
+    """ the stored sentences whose german or english half contains every
+        word of `query`, best match first. returns the number of matches
+        and the (word, german, english) rows of page `page`, with the
+        matched words wrapped in `marks`.
+    """
+    match = _fts_query(query)
+    if not match:
+        return 0, []
+    curr, conn = _open_database()
+    curr.execute('SELECT COUNT(*) FROM sentences_fts WHERE sentences_fts MATCH ?', (match,))
+    total = curr.fetchone()[0]
+    curr.execute('''
+        SELECT words.word, highlight(sentences_fts, 0, ?, ?), highlight(sentences_fts, 1, ?, ?)
+        FROM sentences_fts
+        JOIN sentences ON sentences.id = sentences_fts.rowid
+        JOIN words ON words.id = sentences.word_id
+        WHERE sentences_fts MATCH ?
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    ''', (*marks, *marks, match, page_size, (max(page, 1) - 1) * page_size))
+    result = curr.fetchall()
     _close_database(curr, conn)
+    return total, result
+
+def print_sentence_search(query: str, page: int = 1, color=None):
+    color = use_color() if color is None else color
+    c = palette(color)
+    # search_sentences clamps the page the same way
+    page = max(1, page)
+    total, result = search_sentences(query, page, marks=(c.UNDERLINE, c.NO_UNDERLINE))
+    if not result:
+        print(f"{c.RED}No sentences found for '{query}'.{c.RESET}" if page <= 1 or not total else
+              f"{c.RED}No page {page}, '{query}' has {total} results.{c.RESET}")
+        return
+    first = (page - 1) * SENTENCE_PAGE_SIZE + 1
+    print(f"\n{c.BLUE}{first}-{first + len(result) - 1} of {total} sentences for '{query}'{c.RESET}\n")
+    for word, de, en in result:
+        print(f"{c.RED}{word}{c.RESET}")
+        print(f"{c.BLUE_LIGHT}{de}{c.RESET}")
+        print(f"{c.BROWN_LIGHT}{c.ITALIC}{en}{c.RESET}\n")
+    pages = -(-total // SENTENCE_PAGE_SIZE)
+    if page < pages:
+        print(f"{c.ITALIC}page {page} of {pages}, --page {page + 1} for more{c.RESET}")
+
+def _rows_by_word(curr: Cursor):
+    """ returns a function that gives the rows of a word id, for a cursor
+        ordered by word_id whose first column is the word id. it has to be
+        called with growing word ids, the cursor is read only once.
+    """
+    groups = itertools.groupby(curr, key=lambda row: row[0])
+    current = next(groups, None)
+
+    def rows_of(word_id: int) -> list:
+        nonlocal current
+        while current is not None and current[0] < word_id:
+            current = next(groups, None)
+        if current is None or current[0] != word_id:
+            return []
+        rows = list(current[1])
+        current = next(groups, None)
+        return rows
+    return rows_of
 
+def iter_word_records():
+    """ yields every stored word as a self-contained dict without ids:
+        its descriptors, definition, conjugation, declension and
+        sentences. the tables are read in word id order side by side, so
+        memory does not grow with the size of the dictionary.
+    """
+    conn = get_connection()
+    words = conn.execute('''
+        SELECT words.id, words.word, types.type, genders.gender, definitions.definition,
+               words.auxiliary, words.regular, words.separable
+        FROM words
+        JOIN types ON words.type_id = types.id
+        JOIN definitions ON words.definition_id = definitions.id
+        LEFT JOIN genders ON words.gender_id = genders.id
+        ORDER BY words.id
+    ''')
+    conjugations_of = _rows_by_word(conn.execute('''
+        SELECT word_id, moods.mood, tenses.tense, pronouns.pronoun, conjugation
+        FROM conjugations
+        JOIN moods ON conjugations.mood_id = moods.id
+        JOIN tenses ON conjugations.tense_id = tenses.id
+        JOIN pronouns ON conjugations.pronoun_id = pronouns.id
+        ORDER BY word_id, mood_id, tense_id, pronoun_id
+    '''))
+    declensions_of = _rows_by_word(conn.execute('''
+        SELECT word_id, singular_nominative, plural_nominative, singular_genitive, plural_genitive,
+               singular_dative, plural_dative, singular_accusative, plural_accusative
+        FROM declensions
+        ORDER BY word_id
+    '''))
+    sentences_of = _rows_by_word(conn.execute('SELECT word_id, german, english FROM sentences ORDER BY word_id, id'))
+
+    for word_id, word, type_, gender, definition, auxiliary, regular, separable in words:
+        conjugation = {}
+        for _, mood, tense, pronoun, form in conjugations_of(word_id):
+            conjugation.setdefault(mood, {}).setdefault(tense, {})[pronoun] = form
+        declension = None
+        for row in declensions_of(word_id)[:1]:
+            declension = {'singular': dict(zip(_CASES, row[1::2])), 'plural': dict(zip(_CASES, row[2::2]))}
+        yield {
+            'word': word,
+            'type': type_,
+            'gender': gender,
+            'definition': definition,
+            'auxiliary': auxiliary,
+            'regular': regular,
+            'separable': separable,
+            'conjugation': conjugation or None,
+            'declension': declension,
+            'sentences': [[german, english] for _, german, english in sentences_of(word_id)],
+        }
 
+@retry_when_locked
 def add_declension_to_db(declension_dict, word_id):
     curr, conn = _open_database()
 
@@ -301,5 +1304,199 @@ def add_declension_to_db(declension_dict, word_id):
         word_id
     )
     conn.execute(query, values)
+    _index_declined_forms(curr, [(word_id, number, case, declension_dict[number][case])
+                                 for number in ('singular', 'plural') for case in _CASES])
+
+    _close_database(curr, conn)
+
+def _form_keys_json(form: str) -> str:
+    # form_keys as a json array, for json_each in _INDEX_FORMS. keys are
+    # letters and spaces only, nothing to escape
+    keys = form_keys(form) if form else ()
+    return '["' + '","'.join(keys) + '"]' if keys else '[]'
+
+# the cells of the unindexed words with ids in [:first, :end)
+_INDEX_FORMS = f'''
+    INSERT OR IGNORE INTO word_forms (form, word_id, mood_id, tense_id, pronoun_id, number, noun_case)
+    SELECT keys.value, cells.word_id, cells.mood_id, cells.tense_id, cells.pronoun_id, cells.number, cells.noun_case
+    FROM ({' UNION ALL '.join(
+        [f"SELECT word_id, mood_id, tense_id, pronoun_id, '' AS number, '' AS noun_case, conjugation AS form "
+         f"FROM conjugations WHERE word_id IN (SELECT id FROM unindexed_words WHERE id >= :first AND id < :end)"]
+        + [f"SELECT word_id, 0, 0, 0, '{number}', '{case}', {number}_{case} "
+           f"FROM declensions WHERE word_id IN (SELECT id FROM unindexed_words WHERE id >= :first AND id < :end)"
+           for number in ('singular', 'plural') for case in _CASES])}) AS cells,
+        json_each(form_keys(cells.form)) AS keys
+'''
+
+@retry_when_locked
+def _index_word_range(first_id: int, end_id: int) -> int:
+    with transaction() as conn:
+        changes = conn.total_changes
+        conn.execute(_INDEX_FORMS, {'first': first_id, 'end': end_id})
+        return conn.total_changes - changes
+
+def index_word_forms(batch_size: int = FORMS_BATCH_SIZE) -> int:
+    """ adds the forms of the stored conjugations and declensions that are
+        missing in word_forms, for databases that were filled before it
+        existed. `batch_size` words are indexed per transaction, so lookups
+        and other writers only wait for one batch. returns the number of
+        added forms.
+    """
+    conn = get_connection()
+    conn.create_function('form_keys', 1, _form_keys_json, deterministic=True)
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS unindexed_words (id INTEGER PRIMARY KEY)')
+    with transaction():
+        conn.execute('DELETE FROM unindexed_words')
+        # words get all their forms in one transaction, so the others are complete
+        conn.execute('INSERT INTO unindexed_words SELECT id FROM words EXCEPT SELECT word_id FROM word_forms')
+    first_id, last_id = conn.execute('SELECT MIN(id), MAX(id) FROM unindexed_words').fetchone()
+    if first_id is None:
+        return 0
+    return sum(_index_word_range(start, start + batch_size)
+               for start in range(first_id, last_id + 1, batch_size))
+
+@retry_when_locked
+def enqueue_job(kind: str, payload: str):
+    """ queues a job, or queues a finished or failed one again. a job
+        that is pending or running already is left alone.
+    """
+    curr, conn = _open_database()
+    curr.execute("""
+        INSERT INTO jobs (kind, payload, status, attempts, updated_at)
+        VALUES (?, ?, 'pending', 0, ?)
+        ON CONFLICT (kind, payload) DO UPDATE
+        SET status = 'pending', attempts = 0, last_error = NULL, updated_at = excluded.updated_at,
+            available_at = 0
+        WHERE status IN ('done', 'failed')
+    """, (kind, str(payload), time.time()))
+    _close_database(curr, conn)
+
+@retry_when_locked
+def add_jobs(kind: str, payloads: list, retry_failed: bool = False) -> int:
+    """ queues the jobs of `payloads` that are not queued yet, in one
+        transaction. unlike enqueue_job, done jobs are left alone and
+        failed ones only queued again with retry_failed. returns the
+        number of jobs queued.
+    """
+    curr, conn = _open_database()
+    changes = conn.total_changes
+    now = time.time()
+    curr.executemany("""
+        INSERT INTO jobs (kind, payload, status, attempts, updated_at)
+        VALUES (?, ?, 'pending', 0, ?)
+        ON CONFLICT (kind, payload) DO UPDATE
+        SET status = 'pending', attempts = 0, last_error = NULL, updated_at = excluded.updated_at,
+            available_at = 0
+        WHERE status = 'failed' AND ?
+    """, [(kind, str(payload), now, retry_failed) for payload in payloads])
+    _close_database(curr, conn)
+    return conn.total_changes - changes
+
+@retry_when_locked
+def claim_job(kind: str):
+    """ marks the oldest pending job of `kind` that is not delayed as
+        running and returns its (id, payload), or None. safe with several
+        workers, the update is a single statement.
+    """
+    curr, conn = _open_database()
+    now = time.time()
+    curr.execute("""
+        UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ?
+        WHERE id = (SELECT id FROM jobs WHERE kind = ? AND status = 'pending' AND available_at <= ?
+                    ORDER BY id LIMIT 1)
+        RETURNING id, payload
+    """, (now, kind, now))
+    result = curr.fetchone()
+    _close_database(curr, conn)
+    return result
+
+@retry_when_locked
+def finish_job(job_id: int, error: str = None, max_attempts: int = 3):
+    """ marks a running job done, or on error pending again until it
+        has failed max_attempts times.
+    """
+    curr, conn = _open_database()
+    if error is None:
+        curr.execute("UPDATE jobs SET status = 'done', last_error = NULL, updated_at = ? WHERE id = ?",
+                     (time.time(), job_id))
+    else:
+        curr.execute("""
+            UPDATE jobs
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                last_error = ?, updated_at = ?
+            WHERE id = ?
+        """, (max_attempts, error, time.time(), job_id))
+    _close_database(curr, conn)
+
+@retry_when_locked
+def delay_job(job_id: int, delay: float, error: str = None):
+    """ puts a running job back to pending, to be claimed again in `delay`
+        seconds. unlike finish_job with an error, the attempt does not
+        count, for errors that are not the job's fault.
+    """
+    curr, conn = _open_database()
+    now = time.time()
+    curr.execute("""
+        UPDATE jobs
+        SET status = 'pending', attempts = attempts - 1, last_error = ?, updated_at = ?, available_at = ?
+        WHERE id = ?
+    """, (error, now, now + delay, job_id))
+    _close_database(curr, conn)
+
+def get_next_job_time(kind: str):
+    """ the time the first delayed pending job of `kind` can be claimed,
+        None if no pending job is delayed
+    """
+    curr, conn = _open_database()
+    curr.execute("SELECT MIN(available_at) FROM jobs WHERE kind = ? AND status = 'pending' AND available_at > ?",
+                 (kind, time.time()))
+    result = curr.fetchone()[0]
+    _close_database(curr, conn)
+    return result
 
+@retry_when_locked
+def renew_jobs(job_ids: list):
+    """ keeps running jobs from looking stale to release_stale_jobs while
+        their worker is still on them
+    """
+    if not job_ids:
+        return
+    curr, conn = _open_database()
+    curr.execute(f"UPDATE jobs SET updated_at = ? WHERE status = 'running' AND id IN ({', '.join('?' * len(job_ids))})",
+                 (time.time(), *job_ids))
     _close_database(curr, conn)
+
+@retry_when_locked
+def release_stale_jobs(kind: str, timeout: float):
+    """ puts jobs back to pending that have been running for longer than
+        `timeout` seconds, i.e. whose worker died.
+    """
+    curr, conn = _open_database()
+    curr.execute("UPDATE jobs SET status = 'pending', updated_at = ? WHERE kind = ? AND status = 'running' AND updated_at < ?",
+                 (time.time(), kind, time.time() - timeout))
+    _close_database(curr, conn)
+
+def get_job_counts(kind: str) -> dict:
+    """ number of jobs of `kind` per status """
+    curr, conn = _open_database()
+    curr.execute('SELECT status, COUNT(*) FROM jobs WHERE kind = ? GROUP BY status', (kind,))
+    counts = dict(curr.fetchall())
+    _close_database(curr, conn)
+    return counts
+
+def get_failed_jobs(kind: str, limit: int = 20) -> list:
+    """ (payload, last_error) of the last failed jobs of `kind` """
+    curr, conn = _open_database()
+    curr.execute("SELECT payload, last_error FROM jobs WHERE kind = ? AND status = 'failed' "
+                 "ORDER BY updated_at DESC LIMIT ?", (kind, limit))
+    result = curr.fetchall()
+    _close_database(curr, conn)
+    return result
+
+def has_open_job(kind: str, payload: str) -> bool:
+    curr, conn = _open_database()
+    curr.execute("SELECT 1 FROM jobs WHERE kind = ? AND payload = ? AND status IN ('pending', 'running')",
+                 (kind, str(payload)))
+    result = curr.fetchone()
+    _close_database(curr, conn)
+    return result is not None
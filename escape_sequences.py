@@ -1,8 +1,22 @@
+import os
+from types import SimpleNamespace
+
 BLUE   = "\033[1;34m"
 BLUE_LIGHT   = "\033[0;34m"
 RED    = "\033[1;31m"
 GREEN  = "\033[1;32m"
 BROWN_LIGHT = "\033[0;33m"
 ITALIC = "\033[3m"
+# underline keeps the color of the text around it
+UNDERLINE = "\033[4m"
+NO_UNDERLINE = "\033[24m"
 RESET  = "\033[0m"
 
+def use_color() -> bool:
+    """ colors are on unless NO_COLOR is set, see https://no-color.org """
+    return not os.environ.get('NO_COLOR')
+
+def palette(color: bool = True) -> SimpleNamespace:
+    """ the escape sequences above as attributes, all empty without color """
+    names = ('BLUE', 'BLUE_LIGHT', 'RED', 'GREEN', 'BROWN_LIGHT', 'ITALIC', 'UNDERLINE', 'NO_UNDERLINE', 'RESET')
+    return SimpleNamespace(**{name: globals()[name] if color else '' for name in names})
@@ -1,19 +1,49 @@
+from __future__ import annotations
+
 import re
-from bs4 import BeautifulSoup, element
-import pandas as pd
-from io import StringIO
-import re
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-from escape_sequences import BLUE, RED, GREEN, RESET
+from escape_sequences import palette
+import profiling
 
+# bs4 is only imported when a page is parsed, cached lookups never need it
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, element
 
-def print_aligned_conjugation_table(conjugation_list: list, col_padding: int = 4):
+@lru_cache(maxsize=None)
+def _page_sections():
+    """ the only parts of a verbformen page that the parse_* functions and
+        get_verb_variants read. navigation, ads and scripts are skipped.
+    """
+    from bs4 import SoupStrainer
+    return SoupStrainer(['div', 'section', 'p', 'a'],
+                        attrs={'class': re.compile(r'(^|\s)(rAbschnitt|rCntr|vDkl|rBox|rInf|rKnpf)(\s|$)')})
+
+def make_soup(html: str, full: bool = False, builder: str = 'html.parser') -> BeautifulSoup:
+    """ builds the tree of the page sections only, or of the whole page
+        with full. builder can be 'lxml', it falls back to html.parser when
+        lxml is not installed.
+    """
+    with profiling.span('import bs4'):
+        from bs4 import BeautifulSoup
+        if builder == 'lxml':
+            try:
+                import lxml
+            except ImportError:
+                builder = 'html.parser'
+    with profiling.span('soup', builder=builder, full=full):
+        if full:
+            return BeautifulSoup(html, builder)
+        return BeautifulSoup(html, builder, parse_only=_page_sections())
+
+def format_conjugation_table(conjugation_list: list, color: bool = True, col_padding: int = 4) -> str:
     """
-    prints the conjugation table with aligned columns.
+    returns the conjugation table with aligned columns, one line per pronoun.
     conjugation_list: list of tuples (tense, pronoun, conjugation)
     """
     if not conjugation_list:
-        return
+        return ''
 
     # prepare rows 2D array, where each rows are:
     # [ich, würde, gewesen, sein], [du, würdest, gewesen, sein], ...
@@ -24,7 +54,7 @@ def print_aligned_conjugation_table(conjugation_list: list, col_padding: int = 4
         parts = conjugation.split()
         rows.append([pronoun] + parts)
     if not rows:
-        return
+        return ''
 
     # find the longest row length
     num_columns = max(len(row) for row in rows)
@@ -36,58 +66,137 @@ def print_aligned_conjugation_table(conjugation_list: list, col_padding: int = 4
 
     # add padding buffer (the space between columns)
     col_widths = [w + col_padding for w in col_widths]
+    c = palette(color)
+    lines = []
     for row in rows:
-        # pronoun (first column) is blue
-        pronoun = row[0]
-        cell_padding = col_widths[0] - len(pronoun)
-        if cell_padding < 0: cell_padding = 0
-        print(f"{BLUE}{pronoun}{RESET}{' ' * cell_padding}", end='')
-        
-        # conjugation parts (rest) are green
+        # pronoun (first column) is blue, conjugation parts (rest) are green
+        cells = [f"{c.BLUE}{row[0]}{c.RESET}{' ' * max(col_widths[0] - len(row[0]), 0)}"]
         for i in range(1, len(row)):
-            item = row[i]
-            cell_padding = col_widths[i] - len(item)
-            if cell_padding < 0: cell_padding = 0
-            
-            print(f"{GREEN}{item}{RESET}{' ' * cell_padding}", end='')
-        print()
-    
-def get_possible_matches(word: str) -> list:
-    """Generates possible umlaut variations for a given word."""
-    candidates = [word]
-
-    # Common mappings
-    mappings = {
-        'ae': 'ä',
-        'oe': 'ö',
-        'ue': 'ü',
-        'ss': 'ß'
-    }
-
-    # Simple replacement for typical patterns
-    temp_word = word
-    for k, v in mappings.items():
-        if k in temp_word:
-            candidates.append(temp_word.replace(k, v))
-
-    # also try replacing single vowels if they mapped to umlauts (heuristic)
-    # this is broader, e.g. "wahlen" -> "wählen"
-    vowel_map = {
-        'a': 'ä',
-        'o': 'ö',
-        'u': 'ü'
-    }
+            cells.append(f"{c.GREEN}{row[i]}{c.RESET}{' ' * max(col_widths[i] - len(row[i]), 0)}")
+        lines.append(''.join(cells) + '\n')
+    return ''.join(lines)
 
-    # generate variations for each vowel occurrence
-    # for now, add the specific 'a' -> 'ä' etc logic if the simple mapping didn't cover it.
-
-    if 'a' in word: candidates.append(word.replace('a', 'ä'))
-    if 'o' in word: candidates.append(word.replace('o', 'ö'))
-    if 'u' in word: candidates.append(word.replace('u', 'ü'))
-
-    return list(set(candidates))
-
-def get_verb_variants(soup: BeautifulSoup) -> list:
+def format_declension(declension: dict, color: bool = True) -> str:
+    """ the singular and plural forms of a declension dict, in the order
+        nominative, accusative, dative, genitive.
+    """
+    c = palette(color)
+    blocks = []
+    for number in ('singular', 'plural'):
+        forms = declension[number]
+        lines = [c.RED + number.capitalize() + c.RESET]
+        for case in ('nominative', 'accusative', 'dative', 'genitive'):
+            lines.append(f"{c.BLUE}{case[:3]}: {c.GREEN}{forms[case]} {c.RESET}")
+        blocks.append('\n'.join(lines) + '\n')
+    return '\n'.join(blocks)
+
+def fold_word(word: str) -> str:
+    """ folds case, umlauts, ß and the separable verb dot into a search key,
+        "Wählen", "waehlen" and "wahlen" all become "wahlen".
+    """
+    word = word.lower().replace('·', '')
+    for src, dst in [('ä', 'a'), ('ö', 'o'), ('ü', 'u'), ('ß', 'ss'),
+                     ('ae', 'a'), ('oe', 'o'), ('ue', 'u')]:
+        word = word.replace(src, dst)
+    return word
+
+ARTICLES = frozenset(('der', 'die', 'das', 'des', 'dem', 'den',
+                       'ein', 'eine', 'einer', 'eines', 'einem', 'einen'))
+# words of multi-word forms that say nothing about the word itself:
+# auxiliaries, pronouns and separable particles
+_FORM_FILLERS = frozenset(fold_word(w) for w in (
+    'habe', 'hast', 'hat', 'haben', 'habt', 'hatte', 'hattest', 'hatten', 'hattet',
+    'hätte', 'hättest', 'hätten', 'hättet', 'gehabt',
+    'bin', 'bist', 'ist', 'sind', 'seid', 'sei', 'seiest', 'seien', 'seiet', 'sein',
+    'war', 'warst', 'waren', 'wart', 'wäre', 'wärst', 'wären', 'wärt', 'gewesen',
+    'werde', 'wirst', 'wird', 'werden', 'werdet', 'würde', 'würdest', 'würden', 'würdet', 'geworden',
+    'ich', 'du', 'er', 'es', 'wir', 'ihr', 'sie', 'man',
+    'mich', 'dich', 'sich', 'uns', 'euch', 'mir', 'dir', 'zu',
+    'ab', 'an', 'auf', 'aus', 'bei', 'ein', 'durch', 'fest', 'fort', 'heim', 'her', 'hin', 'los',
+    'mit', 'nach', 'um', 'vor', 'vorbei', 'weg', 'weiter', 'wieder', 'zurück', 'zusammen',
+))
+# letters only, without punctuation and superscript footnote marks
+_FORM_TOKEN = re.compile(r'[^\W\d_¹²³\u2070-\u209f]+')
+
+@lru_cache(maxsize=65536)
+def form_keys(form: str) -> tuple:
+    """ the search keys of an inflected form, folded by fold_word: the form
+        without articles and, for multi-word forms, each word that is not an
+        auxiliary, pronoun or particle. optional letters give both spellings.
+        "dem Tisch(e)" => ('tische', 'tisch'), "bin gegangen" =>
+        ('bin gegangen', 'gegangen'), "fange an" => ('fange an', 'fange')
+    """
+    keys = []
+    spellings = (re.sub(r'\((\w*)\)', r'\1', form), re.sub(r'\(\w*\)', '', form)) if '(' in form else (form,)
+    for spelling in spellings:
+        tokens = _FORM_TOKEN.findall(fold_word(spelling))
+        while tokens and tokens[0] in ARTICLES:
+            tokens.pop(0)
+        if not tokens:
+            continue
+        keys.append(' '.join(tokens))
+        if len(tokens) > 1:
+            keys.extend(token for token in tokens if token not in _FORM_FILLERS)
+    return tuple(dict.fromkeys(keys))
+
+_NUMBERS = ('singular', 'plural')
+_CASES = ('nominative', 'accusative', 'dative', 'genitive')
+
+def describe_cells(cells: list, limit: int = 3) -> str:
+    """ the cells a form appears in, from (tense, pronoun) or (number,
+        case) pairs: "imperfect: ich, er", "plural: nominative, accusative".
+        moods are left out, "imperfect" is in several. more than `limit`
+        tenses or numbers end in "...".
+    """
+    def order(cell):
+        if cell[0] in _NUMBERS:
+            return _NUMBERS.index(cell[0]), _CASES.index(cell[1]) if cell[1] in _CASES else len(_CASES)
+        return 0, 0
+
+    groups = {}
+    for group, item in sorted(cells, key=order):
+        items = groups.setdefault(group, [])
+        # pronouns '0' and '1' number the infinitives and participles
+        if item and item.isalpha() and item not in items:
+            items.append(item)
+    parts = [f"{group}: {', '.join(items)}" if items else group for group, items in list(groups.items())[:limit]]
+    return '; '.join(parts) + ('; ...' if len(groups) > limit else '')
+
+def typo_keys(word: str) -> list:
+    """ the folded tokens of `word` that misspellings are matched against,
+        without articles, auxiliaries, pronouns, particles and tokens of
+        less than four letters. "sich erinnern" => ['erinnern']
+    """
+    tokens = _FORM_TOKEN.findall(fold_word(word))
+    return [token for token in tokens
+            if len(token) >= 4 and token not in ARTICLES and token not in _FORM_FILLERS]
+
+def deletion_keys(key: str, deletions: int = 1) -> set:
+    """ `key` and every string left after deleting up to `deletions`
+        letters of it. two words one typo apart (a letter missing, added,
+        replaced, or two letters swapped) share a key of one deletion:
+        "keit" and "kiet" both give "kit".
+    """
+    keys = {key}
+    for _ in range(deletions):
+        keys |= {k[:i] + k[i + 1:] for k in keys for i in range(len(k))}
+    return keys
+
+def edit_distance(a: str, b: str) -> int:
+    """ levenshtein distance of `a` and `b`, swapping two neighbouring
+        letters counts as one edit
+    """
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+def get_verb_variants(soup: BeautifulSoup, base_url: str = "https://www.verbformen.com") -> list:
     """
     Scans for variant links (e.g. 'haben' vs 'sein' forms) and returns a list of (label, url).
     """
@@ -109,7 +218,7 @@ def get_verb_variants(soup: BeautifulSoup) -> list:
             # 2. fallback to title attribute of the <a> tag
             label = link.get('title', '').strip()
 
-        full_url = "https://www.verbformen.com" + href if href.startswith("/") else href
+        full_url = base_url + href if href.startswith("/") else href
         variants.append((label, full_url))
 
     return variants
@@ -174,36 +283,6 @@ def parse_word_descriptors(soup: BeautifulSoup):
     return word, word_type, gender, regular, auxiliary, separable
 
 
-def parse_declension(soup :BeautifulSoup):
-    declension_dict = {'singular': {}, 'plural': {}}
-    divs = soup.select("div.rAufZu > div.vDkl > div.vTbl") 
-    for i in range(len(divs)):
-        tb = divs[i].table
-        nom_art = tb.find('th', {'title': 'Nominative'}).next_sibling.next_sibling.text
-        nom     = tb.find('th', {'title': 'Nominative'}).next_sibling.next_sibling.next_sibling.text
-
-        gen_art = tb.find('th', {'title': 'Genitive'  }).next_sibling.next_sibling.text
-        gen     = tb.find('th', {'title': 'Genitive'  }).next_sibling.next_sibling.next_sibling.text
-
-        dat_art = tb.find('th', {'title': 'Dative'    }).next_sibling.next_sibling.text
-        dat     = tb.find('th', {'title': 'Dative'    }).next_sibling.next_sibling.next_sibling.text
-
-        acc_art = tb.find('th', {'title': 'Accusative'}).next_sibling.next_sibling.text
-        acc     = tb.find('th', {'title': 'Accusative'}).next_sibling.next_sibling.next_sibling.text
-        # singular
-        if i == 0:
-            declension_dict['singular'] = {'nominative': nom_art + ' ' + nom,
-                                           'genitive'  : gen_art + ' ' + gen,
-                                           'dative'    : dat_art + ' ' + dat,
-                                           'accusative': acc_art + ' ' + acc}
-        # plural
-        elif i == 1:
-            declension_dict['plural'] = {'nominative'  : nom_art + ' ' + nom,
-                                         'genitive'    : gen_art + ' ' + gen,
-                                         'dative'      : dat_art + ' ' + dat,
-                                         'accusative'  : acc_art + ' ' + acc}
-    return declension_dict
-
 def _delete_superscripts(s: str) -> str:
     # delete superscripts by using unicode superscript range.
     return re.sub(r'[\u2070-\u2079]', '', s)
@@ -326,16 +405,29 @@ def parse_definition(soup: BeautifulSoup):
     return definition
 
 
+def _declension_forms(table: element.Tag) -> list:
+    """ returns the text of the article and form cells of each case row,
+        joined by two spaces, e.g. ['der  Tisch', 'des  Tisch(e)s', ...]
+    """
+    forms = []
+    for tr in table.find_all('tr'):
+        # header rows have no data cells
+        if tr.find('td') is None:
+            continue
+        cells = tr.find_all(['th', 'td'])
+        forms.append('  '.join(cell.get_text(' ', strip=True) for cell in cells[1:3]))
+    return forms
+
 def parse_declension(soup: BeautifulSoup):
 
     def clean_form(cell):
         """Removes spaces, slashes, and superscripts. Keeps first clear form."""
-        if pd.isna(cell):
+        if not cell:
             return ''
         text = re.sub(r"\s+", "", str(cell))          # remove all whitespace
         text = re.split(r"/", text)[0]                # take the first variant before slash
         text = re.sub(r"\d+", "", text)               # remove superscript numbers
-        text = re.sub(r'[\u2070-\u2079]+$', '', text) # remove unicode superscripts
+        text = re.sub(r'[\u00b9\u00b2\u00b3\u2070-\u2079]+$', '', text) # remove unicode superscripts, ¹²³ are latin-1
         return text
 
     def split_article_words(compound):
@@ -356,24 +448,13 @@ def parse_declension(soup: BeautifulSoup):
     cases = ['nominative', 'genitive', 'dative', 'accusative']
 
     # Extract tables
-    table1_html = soup.select_one("div.vDkl > div.vTbl:nth-of-type(1) > table").prettify()
-    table2_html = soup.select_one("div.vDkl > div.vTbl:nth-of-type(2) > table").prettify()
-
-
-    sgl = pd.read_html(StringIO(table1_html))[0]
-    # concatenate the first and second columns
-    if sgl.shape[1] > 2:
-        sgl.iloc[:, 1] = sgl.iloc[:, 1] + '  ' + sgl.iloc[:, 2]
-
-    plr = pd.read_html(StringIO(table2_html))[0]
-
-    # concatenate the first and second columns
-    if plr.shape[1] > 2:
-        plr.iloc[:, 1] = plr.iloc[:, 1] + '  ' + plr.iloc[:, 2]
+    sgl = _declension_forms(soup.select_one("div.vDkl > div.vTbl:nth-of-type(1) > table"))
+    plr = _declension_forms(soup.select_one("div.vDkl > div.vTbl:nth-of-type(2) > table"))
 
     for i, case in enumerate(cases):
-        declension_dict['singular'][case] = split_article_words(clean_form(sgl.iloc[i, 1]))
-        declension_dict['plural'][case] = split_article_words(clean_form(plr.iloc[i, 1]))
+        if i < len(sgl):
+            declension_dict['singular'][case] = split_article_words(clean_form(sgl[i]))
+        if i < len(plr):
+            declension_dict['plural'][case] = split_article_words(clean_form(plr[i]))
 
     return declension_dict
-
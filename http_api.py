@@ -0,0 +1,205 @@
+""" read-only http/json service over the dictionary database, for tools
+    that would otherwise shell out to main.py.
+
+    GET /word/{w}                              descriptors and definition
+    GET /conjugation/{w}?mood=MOOD&tense=TENSE  mood => tense => pronoun => form
+    GET /declension/{w}                        number => case => form
+    GET /sentences/{w}                         [{"german": .., "english": ..}]
+
+    mood and tense are optional filters. found answers carry an etag derived
+    from the change counter of the database, a request for one with a
+    matching If-None-Match is answered with 304, and answers are cached in
+    memory until the counter moves.
+"""
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import db
+
+DEFAULT_PORT = 8080
+# number of answers kept in memory
+CACHE_SIZE = 1024
+# seconds an idle keep-alive connection is kept open
+IDLE_TIMEOUT = 5
+
+_thread_state = threading.local()
+
+class _ResponseCache:
+    """ path => (change count, status, body), the least recently used
+        entries are dropped first.
+    """
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self._size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, count: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != count:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1:]
+
+    def put(self, key: str, count: int, status: int, body: bytes):
+        with self._lock:
+            self._entries[key] = (count, status, body)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+class NotFound(LookupError):
+    pass
+
+def _resolve(word: str) -> int:
+    """ the id of the stored word that a lookup of `word` takes when nobody
+        chooses, with the same db.lookup_word and db.default_match as
+        main.py. words that main.py would only offer are not found, their
+        candidates are named in the error.
+    """
+    kind, matches = db.lookup_word(word)
+    match = db.default_match(word, kind, matches) if matches else None
+    if match is None:
+        candidates = ', '.join(match[1] for match in matches)
+        raise NotFound(f"word '{word}' not found" + (f", did you mean: {candidates}" if candidates else ''))
+    return match[0]
+
+def _word(word: str, query: dict):
+    word_id = _resolve(word)
+    return dict(db.get_word_entry(word_id), id=word_id)
+
+def _conjugation(word: str, query: dict):
+    word_id = _resolve(word)
+    table = db.get_conjugation_table(word_id)
+    mood, tense = query.get('mood'), query.get('tense')
+    if mood is not None:
+        table = {name: tenses for name, tenses in table.items() if name.lower() == mood.lower()}
+        if not table:
+            raise NotFound(f"no conjugation for mood '{mood}'")
+    if tense is not None:
+        table = {name: {t: forms for t, forms in tenses.items() if t.lower() == tense.lower()}
+                 for name, tenses in table.items()}
+        table = {name: tenses for name, tenses in table.items() if tenses}
+        if not table:
+            raise NotFound(f"no conjugation for tense '{tense}'")
+    return {'word': db.get_word(word_id), 'conjugation': table}
+
+def _declension(word: str, query: dict):
+    word_id = _resolve(word)
+    declension = db.get_declension(word_id)
+    if declension is None:
+        raise NotFound(f"no declension for '{word}'")
+    return {'word': db.get_word(word_id), 'declension': declension}
+
+def _sentences(word: str, query: dict):
+    word_id = _resolve(word)
+    return {'word': db.get_word(word_id),
+            'sentences': [{'german': de, 'english': en} for de, en in db.get_sentences(word_id)]}
+
+def _complete(prefix: str, query: dict):
+    limit = query.get('limit', '')
+    limit = min(int(limit), 100) if limit.isdigit() else db.COMPLETION_LIMIT
+    return {'prefix': prefix, 'words': db.complete_words(prefix, limit)}
+
+ROUTES = {
+    'word': _word,
+    'conjugation': _conjugation,
+    'declension': _declension,
+    'sentences': _sentences,
+    'complete': _complete,
+}
+
+def _answer(path: str, query: dict):
+    """ the status and json of a request """
+    parts = path.strip('/').split('/', 1)
+    route = ROUTES.get(parts[0])
+    if route is None or len(parts) != 2 or not parts[1]:
+        return 404, {'error': f"unknown path '{path}'"}
+    try:
+        return 200, route(unquote(parts[1]), query)
+    except NotFound as e:
+        return 404, {'error': str(e)}
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """ whether an If-None-Match header names `etag`: "*", or a comma
+        separated list of tags compared weakly, W/"3" matches "3"
+    """
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return any(tag == '*' or tag.removeprefix('W/') == etag for tag in tags)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    timeout = IDLE_TIMEOUT
+    # headers and body are separate writes, without this every answer
+    # waits for the delayed ack of the client
+    disable_nagle_algorithm = True
+
+    def _send(self, status: int, body: bytes = b'', headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not getattr(_thread_state, 'connected', False):
+            db.use_read_only_connection()
+            _thread_state.connected = True
+
+        count = db.get_change_count()
+        cached = self.server.cache.get(self.path, count)
+        if cached is None:
+            url = urlsplit(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            status, answer = _answer(url.path, query)
+            body = json.dumps(answer, ensure_ascii=False).encode('utf-8')
+            self.server.cache.put(self.path, count, status, body)
+        else:
+            status, body = cached
+
+        # only answers that exist get an etag, a 404 is never a 304
+        if status != 200:
+            self._send(status, body, {'Content-Type': 'application/json; charset=utf-8'})
+            return
+        etag = f'"{count}"'
+        if _etag_matches(self.headers.get('If-None-Match'), etag):
+            self._send(304, headers={'ETag': etag})
+            return
+        self._send(status, body, {'Content-Type': 'application/json; charset=utf-8', 'ETag': etag})
+
+    def log_message(self, format, *args):
+        pass
+
+class _Server(ThreadingHTTPServer):
+    """ one thread per client connection, each with its own read-only
+        database connection that lives as long as the thread.
+    """
+
+    # the default backlog of 5 makes a burst of new clients wait for
+    # syn retransmits
+    request_queue_size = 128
+
+    def __init__(self, address):
+        super().__init__(address, _Handler)
+        self.cache = _ResponseCache()
+
+def serve_http(port: int = DEFAULT_PORT, host: str = '127.0.0.1'):
+    # migrations need a writable connection, the request threads only read
+    db.get_change_count()
+    db.close_connections()
+
+    server = _Server((host, port))
+    print(f"german-dict http service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
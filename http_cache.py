@@ -0,0 +1,213 @@
+import time
+import zlib
+import random
+from functools import lru_cache
+from typing import NamedTuple
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from db import get_connection, transaction, retry_when_locked
+from config import get_cache_ttl, get_fetch_settings
+import profiling
+
+HTTP_CACHE_PATH = 'http_cache.db'
+# answers that mean "too fast", the request is repeated after a pause
+SLOW_DOWN_STATUS = (429, 503)
+# rate limit: a 429 halves the rate, every successful request adds this
+# much to it, in requests per second
+MIN_RATE = 0.1
+RATE_INCREASE = 0.1
+# longest pause before a retry, Retry-After included
+MAX_BACKOFF = 60
+
+# normal: serve fresh cached pages, download the rest
+# offline: never touch the network, a page that is not cached is an error
+# refresh: always download, and replace what is cached
+CACHE_MODES = ('normal', 'offline', 'refresh')
+_mode = 'normal'
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    text: str
+
+def set_cache_mode(mode: str):
+    global _mode
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode '{mode}'")
+    _mode = mode
+
+@lru_cache(maxsize=None)
+def _cache_ttl() -> float:
+    return get_cache_ttl()
+
+@lru_cache(maxsize=None)
+def _fetch_settings() -> dict:
+    return get_fetch_settings()
+
+def normalize_url(url: str) -> str:
+    """ lower cases scheme and host, sorts the query and drops the fragment,
+        so that the same page is always stored under the same key.
+    """
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+def _open_cache():
+    conn = get_connection(HTTP_CACHE_PATH)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            status INTEGER NOT NULL,
+            body BLOB NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+    ''')
+    # one token bucket per host, shared by every process of the directory
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            host TEXT PRIMARY KEY,
+            rate REAL NOT NULL,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            blocked_until REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    return conn
+
+def _read_cache(conn, key: str, ttl: float):
+    row = conn.execute('SELECT status, body, fetched_at FROM responses WHERE url = ?', (key,)).fetchone()
+    if row is None:
+        return None
+    status, body, fetched_at = row
+    if ttl > 0 and time.time() - fetched_at > ttl:
+        return None
+    return CachedResponse(status, zlib.decompress(body).decode('utf-8'))
+
+@retry_when_locked
+def _write_cache(key: str, response: CachedResponse):
+    body = zlib.compress(response.text.encode('utf-8'))
+    with transaction(HTTP_CACHE_PATH) as conn:
+        conn.execute('INSERT OR REPLACE INTO responses (url, status, body, fetched_at) VALUES (?, ?, ?, ?)',
+                     (key, response.status_code, body, time.time()))
+
+@retry_when_locked
+def _take_token(host: str) -> float:
+    """ takes a token of the bucket of `host` and returns the seconds to
+        wait before the request may go out. the bucket may go below zero,
+        the waiting requests then leave one by one at the current rate.
+    """
+    settings = _fetch_settings()
+    now = time.time()
+    with transaction(HTTP_CACHE_PATH) as conn:
+        row = conn.execute('SELECT rate, tokens, updated_at, blocked_until FROM rate_limits WHERE host = ?',
+                           (host,)).fetchone()
+        rate, tokens, updated_at, blocked_until = row or (settings['rate'], settings['burst'], now, 0)
+        tokens = min(settings['burst'], tokens + (now - updated_at) * rate) - 1
+        conn.execute('INSERT OR REPLACE INTO rate_limits (host, rate, tokens, updated_at, blocked_until) '
+                     'VALUES (?, ?, ?, ?, ?)', (host, rate, tokens, now, blocked_until))
+    return max(0.0, -tokens / rate, blocked_until - now)
+
+@retry_when_locked
+def _adjust_rate(host: str, slow_down: bool, pause: float = 0):
+    """ additive increase after a success, and after a 429 half the rate,
+        an empty bucket and no request at all for `pause` seconds
+    """
+    settings = _fetch_settings()
+    now = time.time()
+    with transaction(HTTP_CACHE_PATH) as conn:
+        if slow_down:
+            # the other requests that were out at the same time get their 429
+            # during the pause, they must not halve the rate again
+            conn.execute('''
+                UPDATE rate_limits SET rate = CASE WHEN blocked_until < ? THEN MAX(?, rate / 2) ELSE rate END,
+                                       tokens = MIN(tokens, 0), blocked_until = MAX(blocked_until, ?)
+                WHERE host = ?
+            ''', (now, MIN_RATE, now + pause, host))
+        else:
+            conn.execute('UPDATE rate_limits SET rate = MIN(?, rate + ?) WHERE host = ?',
+                         (settings['max_rate'], RATE_INCREASE, host))
+
+def _retry_after(value: str):
+    """ seconds of a Retry-After header, given as seconds or as a date """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff(attempt: int) -> float:
+    return min(MAX_BACKOFF, 2 ** attempt) * random.uniform(0.5, 1.5)
+
+def download(url: str) -> CachedResponse:
+    """ requests.get with the shared rate limit of the host, timeouts, and
+        retries with exponential backoff and jitter after timeouts,
+        connection errors, 429 and 5xx answers. a 429 that is still there
+        after the last retry is returned.
+    """
+    with profiling.span('import requests'):
+        import requests
+    _open_cache()
+    settings = _fetch_settings()
+    host = urlsplit(url).netloc.lower()
+    retries = int(settings['retries'])
+    for attempt in range(retries + 1):
+        wait = _take_token(host)
+        if wait > 0:
+            with profiling.span('rate limit', seconds=wait):
+                time.sleep(wait)
+        try:
+            with profiling.span('download', url=url):
+                r = requests.get(url, timeout=(settings['connect_timeout'], settings['read_timeout']))
+                profiling.count('bytes_downloaded', len(r.content))
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            profiling.count('http_retries')
+            time.sleep(_backoff(attempt))
+            continue
+
+        if r.status_code in SLOW_DOWN_STATUS:
+            # everyone waits, for Retry-After or else the backoff
+            retry_after = _retry_after(r.headers.get('Retry-After'))
+            pause = min(MAX_BACKOFF, retry_after) if retry_after is not None else _backoff(attempt)
+            _adjust_rate(host, slow_down=True, pause=pause * random.uniform(1, 1.2))
+        elif r.status_code >= 500:
+            time.sleep(_backoff(attempt))
+        else:
+            _adjust_rate(host, slow_down=False)
+            return CachedResponse(r.status_code, r.text)
+        if attempt == retries:
+            return CachedResponse(r.status_code, r.text)
+        profiling.count('http_retries')
+
+def cached_get(url: str) -> CachedResponse:
+    """ download in front of a local, zlib compressed response cache.
+        only successful responses are cached, for the ttl set in config.ini.
+    """
+    key = normalize_url(url)
+    conn = _open_cache()
+    if _mode != 'refresh':
+        # offline mode serves stale pages as well
+        with profiling.span('http cache'):
+            cached = _read_cache(conn, key, 0 if _mode == 'offline' else _cache_ttl())
+        if cached is not None:
+            profiling.count('http_cache_hits')
+            return cached
+    if _mode == 'offline':
+        raise LookupError(f"{url} is not cached and offline mode is on")
+
+    response = download(url)
+    if response.status_code == 200:
+        _write_cache(key, response)
+    return response
+
+def iter_cached_pages():
+    """ yields (url, text) of every successful response in the cache """
+    conn = _open_cache()
+    for url, body in conn.execute('SELECT url, body FROM responses WHERE status = 200'):
+        yield url, zlib.decompress(body).decode('utf-8')
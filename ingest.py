@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from db import *
+from config import get_tree_builder
+from helper import *
+from http_cache import cached_get
+import profiling
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+VERBFORMEN_URL = os.environ.get("VERBFORMEN_URL", "https://www.verbformen.com")
+DEFAULT_WORKERS = 4
+
+# map string descriptors to integers
+AUX_MAP = {'haben': 0, 'sein': 1}
+REG_MAP = {'regular': 1, 'irregular': 0}
+
+def word_url(word: str) -> str:
+    return f"{VERBFORMEN_URL}/?w={word}"
+
+def fetch_page(url: str):
+    return cached_get(url)
+
+@lru_cache(maxsize=None)
+def _tree_builder() -> str:
+    return get_tree_builder()
+
+def page_soup(html: str, full: bool = False) -> BeautifulSoup:
+    return make_soup(html, full, _tree_builder())
+
+def parse_page(soup: BeautifulSoup) -> dict:
+    """ parses everything that is stored for a word out of its verbformen
+        page. conjugation and declension are only parsed for verbs and nouns.
+    """
+    with profiling.span('parse descriptors'):
+        word, word_type, gender, regular, auxiliary, separable = parse_word_descriptors(soup)
+    record = {
+        'word': word,
+        'word_type': word_type,
+        'gender': gender,
+        'regular': regular,
+        'auxiliary': auxiliary,
+        'separable': separable,
+        'definition': parse_definition(soup),
+        'conjugation': None,
+        'declension': None,
+    }
+    if word_type == 'verb':
+        with profiling.span('parse conjugation'):
+            record['conjugation'] = parse_conjugation(soup)
+    elif word_type == 'noun':
+        with profiling.span('parse declension'):
+            record['declension'] = parse_declension(soup)
+    return record
+
+def parse_html(html: str, soup: BeautifulSoup = None) -> dict:
+    """ parse_page on the page sections of `html`, `soup` may be the already
+        made page_soup of it. falls back to the whole page when the page
+        layout does not fit the sections.
+    """
+    try:
+        record = parse_page(soup if soup is not None else page_soup(html))
+        if record['word'] is not None:
+            return record
+    except Exception:
+        pass
+    return parse_page(page_soup(html, full=True))
+
+def store_word(record: dict, word: str):
+    """ stores a parsed page under the name `word` and returns a tuple of
+        the word id (None if the word type is not stored) and whether the
+        word was new. everything of the word is written in one transaction.
+    """
+    if record['word_type'] not in ('verb', 'noun', 'adjective'):
+        return None, False
+
+    # map values with default values to prevent crashes
+    return add_word_entry(
+        word,
+        record['definition'],
+        record['word_type'],
+        gender=record['gender'] if record['word_type'] == 'noun' else None,
+        auxiliary=AUX_MAP.get(record['auxiliary']),
+        regular=REG_MAP.get(record['regular'], 1),
+        separable=record['separable'],
+        conjugation_dict=record['conjugation'],
+        declension_dict=record['declension'],
+    )
+
+def _fetch_html(url: str) -> str:
+    r = fetch_page(url)
+    if r.status_code == 429:
+        raise RuntimeError("too many requests")
+    if r.status_code != 200:
+        raise RuntimeError(f"http status {r.status_code}")
+    return r.text
+
+def _fetch_and_parse(word: str) -> list:
+    """ the (record, name) pairs to store for `word`. like main.py and the
+        crawler, a verb with haben and sein forms is stored once per form,
+        "fliegen (haben)" and "fliegen (sein)", never on its own.
+        runs in the worker threads, so it must not touch the database.
+    """
+    html = _fetch_html(word_url(word))
+    soup = page_soup(html)
+    variants = get_verb_variants(soup, VERBFORMEN_URL)
+    if len(variants) > 1:
+        pages = [(label, _fetch_html(url)) for label, url in variants]
+    else:
+        pages = [(None, html)]
+
+    records = []
+    for label, page in pages:
+        record = parse_html(page, soup if page is html else None)
+        if record['word'] is None:
+            raise RuntimeError("no entry found")
+        records.append((record, f"{record['word']} ({label})" if label else record['word']))
+    return records
+
+def read_word_list(path: str) -> list:
+    """ reads one word per line from `path`, or from stdin for '-' """
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        return [line.strip() for line in f if line.strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def run_batch(words: list, workers: int = DEFAULT_WORKERS) -> int:
+    """ fetches and stores every word of `words` that is not stored yet.
+        pages are fetched and parsed by a pool of `workers` threads, the
+        main thread is the only one writing to the database.
+        returns the number of failed words.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    start = time.perf_counter()
+    words = list(dict.fromkeys(words))
+    existing = get_existing_words(words)
+    missing = [w for w in words if w not in existing]
+    stored, duplicates, failures = 0, 0, []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_fetch_and_parse, w): w for w in missing}
+        for future in as_completed(futures):
+            word = futures[future]
+            try:
+                records = future.result()
+                inserted = False
+                for record, name in records:
+                    with profiling.span('store', word=name):
+                        word_id, new = store_word(record, name)
+                    if word_id is None:
+                        raise RuntimeError(f"unknown word type '{record['word_type']}'")
+                    inserted = inserted or new
+            except Exception as e:
+                failures.append((word, e))
+                continue
+            if inserted:
+                stored += 1
+            else:
+                # e.g. "lief" resolves to the already stored "laufen"
+                duplicates += 1
+
+    elapsed = time.perf_counter() - start
+    throughput = len(missing) / elapsed if elapsed > 0 else 0.0
+    print(f"{BLUE}stored:{RESET} {stored}  "
+          f"{BLUE}skipped:{RESET} {len(words) - len(missing) + duplicates}  "
+          f"{BLUE}failed:{RESET} {len(failures)}")
+    print(f"{BLUE}fetched:{RESET} {len(missing)} words in {elapsed:.1f}s ({throughput:.2f} words/s)")
+    for word, e in failures:
+        sys.stderr.write(f"{word}: {e}\n")
+    return len(failures)
@@ -1,13 +1,20 @@
+import os
 import sqlite3
 
+from db import SCHEMA_VERSION, TENSES, PRONOUNS
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
 def initialize_database():
-    with open('schema.sql', 'r') as f:
+    with open(SCHEMA_FILE, 'r') as f:
         schema = f.read()
 
     conn = sqlite3.connect('dictionary.db')
     curr = conn.cursor()
 
     curr.executescript(schema)
+    # schema.sql is always the latest schema, no migrations needed
+    curr.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     conn.commit()
 
     pos_ls = ['noun', 'pronoun', 'verb', 'adjective', 'adverb',
@@ -27,6 +34,13 @@ def initialize_database():
         curr.execute("INSERT INTO genders (gender) VALUES (?)", (gn,))
     conn.commit()
 
+    # the ids give the display order of the conjugation tables
+    for tense in TENSES:
+        curr.execute("INSERT INTO tenses (tense) VALUES (?)", (tense,))
+    for pronoun in PRONOUNS:
+        curr.execute("INSERT INTO pronouns (pronoun) VALUES (?)", (pronoun,))
+    conn.commit()
+
 
     curr.close()
     conn.close()
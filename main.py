@@ -1,28 +1,37 @@
 #!/home/melik/Documents/projects/german-dict/venv/bin/python
 import os
 import sys
+import time
 import argparse
-import requests
-from bs4 import BeautifulSoup
 
+# first, so that the profile of --profile covers the imports
+import profiling
+import db
 from db import *
 from helper import *
 from config import *
 from init_db import initialize_database
 from escape_sequences import *
 from ai import *
+from ingest import *
+from worker import queue_sentences
+from http_cache import set_cache_mode
+from daemon import connect_daemon, serve
+from transfer import export_dictionary, import_dictionary
+from completion import SHELLS, completion_script
+from crawler import crawl, queue_words, queue_cached_variants, print_crawl_status
 
 GERMAN_DICT_DIR = os.environ.get("GERMAN_DICT_DIR")
+# file arguments are relative to the directory german-dict is run from
+CALLER_DIR = os.getcwd()
 os.chdir(GERMAN_DICT_DIR)
 
-# configuration
-if not is_database_initialized():
-    initialize_database()
-    set_database_initialized()
+def caller_path(path: str) -> str:
+    return path if path == '-' else os.path.join(CALLER_DIR, path)
 
 # argument parser - cli tool
 parser = argparse.ArgumentParser()
-parser.add_argument("word", help="the word that you want to look for.")
+parser.add_argument("word", nargs="?", help="the word that you want to look for.")
 parser.add_argument("-p", "--pronunciation", help="gives the link for the pronunciation of the word.", action="store_true")
 group = parser.add_mutually_exclusive_group()
 group.add_argument("-d", "--declension", help="prints the declension of the word.", action="store_true")
@@ -30,70 +39,177 @@ group.add_argument("-c", "--conjugation", help="prints the conjugation of the wo
 group.add_argument("-s", "--sentence", help="prints example sentences.", action="store_true")
 parser.add_argument("-r", "--replace", help="replaces the example sentences.", action="store_true")
 parser.add_argument("-a", "--openai", help="if openai call is wanted, this should be provided", action="store_true")
+parser.add_argument("--batch", metavar="FILE", help="fetches and stores every word of FILE (one per line, - for stdin).")
+parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="number of parallel downloads in batch mode, or open ai requests with --generate-sentences.")
+parser.add_argument("--crawl", metavar="FILE", nargs="?", const="", help="queues the words of FILE (one per line, - for stdin) and fetches every queued word in the background of a crawl that can be stopped and resumed.")
+parser.add_argument("--discover", help="with --crawl, also queues the variant pages linked from the pages in the http cache.", action="store_true")
+parser.add_argument("--crawl-status", help="prints the number of pending, running, done and failed crawl jobs.", action="store_true")
+parser.add_argument("--generate-sentences", help="generates example sentences for every stored word that has none.", action="store_true")
+parser.add_argument("--limit", type=int, help="maximum number of words for --generate-sentences.")
+cache_group = parser.add_mutually_exclusive_group()
+cache_group.add_argument("--offline", help="only uses pages from the http cache, never the network.", action="store_true")
+cache_group.add_argument("--refresh", help="downloads pages again and replaces them in the http cache.", action="store_true")
+parser.add_argument("--serve", help="runs the daemon that answers lookups over a unix socket.", action="store_true")
+parser.add_argument("--local", help="answers the lookup in this process even if a daemon is running.", action="store_true")
+parser.add_argument("--export", metavar="FILE", help="writes every stored word to FILE as ndjson, gzip compressed if FILE ends in .gz (- for stdout).")
+parser.add_argument("--import", dest="import_", metavar="FILE", help="merges the words of a dump made with --export into the database.")
+parser.add_argument("--search-sentences", metavar="QUERY", help="searches the stored example sentences, in german or english.")
+parser.add_argument("--page", type=int, default=1, help="page of the --search-sentences results.")
+parser.add_argument("--index-forms", help="indexes the inflected forms of words stored before the index existed or added by --import.", action="store_true")
+parser.add_argument("--complete", metavar="PREFIX", help="prints the stored words that complete PREFIX, one per line.")
+parser.add_argument("--completion-script", choices=SHELLS, help="prints the shell completion script for bash or zsh.")
+parser.add_argument("--http", metavar="PORT", type=int, help="runs the read-only http/json service on PORT.")
+parser.add_argument("--profile", help="prints the time, sql queries and downloaded bytes of every phase to stderr.", action="store_true")
+parser.add_argument("--profile-trace", metavar="FILE", help="writes the phases as a chrome trace (json) to FILE.")
 args = parser.parse_args()
+if args.page < 1:
+    parser.error("argument --page: must be 1 or more")
+
+if args.profile or args.profile_trace:
+    profiling.enable(args.profile_trace and caller_path(args.profile_trace))
+if args.completion_script:
+    sys.stdout.write(completion_script(args.completion_script, parser))
+    sys.exit(0)
+
+# a running daemon answers the lookups, otherwise they run in-process
+with profiling.span('open database'):
+    api = None if args.serve or args.http or args.local else connect_daemon()
+    if api is None:
+        api = db
+        # configuration, the schema is looked up in the database itself
+        # so that a cached lookup does not have to read config.ini
+        if not is_database_created():
+            initialize_database()
+            set_database_initialized()
+
+if args.complete is not None:
+    with profiling.span('lookup'):
+        completions = api.complete_words(args.complete)
+    if completions:
+        print('\n'.join(completions))
+    sys.exit(0)
+if args.serve:
+    serve()
+    sys.exit(0)
+if args.http:
+    # http.server is slow to import, only pay for it here
+    from http_api import serve_http
+    serve_http(args.http)
+    sys.exit(0)
+
+if args.offline:
+    set_cache_mode('offline')
+elif args.refresh:
+    set_cache_mode('refresh')
+
+if args.export:
+    count = export_dictionary(caller_path(args.export))
+    if args.export != '-':
+        print(f"{BLUE}exported:{RESET} {count} words")
+    sys.exit(0)
+if args.import_:
+    try:
+        added, _ = import_dictionary(caller_path(args.import_))
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"import failed: {e}\n")
+        sys.exit(1)
+    # with --index-forms, the forms are indexed right after the import
+    if not args.index_forms:
+        if added:
+            print(f"run {BLUE}german-dict --index-forms{RESET} to look up the inflected forms of the new words")
+        sys.exit(0)
+if args.index_forms:
+    start = time.perf_counter()
+    count = index_word_forms()
+    print(f"{BLUE}indexed:{RESET} {count} forms in {time.perf_counter() - start:.1f}s")
+    sys.exit(0)
+if args.batch:
+    failed = run_batch(read_word_list(caller_path(args.batch)), args.workers)
+    sys.exit(1 if failed else 0)
+if args.crawl is not None:
+    if args.crawl:
+        print(f"{BLUE}queued:{RESET} {queue_words(read_word_list(caller_path(args.crawl)))} words")
+    if args.discover:
+        print(f"{BLUE}queued:{RESET} {queue_cached_variants()} variant pages")
+    counts = crawl(args.workers)
+    sys.exit(1 if counts['failed'] else 0)
+if args.crawl_status:
+    print_crawl_status()
+    sys.exit(0)
+if args.generate_sentences:
+    failed = generate_missing_sentences(args.workers, args.limit)
+    sys.exit(1 if failed else 0)
+if args.search_sentences:
+    with profiling.span('output'):
+        api.print_sentence_search(args.search_sentences, args.page, use_color())
+    sys.exit(0)
+if args.word is None:
+    parser.error("the following arguments are required: word")
 
 word = args.word.strip()
 
 # validates if word is already in database or if any fuzzy match exists
 found_word = None
-# use fuzzy matches to find all variants
-matches = get_fuzzy_matches(word) # (id, word)
-
-if matches:
-    # check for single exact match to avoid friction
-    if len(matches) == 1 and matches[0][1].lower() == word.lower():
-        found_word = matches[0][1]
+kind, matches = api.lookup_word(word) # (id, word) or (id, word, cells)
+default = default_match(word, kind, matches) if matches else None
+
+if matches and not asks_for_match(word, kind, matches):
+    found_word = default[1]
+    if kind == 'form':
+        print(f"{BLUE}Inflected form of:{RESET} {found_word} ({default[2]})")
+elif matches:
+    # check for haben and sein variants, and show add option accordingly
+    has_haben = any('(haben)' in m[1] for m in matches)
+    has_sein = any('(sein)' in m[1] for m in matches)
+    show_add = kind != 'stored' or not (has_haben and has_sein)
+
+    title = {'stored': 'Found matches:', 'form': 'Inflected form of:'}.get(kind, 'Did you mean:')
+    print(f"\n{BLUE}{title}{RESET}")
+    for idx, match in enumerate(matches):
+        # inflected forms name the cells they are in, "laufen (imperfect: ich, er)"
+        print(f"{idx + 1}: {match[1]}" + (f" ({match[2]})" if len(match) > 2 else ''))
+
+    if show_add:
+        print(f"{len(matches) + 1}: Search online / Add new")
+
+    # enter, anything that is not an option and no input at all (scripts)
+    # take the default
+    default_idx = len(matches) if default is None else list(matches).index(default)
+    try:
+        sel = input(f"\n{BLUE}Select option (default {default_idx + 1}): {RESET}")
+        if not sel.strip():
+            sel_idx = default_idx
+        else:
+            sel_idx = int(sel) - 1
+    except (ValueError, EOFError):
+        sel_idx = default_idx
+
+    if 0 <= sel_idx < len(matches):
+        found_word = matches[sel_idx][1]
+    elif show_add and sel_idx == len(matches):
+        # user chose to search online
+        found_word = None
     else:
-        # check for haben and sein variants, and show add option accordingly
-        has_haben = any('(haben)' in m[1] for m in matches)
-        has_sein = any('(sein)' in m[1] for m in matches)
-        show_add = not (has_haben and has_sein)
-
-        print(f"\n{BLUE}Found matches:{RESET}")
-        for idx, (mid, mword) in enumerate(matches):
-            print(f"{idx + 1}: {mword}")
-
-        if show_add:
-            print(f"{len(matches) + 1}: Search online / Add new")
-
-        try:
-            sel = input(f"\n{BLUE}Select option (default 1): {RESET}")
-            if not sel.strip():
-                sel_idx = 0
-            else:
-                sel_idx = int(sel) - 1
-
-            if 0 <= sel_idx < len(matches):
-                found_word = matches[sel_idx][1]
-            elif show_add and sel_idx == len(matches):
-                # user chose to search online
-                found_word = None
-            else:
-                # invalid match choice
-                found_word = matches[0][1]
-        except ValueError:
-            found_word = matches[0][1] # Default to first match on error
-else:
-    candidates = get_possible_matches(word)
-    for cand in candidates:
-        matches = get_fuzzy_matches(cand)
-        if matches:
-            found_word = matches[0][1]
-            break
+        # invalid match choice
+        found_word = default and default[1]
 
 
 if not found_word:
     try:
-        r = requests.get(f"https://www.verbformen.com/?w={word}")
+        with profiling.span('fetch'):
+            r = fetch_page(word_url(word))
         if r.status_code == 429:
+            # still rate limited after the retries of http_cache.download
             sys.stderr.write("Too many requests, slow down\n")
             sys.exit(3)
 
         # cook the soup
-        soup = BeautifulSoup(r.text, "html.parser")
+        html = r.text
+        with profiling.span('parse'):
+            soup = page_soup(html)
 
-        # check for variants (e.g. haben vs sein)
-        variants = get_verb_variants(soup)
+            # check for variants (e.g. haben vs sein)
+            variants = get_verb_variants(soup, VERBFORMEN_URL)
 
         selected_label = None
         if len(variants) > 1:
@@ -112,75 +228,36 @@ if not found_word:
                     # selected label: sein or haben
                     selected_label, selected_url = variants[sel_idx]
                     sys.stdout.write(f"Fetching {selected_label} form...\n")
-                    r = requests.get(selected_url)
+                    with profiling.span('fetch variant', label=selected_label):
+                        r = fetch_page(selected_url)
                     if r.status_code == 200:
-                        soup = BeautifulSoup(r.text, "html.parser")
+                        html = r.text
+                        with profiling.span('parse'):
+                            soup = page_soup(html)
                     else:
                          sys.stderr.write(f"Failed to fetch variant, using default.\n")
             except ValueError:
                 print(f"{RED}Invalid input, using default.{RESET}")
 
-        # parse word descriptors
-        scraped_word, word_type, gender, regular, auxiliary, separable = parse_word_descriptors(soup)
+        # parse word descriptors, definition, conjugation and declension
+        with profiling.span('parse'):
+            record = parse_html(html, soup)
 
         # update word name if a specific variant was selected to distinguish it in db
         if selected_label:
             # e.g. "fliegen" -> "fliegen (sein)" or "fliegen (haben)"
             if '(' not in word: # prevent double tagging if user typed "fliegen (sein)"
-                word = f"{scraped_word} ({selected_label})"
-        else:
-            word = scraped_word
-
-        # get definition, definition_id based on parsed descriptors
-        definition = parse_definition(soup)
-        definition_id = add_definition_to_database(definition)
-        gender_id = None
-
-        # map string descriptors to integers
-        aux_map = {'haben': 0, 'sein': 1}
-        reg_map = {'regular': 1, 'irregular': 0}
-
-        # map values with default values to prevent crashes
-        aux_val = aux_map.get(auxiliary)
-        reg_val = reg_map.get(regular, 1)
-
-        if word_type == 'verb':
-            # type_id is brought here to prevent crashes when word_type is None
-            # same done for noun and adjective as well.
-            type_id = get_type_id(word_type)
-            add_word_to_database((word, gender_id, aux_val, reg_val, separable, definition_id, type_id, 0, 1))
-            word_id = get_word_id(word)
-
-            # conjugation part
-            conjugation_dict = parse_conjugation(soup)
-            add_conjugation_to_db(conjugation_dict, word_id)
-
-            # initial sentences part
-            if args.openai:
-                openai_response = get_openai_response(word)
-                parsed_sentences = parse_openai_response(openai_response)
-                add_sentences_to_db(parsed_sentences, word_id)
-        elif word_type == 'noun':
-            type_id = get_type_id(word_type)
-            gender_id = get_gender_id(gender)
-            add_word_to_database((word, gender_id, aux_val, reg_val, separable, definition_id, type_id, 1, 0))
-
-            word_id = get_word_id(word)
-
-            if args.openai:
-                openai_response = get_openai_response(word)
-                parsed_sentences = parse_openai_response(openai_response)
-                add_sentences_to_db(parsed_sentences, word_id)
-
-            # add declension to the database
-            declension_dict = parse_declension(soup)
-            add_declension_to_db(declension_dict, word_id)
-
-        elif word_type == 'adjective':
-            type_id = get_type_id(word_type)
-            add_word_to_database((word, gender_id, aux_val, reg_val, separable, definition_id, type_id, 1, 0))
+                word = f"{record['word']} ({selected_label})"
         else:
+            word = record['word']
+
+        with profiling.span('store'):
+            word_id, _ = store_word(record, word)
+        if word_id is None:
             print('unknown word type')
+        elif args.openai and record['word_type'] in ('verb', 'noun'):
+            # initial sentences part, generated in the background
+            queue_sentences(word_id)
 
     except Exception as e:
         sys.stderr.write(f"An error occurred while fetching information for '{word}': {e}\n")
@@ -188,23 +265,22 @@ if not found_word:
 else:
     word = found_word
 
-word_type = get_word_type(word)
+word_type = api.get_word_type(word)
 if args.declension:
     if word_type != 'noun':
         sys.stderr.write("Declension is only available for nouns.\n")
         sys.exit(1)
-    print_declension_of_noun(word)
+    with profiling.span('output'):
+        api.print_declension_of_noun(word, use_color())
     if args.openai:
-        openai_response = get_openai_response(word)
-        parsed_sentences = parse_openai_response(openai_response)
-        add_sentences_to_db(parsed_sentences, word_id, replace=True)
+        queue_sentences(api.get_word_id(word))
 elif args.conjugation:
     if word_type != 'verb':
         sys.stderr.write("Conjugation is only available for verbs.\n")
         sys.exit(1)
 
-    word_id = get_word_id(word)
-    moods = get_available_moods(word_id)
+    word_id = api.get_word_id(word)
+    moods = api.get_available_moods(word_id)
 
     if not moods:
         print(f"{RED}No conjugation data found.{RESET}")
@@ -220,7 +296,7 @@ elif args.conjugation:
             selected_mood_id = moods[mood_idx][0]
             selected_mood_name = moods[mood_idx][1]
 
-            tenses = get_available_tenses(word_id, selected_mood_id)
+            tenses = api.get_available_tenses(word_id, selected_mood_id)
             if not tenses:
                 print(f"{RED}No tenses found for this mood.{RESET}")
                 sys.exit(0)
@@ -232,7 +308,8 @@ elif args.conjugation:
             tense_idx = int(input(f"\n{BLUE}Select Tense: {RESET}")) - 1
             if 0 <= tense_idx < len(tenses):
                 selected_tense = tenses[tense_idx]
-                print_conjugation_of_verb(word, selected_mood_id, selected_tense)
+                with profiling.span('output'):
+                    api.print_conjugation_of_verb(word, selected_mood_id, selected_tense, use_color())
             else:
                 print(f"{RED}Invalid tense selection.{RESET}")
         else:
@@ -240,21 +317,24 @@ elif args.conjugation:
     except ValueError:
         print(f"{RED}Invalid input.{RESET}")
 elif args.sentence:
-    word_id = get_word_id(word)
+    word_id = api.get_word_id(word)
     if args.replace:
         # initial sentences part
         openai_response = get_openai_response(word)
         parsed_sentences = parse_openai_response(openai_response)
-        add_sentences_to_db(parsed_sentences, word_id, replace=True)
-    print_sentences_from_db(word_id)
+        with profiling.span('store'):
+            add_sentences_to_db(parsed_sentences, word_id, replace=True)
+    with profiling.span('output'):
+        api.print_sentences_from_db(word_id)
 elif args.word:
     # get saved word in database
-    word_id = get_word_id(word)
-    full_word = get_word(word_id) # print das Zimmer, not zimmer (search word)
-    definition_id = get_definition_id(word)
-    definition = get_definition(definition_id)
-    print(BLUE + full_word + RESET)
-    print(RED + definition + RESET)
+    with profiling.span('output'):
+        word_id = api.get_word_id(word)
+        full_word = api.get_word(word_id) # print das Zimmer, not zimmer (search word)
+        definition_id = api.get_definition_id(word)
+        definition = api.get_definition(definition_id)
+        print(BLUE + full_word + RESET)
+        print(RED + definition + RESET)
 else:
     sys.exit(2)
 
@@ -0,0 +1,168 @@
+""" per-invocation phase timing for --profile.
+
+    the code marks its phases with `with span('fetch'):` and counts things
+    with `count('bytes_downloaded', n)`. both do nothing until enable() is
+    called, so the marks stay in place for free. when enabled, every span
+    records its wall time and the counts made while it was open (nested
+    spans count into their parents as well), and the sqlite connections
+    count their statements through a trace callback.
+
+    at exit the spans are printed as a breakdown on stderr, or written as
+    a chrome trace (chrome://tracing, ui.perfetto.dev) to a json file.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from collections import Counter
+
+# the process is profiled from the import of this module on, main.py
+# imports it first so that the module imports are part of the profile
+_origin = time.perf_counter()
+_enabled = False
+_spans = []
+_totals = Counter()
+_local = threading.local()
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+class _Span:
+    __slots__ = ('name', 'args', 'counts', 'start', 'end', 'depth', 'path', 'thread')
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.counts = Counter()
+
+    def __enter__(self):
+        stack = _stack()
+        self.depth = len(stack)
+        self.path = (stack[-1].path if stack else ()) + (self.name,)
+        self.thread = threading.get_ident()
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.end = time.perf_counter()
+        _stack().pop()
+        _spans.append(self)
+        return False
+
+def _stack() -> list:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def is_enabled() -> bool:
+    return _enabled
+
+def span(name: str, **args):
+    """ context manager timing the block as the phase `name`, `args` end up
+        in the trace. a shared no-op while profiling is off.
+    """
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, args)
+
+def count(name: str, n: int = 1):
+    """ adds `n` to the counter `name` of the open spans and the totals """
+    if not _enabled:
+        return
+    _totals[name] += n
+    for open_span in getattr(_local, 'stack', ()):
+        open_span.counts[name] += n
+
+def trace_statement(statement: str):
+    """ sqlite3 trace callback, counts the statements run by a connection """
+    # statements run by triggers are reported as "-- TRIGGER name"
+    count('sql_triggers' if statement.startswith('--') else 'sql_queries')
+
+def enable(trace_path: str = None):
+    """ starts recording, everything before is reported as startup. at exit
+        the breakdown is printed, or the trace written to `trace_path`.
+    """
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    startup = _Span('startup', {})
+    startup.start, startup.end = _origin, time.perf_counter()
+    startup.depth, startup.path, startup.thread = 0, ('startup',), threading.get_ident()
+    _spans.append(startup)
+    atexit.register(_report, trace_path)
+
+def _report(trace_path: str):
+    end = time.perf_counter()
+    # spans that are still open, e.g. when sys.exit is called inside one
+    for stack_span in reversed(_stack()):
+        stack_span.end = end
+        _spans.append(stack_span)
+    if trace_path:
+        write_trace(trace_path, end)
+    else:
+        print_breakdown(end)
+
+def print_breakdown(end: float, out=sys.stderr):
+    """ one line per phase, nested phases indented under their parent and
+        repeated ones summed up
+    """
+    total = end - _origin
+    phases = {}
+    for s in sorted(_spans, key=lambda s: s.start):
+        phase = phases.setdefault(s.path, {'calls': 0, 'seconds': 0.0, 'counts': Counter()})
+        phase['calls'] += 1
+        phase['seconds'] += s.end - s.start
+        phase['counts'].update(s.counts)
+
+    # children are listed right after their parent, in the order they ran
+    children = {}
+    for path in phases:
+        children.setdefault(path[:-1], []).append(path)
+
+    def walk(parent):
+        for path in children.get(parent, ()):
+            yield path
+            yield from walk(path)
+
+    out.write(f"\n{'phase':32} {'calls':>6} {'ms':>10} {'%':>6} {'queries':>8} {'bytes':>10}\n")
+    for path in walk(()):
+        phase = phases[path]
+        name = '  ' * (len(path) - 1) + path[-1]
+        counts = phase['counts']
+        out.write(f"{name:32} {phase['calls']:6d} {phase['seconds'] * 1000:10.1f} "
+                  f"{phase['seconds'] / total * 100 if total else 0:6.1f} "
+                  f"{counts['sql_queries'] or '':>8} {counts['bytes_downloaded'] or '':>10}\n")
+    out.write(f"{'total':32} {'':6} {total * 1000:10.1f} {100:6.1f} "
+              f"{_totals['sql_queries'] or '':>8} {_totals['bytes_downloaded'] or '':>10}\n")
+    others = {name: n for name, n in _totals.items() if name not in ('sql_queries', 'bytes_downloaded')}
+    if others:
+        out.write('  '.join(f"{name}: {n}" for name, n in sorted(others.items())) + '\n')
+
+def write_trace(path: str, end: float):
+    """ the spans as complete events of the chrome trace event format """
+    pid = os.getpid()
+    events = [{
+        'name': s.name,
+        'ph': 'X',
+        'ts': (s.start - _origin) * 1e6,
+        'dur': (s.end - s.start) * 1e6,
+        'pid': pid,
+        'tid': s.thread,
+        'args': dict(s.args, **s.counts),
+    } for s in _spans]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                   'otherData': dict(_totals, total_ms=(end - _origin) * 1000)}, f)
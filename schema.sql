@@ -16,21 +16,39 @@ CREATE TABLE IF NOT EXISTS words (
     gender_id INTEGER,
     have_declension INTEGER NOT NULL,
     have_conjugaison INTEGER NOT NULL,
+    -- helper.fold_word(word), compared against the folded user input
+    search_key TEXT,
     FOREIGN KEY (definition_id) REFERENCES definitions(id),
     FOREIGN KEY (type_id)       REFERENCES types(id)
     FOREIGN KEY (gender_id)       REFERENCES genders(id)
 );
 
+-- every space separated token of words.word, lower cased, so that entries
+-- like "der Wicht" or "sich freuen auf" are found with an index seek.
+CREATE TABLE IF NOT EXISTS word_tokens (
+    token TEXT NOT NULL,
+    search_key TEXT,
+    word_id INTEGER NOT NULL,
+    PRIMARY KEY (token, word_id),
+    FOREIGN KEY (word_id) REFERENCES words(id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS words_search_key ON words (search_key);
+CREATE INDEX IF NOT EXISTS word_tokens_search_key ON word_tokens (search_key);
+
+-- the rows of one word are stored next to each other, in display order:
+-- tense and pronoun ids follow the order of a verbformen page.
 CREATE TABLE IF NOT EXISTS conjugations (
-    id INTEGER PRIMARY KEY,
-    tense TEXT NOT NULL,
-    pronoun TEXT,
-    conjugation TEXT,
     word_id INTEGER NOT NULL,
     mood_id INTEGER NOT NULL,
+    tense_id INTEGER NOT NULL,
+    pronoun_id INTEGER NOT NULL,
+    conjugation TEXT,
+    PRIMARY KEY (word_id, mood_id, tense_id, pronoun_id),
     FOREIGN KEY (word_id) REFERENCES words(id),
-    UNIQUE(tense, pronoun, conjugation, mood_id, word_id)
-);
+    FOREIGN KEY (tense_id) REFERENCES tenses(id),
+    FOREIGN KEY (pronoun_id) REFERENCES pronouns(id)
+) WITHOUT ROWID;
 
 -- number = 0 for plural, 1 for singular
 CREATE TABLE IF NOT EXISTS declensions (
@@ -47,13 +65,63 @@ CREATE TABLE IF NOT EXISTS declensions (
     FOREIGN KEY (word_id) REFERENCES words(id)
 );
 
+CREATE INDEX IF NOT EXISTS declensions_word_id ON declensions (word_id);
+
+-- every inflected form of the stored conjugations and declensions, folded
+-- like words.search_key and without articles (see helper.form_keys), so
+-- that "lief", "bin gegangen" or "Häusern" find their word. one row per
+-- cell the form appears in: conjugated forms have a mood, tense and
+-- pronoun, declined ones a number and case, the columns of the other kind
+-- are 0 or ''.
+CREATE TABLE IF NOT EXISTS word_forms (
+    form TEXT NOT NULL,
+    word_id INTEGER NOT NULL,
+    mood_id INTEGER NOT NULL DEFAULT 0,
+    tense_id INTEGER NOT NULL DEFAULT 0,
+    pronoun_id INTEGER NOT NULL DEFAULT 0,
+    number TEXT NOT NULL DEFAULT '',
+    noun_case TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (form, word_id, mood_id, tense_id, pronoun_id, number, noun_case),
+    FOREIGN KEY (word_id) REFERENCES words(id)
+) WITHOUT ROWID;
+
+-- the folded tokens of every word (see helper.typo_keys) and each of them
+-- with one letter deleted, so that a misspelling one typo away from a
+-- stored word shares a variant with it.
+CREATE TABLE IF NOT EXISTS word_typos (
+    variant TEXT NOT NULL,
+    word_id INTEGER NOT NULL,
+    PRIMARY KEY (variant, word_id),
+    FOREIGN KEY (word_id) REFERENCES words(id)
+) WITHOUT ROWID;
+
 CREATE TABLE IF NOT EXISTS sentences (
     id INTEGER PRIMARY KEY,
-    sentence TEXT NOT NULL,
+    german TEXT NOT NULL,
+    english TEXT NOT NULL,
     word_id INTEGER NOT NULL,
     FOREIGN KEY (word_id) REFERENCES words(id)
 );
 
+CREATE INDEX IF NOT EXISTS sentences_word_id ON sentences (word_id);
+
+-- full text index over both halves of the sentences, umlauts and accents
+-- match their plain letters. kept in sync by the sentences_*_fts triggers.
+CREATE VIRTUAL TABLE IF NOT EXISTS sentences_fts USING fts5 (
+    german, english, content='sentences', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS sentences_insert_fts AFTER INSERT ON sentences BEGIN
+    INSERT INTO sentences_fts (rowid, german, english) VALUES (NEW.id, NEW.german, NEW.english);
+END;
+CREATE TRIGGER IF NOT EXISTS sentences_delete_fts AFTER DELETE ON sentences BEGIN
+    INSERT INTO sentences_fts (sentences_fts, rowid, german, english) VALUES ('delete', OLD.id, OLD.german, OLD.english);
+END;
+CREATE TRIGGER IF NOT EXISTS sentences_update_fts AFTER UPDATE ON sentences BEGIN
+    INSERT INTO sentences_fts (sentences_fts, rowid, german, english) VALUES ('delete', OLD.id, OLD.german, OLD.english);
+    INSERT INTO sentences_fts (rowid, german, english) VALUES (NEW.id, NEW.german, NEW.english);
+END;
+
 CREATE TABLE IF NOT EXISTS types (
     id INTEGER PRIMARY KEY,
     type TEXT NOT NULL
@@ -69,3 +137,72 @@ CREATE TABLE IF NOT EXISTS genders (
     id INTEGER PRIMARY KEY,
     gender TEXT NOT NULL
 );
+
+CREATE TABLE IF NOT EXISTS tenses (
+    id INTEGER PRIMARY KEY,
+    tense TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS pronouns (
+    id INTEGER PRIMARY KEY,
+    pronoun TEXT NOT NULL UNIQUE
+);
+
+-- queue of background jobs, e.g. kind 'sentences' with a word id as payload.
+-- status is one of pending, running, done, failed.
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    -- a pending job is not claimed before this time
+    available_at REAL NOT NULL DEFAULT 0,
+    UNIQUE (kind, payload)
+);
+
+CREATE INDEX IF NOT EXISTS jobs_kind_status ON jobs (kind, status);
+
+-- grows with every write to the tables above that hold dictionary data,
+-- the http service derives its etags from it.
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    counter INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO changes (id, counter) VALUES (0, 0);
+
+CREATE TRIGGER IF NOT EXISTS definitions_insert_count AFTER INSERT ON definitions BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS definitions_update_count AFTER UPDATE ON definitions BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS definitions_delete_count AFTER DELETE ON definitions BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS words_insert_count AFTER INSERT ON words BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS words_update_count AFTER UPDATE ON words BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS words_delete_count AFTER DELETE ON words BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS conjugations_insert_count AFTER INSERT ON conjugations BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS conjugations_update_count AFTER UPDATE ON conjugations BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS conjugations_delete_count AFTER DELETE ON conjugations BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS declensions_insert_count AFTER INSERT ON declensions BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS declensions_update_count AFTER UPDATE ON declensions BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS declensions_delete_count AFTER DELETE ON declensions BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS sentences_insert_count AFTER INSERT ON sentences BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS sentences_update_count AFTER UPDATE ON sentences BEGIN UPDATE changes SET counter = counter + 1; END;
+CREATE TRIGGER IF NOT EXISTS sentences_delete_count AFTER DELETE ON sentences BEGIN UPDATE changes SET counter = counter + 1; END;
+
+-- output of print_conjugation_of_verb and print_declension_of_noun, kind is
+-- 'conjugation' or 'declension' (with mood_id 0 and tense ''), color 0 when
+-- NO_COLOR is set, version the RENDER_VERSION of db.py it was rendered with.
+-- add_word_entry drops the outputs of a word whose paradigm it writes.
+CREATE TABLE IF NOT EXISTS rendered (
+    word_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    mood_id INTEGER NOT NULL,
+    tense TEXT NOT NULL,
+    color INTEGER NOT NULL,
+    output TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (word_id, kind, mood_id, tense, color)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS words_delete_render AFTER DELETE ON words BEGIN DELETE FROM rendered WHERE word_id = OLD.id; END;
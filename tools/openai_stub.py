@@ -0,0 +1,91 @@
+""" a local stand-in for the open ai responses api, for running the sentence
+    generation without an api key or network.
+
+    usage: python tools/openai_stub.py [--port 8900] [--delay SECONDS] [--fail-rate R]
+
+    then point the client to it:
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=stub german-dict --generate-sentences
+
+    --fail-rate answers that share of the requests with http 429, to exercise
+    the retry and backoff.
+"""
+import re
+import json
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _sentences_text(word: str) -> str:
+    return '\n'.join(f"{i}. Das ist Beispielsatz {i} mit dem Wort {word}. - "
+                     f"This is example sentence {i} with the word {word}."
+                     for i in range(1, 6))
+
+def _response_body(text: str) -> dict:
+    return {
+        'id': f"resp_{random.getrandbits(48):x}",
+        'object': 'response',
+        'created_at': int(time.time()),
+        'status': 'completed',
+        'model': 'stub',
+        'output': [{
+            'id': f"msg_{random.getrandbits(48):x}",
+            'type': 'message',
+            'role': 'assistant',
+            'status': 'completed',
+            'content': [{'type': 'output_text', 'text': text, 'annotations': []}],
+        }],
+        'parallel_tool_calls': False,
+        'tool_choice': 'auto',
+        'tools': [],
+    }
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    fail_rate = 0.0
+
+    def _send(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.rstrip('/').endswith('/responses'):
+            self._send(404, {'error': {'message': f"unknown path {self.path}"}})
+            return
+        if random.random() < self.fail_rate:
+            self._send(429, {'error': {'message': 'rate limited by stub', 'type': 'rate_limit'}},
+                       {'Retry-After': '0'})
+            return
+
+        time.sleep(self.delay)
+        # the word is the one after "for the word" in the prompt
+        match = re.search(r'for the word (.+?) in German', request.get('input', ''))
+        word = match.group(1) if match else 'Wort'
+        self._send(200, _response_body(_sentences_text(word)))
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900, help="port to listen on.")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each answer.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 429.")
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    StubHandler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"open ai stub listening on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
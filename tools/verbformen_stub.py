@@ -0,0 +1,225 @@
+""" a local stand-in for verbformen.com, for running lookups, --batch and
+    --crawl without network. every word gets a made up page in the layout
+    the parse_* functions read: capitalized words are nouns, words ending
+    in "en" or "ern" verbs, other words adjectives, and words starting with
+    "xx" are not found (404). some verbs have haben and sein forms, with
+    the variant links of a real page. around the entry is about as much
+    navigation, script and link markup as on a real page (~50 KB), which
+    the parser has to skip.
+
+    usage: python tools/verbformen_stub.py [--port 8901] [--delay SECONDS] [--fail-rate R]
+                                           [--rate REQUESTS_PER_SECOND]
+
+    then point german-dict to it:
+    VERBFORMEN_URL=http://127.0.0.1:8901 german-dict --crawl words.txt
+
+    --fail-rate answers that share of the requests with http 429, --rate
+    the requests above that many per second (with a burst of as many), with
+    429 and "Retry-After: 1". /stats returns the number of requests per
+    page, to check that a crawl fetched no page twice, and the 429 answers.
+"""
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs, quote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PRONOUNS = ('ich', 'du', 'er', 'wir', 'ihr', 'sie')
+AUXILIARIES = {
+    'haben': ('habe', 'hast', 'hat', 'haben', 'habt', 'haben'),
+    'sein': ('bin', 'bist', 'ist', 'sind', 'seid', 'sind'),
+}
+PRESENT = ('e', 'st', 't', 'en', 't', 'en')
+PAST = ('te', 'test', 'te', 'ten', 'tet', 'ten')
+WERDEN = ('werde', 'wirst', 'wird', 'werden', 'werdet', 'werden')
+WUERDE = ('würde', 'würdest', 'würde', 'würden', 'würdet', 'würden')
+
+def _header(word: str, descriptors: str, definition: str) -> str:
+    return ('<section class="rBox rBoxWht"><div class="rAufZu"><div id="vStckInf">'
+            f'<div class="rCntr rClear">{word}</div>'
+            f'<div class="rCntr"><div><p class="r1Zeile">{definition}</p></div></div></div></div>'
+            f'<p class="rInf">{descriptors}</p></section>\n')
+
+def _rows(forms, pronouns=PRONOUNS) -> str:
+    if pronouns is None:
+        return ''.join(f'<tr><td>{form}</td></tr>' for form in forms)
+    return ''.join(f'<tr><td>{p}</td><td>{form}</td></tr>' for p, form in zip(pronouns, forms))
+
+def _section(mood: str, tenses: list, first: bool) -> str:
+    """ a mood of the conjugation, tenses is a list of (name, forms, pronouns) """
+    heading = '<p>simple</p>' if first else f'<h2>{mood}</h2><p>{mood} forms</p>'
+    tag = 'h2' if first else 'h3'
+    tables = ''.join(f'<div class="vTbl"><div><{tag}>{name}</{tag}></div><table>{_rows(forms, pronouns)}</table></div>'
+                     for name, forms, pronouns in tenses)
+    return f'<div><section class="rBox rBoxWht"><header>{heading}</header><div class="rAufZu">{tables}</div></section></div>'
+
+def _verb_page(word: str, auxiliary: str, variants: bool) -> str:
+    stem = word[:-2] if word.endswith('en') else word[:-1]
+    present = [stem + e for e in PRESENT]
+    past = [stem + e for e in PAST]
+    participle = f"ge{stem}t"
+    aux = AUXILIARIES[auxiliary]
+    perfect = [f"{a} {participle}" for a in aux]
+    imperative = ['-', f"{stem}(e) (du)", '-', f"{word} (wir)", f"{stem}t (ihr)", f"{word} (Sie)"]
+    sections = [
+        _section('simple', [('Present', present, PRONOUNS), ('Imperfect', past, PRONOUNS),
+                            ('Imperative', imperative, PRONOUNS), ('Present Subj.', present, PRONOUNS),
+                            ('Imperf. Subj.', past, PRONOUNS), ('Infinitive', [word, f"zu {word}"], None),
+                            ('Participle', [f"{word}d", participle], None)], True),
+        _section('Indicative', [('Present', present, PRONOUNS), ('Imperfect', past, PRONOUNS),
+                                ('Perfect', perfect, PRONOUNS), ('Pluperfect', perfect, PRONOUNS),
+                                ('Future', [f"{w} {word}" for w in WERDEN], PRONOUNS),
+                                ('Future Perfect', [f"{w} {participle} {auxiliary}" for w in WERDEN], PRONOUNS)], False),
+        _section('Subjunctive', [('Present Subj.', present, PRONOUNS), ('Imperf. Subj.', past, PRONOUNS),
+                                 ('Perfect Subj.', perfect, PRONOUNS), ('Pluperf. Subj.', perfect, PRONOUNS),
+                                 ('Future Subj.', [f"{w} {word}" for w in WERDEN], PRONOUNS),
+                                 ('Fut. Perf. Subj.', [f"{w} {participle} {auxiliary}" for w in WERDEN], PRONOUNS)], False),
+        _section('Conditional (würde)', [('Present Cond.', [f"{w} {word}" for w in WUERDE], PRONOUNS),
+                                         ('Past Cond.', [f"{w} {participle} {auxiliary}" for w in WUERDE], PRONOUNS)], False),
+        _section('Imperative', [('Present', imperative, PRONOUNS)], False),
+        _section('Infinitive/Participle', [('Infinitive I', [word, f"zu {word}"], None),
+                                           ('Infinitive II', [f"{participle} {auxiliary}"], None),
+                                           ('Participle I', [f"{word}d"], None),
+                                           ('Participle II', [participle], None)], False),
+    ]
+    buttons = ''
+    if variants:
+        buttons = ''.join(f'<a class="rKnpf rNoSelect rLinks" href="/?w={quote(word)}&aux={a}"><span>{a}</span></a>'
+                          for a in AUXILIARIES)
+    return (_header(word, f"regular · {auxiliary}", f"to {word}") + buttons
+            + f'<div class="rAbschnitt">{"".join(sections)}</div>\n')
+
+def _noun_page(word: str, article: str) -> str:
+    singular = [(article, word), ({'der': 'des', 'die': 'der', 'das': 'des'}[article], word + ('' if article == 'die' else 'es')),
+                ({'der': 'dem', 'die': 'der', 'das': 'dem'}[article], word),
+                ({'der': 'den', 'die': 'die', 'das': 'das'}[article], word)]
+    plural = [('die', word + 'e'), ('der', word + 'e'), ('den', word + 'en'), ('die', word + 'e')]
+
+    def table(forms):
+        return '<div class="vTbl"><table>' + ''.join(
+            f'<tr><th>{case}</th><td>{a}</td><td>{form}</td></tr>'
+            for case, (a, form) in zip(('Nom.', 'Gen.', 'Dat.', 'Acc.'), forms)) + '</table></div>'
+
+    gender = {'der': 'masculine', 'die': 'feminine', 'das': 'neutral'}[article]
+    return (_header(f"{article} {word}", f"noun · {gender}", f"the {word.lower()}")
+            + f'<div class="rAufZu"><div class="vDkl">{table(singular)}{table(plural)}</div></div>\n')
+
+def _chrome(word: str) -> tuple:
+    """ the head and navigation before the entry and the link lists and
+        footer after it, made up but deterministic per word
+    """
+    rng = random.Random(zlib.crc32(word.encode('utf-8')))
+    names = [''.join(rng.choice('abdefghiklmnoprstuwz') for _ in range(rng.randint(4, 10))) for _ in range(400)]
+    head = ('<head><title>' + word + ' - conjugation / declension</title>'
+            + ''.join(f'<meta name="m{i}" content="{name}">' for i, name in enumerate(names[:20]))
+            + '<style>' + ' '.join(f'.c{i}{{margin:{i}px;padding:{i % 7}px}}' for i in range(300)) + '</style>'
+            + '<script>' + ';'.join(f'var v{i}="{name}"' for i, name in enumerate(names[:200])) + '</script></head>')
+    nav = ('<nav><ul class="menu">'
+           + ''.join(f'<li><a href="/?w={name}" class="lnk">{name}</a></li>' for name in names[:150])
+           + '</ul></nav>')
+    links = ''.join(f'<div class="similar"><h4>{names[i]}</h4><ul>'
+                    + ''.join(f'<li><a href="/?w={name}en">{name}en</a> <span>{name}</span></li>' for name in names[i:i + 25])
+                    + '</ul></div>' for i in range(150, 400, 25))
+    footer = ('<footer>' + ''.join(f'<p>{" ".join(names[i:i + 30])}</p>' for i in range(0, 400, 30))
+              + '<script>' + ';'.join(f'track("{name}")' for name in names) + '</script></footer>')
+    return head, nav, links + footer
+
+def verbformen_page(word: str, auxiliary: str = None) -> str:
+    """ the made up page of `word`, the same word always gets the same page """
+    h = zlib.crc32(word.encode('utf-8'))
+    if word[:1].isupper():
+        body = _noun_page(word, ('der', 'die', 'das')[h % 3])
+    elif word.endswith(('en', 'ern')):
+        # one verb in four has haben and sein forms
+        both = h % 4 == 0
+        body = _verb_page(word, auxiliary or ('haben' if both or h % 4 != 1 else 'sein'), both)
+    else:
+        body = _header(word, 'adjective · regular', f"{word}ish")
+    head, nav, after = _chrome(word)
+    return f'<html>{head}<body>{nav}\n{body}<div class="ads">ads</div>{after}</body></html>'
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    fail_rate = 0.0
+    rate = 0.0
+    requests = Counter()
+    lock = threading.Lock()
+    # the token bucket of --rate
+    tokens = 0.0
+    updated_at = 0.0
+
+    def _send(self, status: int, body: str, content_type: str = 'text/html; charset=utf-8', headers: dict = {}):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _over_rate(self) -> bool:
+        if not self.rate:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            cls = type(self)
+            cls.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+            cls.updated_at = now
+            if self.tokens < 1:
+                return True
+            cls.tokens -= 1
+            return False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/stats':
+            with self.lock:
+                self._send(200, json.dumps(dict(self.requests), ensure_ascii=False), 'application/json')
+            return
+        query = parse_qs(url.query)
+        if url.path != '/' or 'w' not in query or query['w'][0].startswith('xx'):
+            self._send(404, '<html><body>not found</body></html>')
+            return
+        if self._over_rate():
+            with self.lock:
+                self.requests['429'] += 1
+            self._send(429, '<html><body>too many requests</body></html>', headers={'Retry-After': '1'})
+            return
+        if random.random() < self.fail_rate:
+            with self.lock:
+                self.requests['429'] += 1
+            self._send(429, '<html><body>too many requests</body></html>')
+            return
+
+        time.sleep(self.delay)
+        word, auxiliary = query['w'][0], query.get('aux', [None])[0]
+        with self.lock:
+            self.requests[f"{word} ({auxiliary})" if auxiliary else word] += 1
+        self._send(200, verbformen_page(word, auxiliary if auxiliary in AUXILIARIES else None))
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8901, help="port to listen on.")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each answer.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 429.")
+    parser.add_argument("--rate", type=float, default=0.0, help="requests per second answered, the others get 429.")
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    StubHandler.fail_rate = args.fail_rate
+    StubHandler.rate = StubHandler.tokens = args.rate
+    StubHandler.updated_at = time.monotonic()
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"verbformen stub listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+""" export and import of the whole dictionary as ndjson, gzip compressed
+    when the file name ends in .gz.
+
+    the first line is a header, every other line one self-contained word
+    (see db.iter_word_records) without any database id, so that a dump can
+    be merged into any other database. both directions stream, memory does
+    not grow with the number of words.
+"""
+import io
+import sys
+import gzip
+import json
+import time
+from typing import Tuple
+from contextlib import contextmanager
+
+from db import *
+from escape_sequences import *
+
+DUMP_FORMAT = 'german-dict'
+DUMP_VERSION = 1
+# words written per transaction on import
+IMPORT_BATCH_SIZE = 1000
+# the fields of a word record and the types they may have
+_RECORD_FIELDS = {
+    'word': (str,),
+    'definition': (str,),
+    'type': (str,),
+    'gender': (str, type(None)),
+    'auxiliary': (int, type(None)),
+    'regular': (int,),
+    'separable': (int, type(None)),
+    'conjugation': (dict, type(None)),
+    'declension': (dict, type(None)),
+    'sentences': (list,),
+}
+
+@contextmanager
+def _open_dump(path: str, mode: str):
+    """ text file object of `path`, '-' is uncompressed stdin or stdout """
+    if path == '-':
+        stream = sys.stdin.buffer if mode == 'r' else sys.stdout.buffer
+        f = io.TextIOWrapper(stream, encoding='utf-8')
+        try:
+            yield f
+        finally:
+            # closing the wrapper, or collecting it, would close the stream
+            f.detach()
+        return
+    if path.endswith('.gz'):
+        f = gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    else:
+        f = open(path, mode, encoding='utf-8')
+    with f:
+        yield f
+
+def export_dictionary(path: str) -> int:
+    """ writes every stored word to `path`, returns the number of words """
+    count = 0
+    with _open_dump(path, 'w') as f:
+        f.write(json.dumps({'format': DUMP_FORMAT, 'version': DUMP_VERSION}) + '\n')
+        for record in iter_word_records():
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+            count += 1
+    return count
+
+def _read_record(line: str, where: str) -> dict:
+    """ the word record of a dump line, ValueError names `where` if the
+        line is not one
+    """
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise ValueError(f"{where}: not json") from None
+    if not isinstance(record, dict):
+        raise ValueError(f"{where}: not a word record")
+    for field, types in _RECORD_FIELDS.items():
+        if field not in record:
+            raise ValueError(f"{where}: missing '{field}'")
+        if not isinstance(record[field], types):
+            raise ValueError(f"{where}: '{field}' is {type(record[field]).__name__}")
+    if not all(isinstance(pair, list) and len(pair) == 2 for pair in record['sentences']):
+        raise ValueError(f"{where}: 'sentences' is not a list of [german, english]")
+    return record
+
+def _import_record(record: dict) -> bool:
+    word_id, inserted = add_word_entry(
+        record['word'],
+        record['definition'],
+        record['type'],
+        gender=record['gender'],
+        auxiliary=record['auxiliary'],
+        regular=record['regular'],
+        separable=record['separable'],
+        conjugation_dict=record['conjugation'],
+        declension_dict=record['declension'],
+    )
+    # a word that is already stored keeps its sentences, unless it has none
+    if record['sentences'] and (inserted or not get_sentences(word_id)):
+        add_sentences_to_db([(None, de, en) for de, en in record['sentences']], word_id)
+    return inserted
+
+@retry_when_locked
+def _import_batch(records: list) -> int:
+    with transaction():
+        return sum(_import_record(record) for record in records)
+
+def import_dictionary(path: str, batch_size: int = IMPORT_BATCH_SIZE) -> Tuple[int, int]:
+    """ merges the words of the dump at `path` into the database. words
+        that are stored already keep their conjugation and declension.
+        returns the number of added and of already stored words. a line
+        that is not a word record raises ValueError before the batch it is
+        in is written, the batches before it stay stored.
+    """
+    start = time.perf_counter()
+    added, total = 0, 0
+    with _open_dump(path, 'r') as f:
+        try:
+            header = json.loads(f.readline() or '{}')
+        except ValueError:
+            header = {}
+        if not isinstance(header, dict) or header.get('format') != DUMP_FORMAT:
+            raise ValueError(f"{path} is not a german-dict dump")
+        if header.get('version', 0) > DUMP_VERSION:
+            raise ValueError(f"{path} has dump version {header['version']}, "
+                             f"this german-dict reads up to {DUMP_VERSION}")
+
+        # the forms of the new words are left to index_word_forms
+        # (--index-forms), which would add a third to the import time
+        with deferred_form_index():
+            batch = []
+            # the header is line 1
+            for number, line in enumerate(f, 2):
+                if not line.strip():
+                    continue
+                batch.append(_read_record(line, f"{path} line {number}"))
+                if len(batch) >= batch_size:
+                    added += _import_batch(batch)
+                    total += len(batch)
+                    batch.clear()
+            if batch:
+                added += _import_batch(batch)
+                total += len(batch)
+
+    elapsed = time.perf_counter() - start
+    print(f"{BLUE}added:{RESET} {added}  {BLUE}already stored:{RESET} {total - added}  "
+          f"({total} words in {elapsed:.1f}s)")
+    return added, total - added
@@ -0,0 +1,66 @@
+""" background worker for the jobs table. `python worker.py` drains every
+    pending sentence job and exits, main.py starts it detached with
+    start_worker() so that a lookup never waits for open ai.
+"""
+import os
+import sys
+import time
+import subprocess
+
+from db import *
+from ai import request_sentences
+
+SENTENCE_JOB = 'sentences'
+# a running job older than this belongs to a worker that died
+JOB_TIMEOUT = 10 * 60
+# attempts of a job, each is a single open ai request
+MAX_ATTEMPTS = 3
+# seconds between a failed attempt and the next claim
+RETRY_DELAY = 5
+
+def queue_sentences(word_id: int):
+    """ queues the (re)generation of the example sentences of a word and
+        starts a worker for it.
+    """
+    enqueue_job(SENTENCE_JOB, word_id)
+    start_worker()
+
+def start_worker():
+    # detached from the terminal, it keeps running after main.py exits
+    subprocess.Popen([sys.executable, os.path.abspath(__file__)],
+                     cwd=os.getcwd(),
+                     stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+
+@retry_when_locked
+def _store_sentences(job_id: int, word_id: int, sentences: list):
+    with transaction():
+        add_sentences_to_db(sentences, word_id, replace=True)
+        finish_job(job_id)
+
+def run_sentence_jobs() -> int:
+    """ generates sentences until no job is pending, returns the number of
+        jobs done.
+    """
+    release_stale_jobs(SENTENCE_JOB, JOB_TIMEOUT)
+    done = 0
+    while True:
+        job = claim_job(SENTENCE_JOB)
+        if job is None:
+            return done
+
+        job_id, payload = job
+        word_id = int(payload)
+        try:
+            # the attempts of the job are the only retries
+            sentences = request_sentences(get_word(word_id), retries=0)
+            _store_sentences(job_id, word_id, sentences)
+            done += 1
+        except Exception as e:
+            finish_job(job_id, error=str(e), max_attempts=MAX_ATTEMPTS)
+            time.sleep(RETRY_DELAY)
+
+if __name__ == '__main__':
+    run_sentence_jobs()